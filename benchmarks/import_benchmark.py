@@ -0,0 +1,100 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the code paths that need them should load: html parsing, LaTeX, images, network, the library
+# database and profiling
+HEAVY = ["bs4", "pylatex", "PIL", "urllib3", "urllib.request", "http.client", "sqlite3", "cProfile"]
+
+# Entry point -> heavy modules it is expected to load
+ENTRY_POINTS = {"create_latex": [], "recipes": [], "build": [], "records": [], "metrics": [], "crawl": [],
+                "preview": [], "library": ["sqlite3"]}
+
+
+def import_times(module, python=sys.executable):
+    """
+    (name, cumulative ms, nesting depth) of every import, in the order they finished, and the process's wall time
+    (ms), from a fresh interpreter importing module with -X importtime
+    """
+    start = time.perf_counter()
+    result = subprocess.run([python, "-X", "importtime", "-c", "import " + module], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    wall = (time.perf_counter() - start) * 1000
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            # Nested imports are indented by two spaces per level
+            times.append((name.strip(), int(cumulative) / 1000, (len(name) - len(name.lstrip()) - 1) // 2))
+    return times, wall
+
+
+def measure(module, repeats=5, python=sys.executable):
+    """
+    Fastest import time (ms) and wall time (ms) of module over repeats runs, with the modules loaded by the
+    fastest run
+    """
+    best = None
+    for _ in range(repeats):
+        times, wall = import_times(module, python)
+        total = next(ms for name, ms, depth in times if name == module and depth == 0)
+        if best is None or total < best[0]:
+            best = (total, wall, times)
+    return best
+
+
+def direct_imports(times, module):
+    """
+    (cumulative ms, name) of the modules imported directly by module, slowest first
+    """
+    position = next(i for i, (name, _, depth) in enumerate(times) if name == module and depth == 0)
+    direct = []
+    # A module's imports are listed before it, down to the previous top level import
+    for name, ms, depth in reversed(times[:position]):
+        if depth == 0:
+            break
+        if depth == 1:
+            direct.append((ms, name))
+    return sorted(direct, reverse=True)
+
+
+def heavy_imports(times, allowed=()):
+    loaded = {name for name, _, _ in times}
+    return [name for name in HEAVY if name in loaded and name not in allowed]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Measure the cold start import time of each script with -X importtime "
+                                                 "and flag those over budget or loading modules they do not need")
+
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS), help="Modules to import")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per module, the fastest is reported")
+    parser.add_argument("--budget", type=float, default=75, help="Maximum import time of each module in ms")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest imports to list for each module")
+
+    args = parser.parse_args()
+
+    failures = 0
+    print("{:<15} {:>11} {:>10}  {}".format("module", "import (ms)", "wall (ms)", "slowest imports (cumulative ms)"))
+    for module in args.modules:
+        total, wall, times = measure(module, args.repeats)
+        direct = direct_imports(times, module)
+        print("{:<15} {:>11.1f} {:>10.1f}  {}".format(module, total, wall, ", ".join(
+            "{} {:.1f}".format(name, ms) for ms, name in direct[:args.top])))
+        heavy = heavy_imports(times, ENTRY_POINTS.get(module, []))
+        if total > args.budget:
+            failures += 1
+            print("    OVER BUDGET: {:.1f} ms > {:.1f} ms".format(total, args.budget))
+        if heavy:
+            failures += 1
+            print("    LOADS {} at import".format(", ".join(heavy)))
+
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,96 @@
+import argparse
+import glob
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import create_latex
+from recipes import Recipe
+
+SAMPLE = {"url": "https://www.bonappetit.com/recipe/jammy-onion-and-miso-pasta", "source": "Bon Appetit",
+          "title": "Jammy Onion and Miso Pasta", "active_time": "30 minutes", "total_time": "1 hour",
+          "servings": "4 servings", "ingredients": ["1 lb. pasta", "3 Tbsp. white miso", "½ cup unsalted butter",
+                                                    "2 large onions, thinly sliced", "Kosher salt"],
+          "food_list": None, "steps": ["Step 1", "Step 2", "Step 3"],
+          "instructions": ["Cook the onions in butter until jammy, about 45 minutes.", "Boil the pasta.",
+                           "Stir in the miso and toss with the pasta; cook at 350˚ for 5% longer."],
+          "my_notes": None, "type": None}
+
+
+def percentile(latencies, fraction):
+    ordered = sorted(latencies)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def sample_recipes(directory=None):
+    """
+    Recipes saved in directory, or the sample recipe
+    """
+    if directory:
+        return [Recipe.load(path) for path in sorted(glob.glob(os.path.join(directory, "*.json")))]
+    recipe = Recipe.__new__(Recipe)
+    recipe.root = ROOT
+    recipe.set_fields(SAMPLE)
+    return [recipe]
+
+
+def compile_times(recipes, repeats, directory, image):
+    """
+    Seconds taken to compile each recipe's pdf, repeats times each
+    """
+    times = []
+    for _ in range(repeats):
+        for recipe in recipes:
+            start = time.perf_counter()
+            create_latex.generate_latex(recipe, image=image, directory=directory)
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def report(name, times):
+    print("{:<18} {:>8} {:>10.0f} {:>10.0f} {:>10.0f}".format(name, len(times), statistics.mean(times) * 1000,
+                                                              percentile(times, 0.5) * 1000,
+                                                              percentile(times, 0.95) * 1000))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare per-recipe pdflatex compile latency with and without a "
+                                                 "precompiled preamble format")
+
+    parser.add_argument("--jsons", type=str, required=False,
+                        help="Directory of recipe json files to compile (default: a sample recipe)")
+    parser.add_argument("--repeats", type=int, default=5, help="Compiles of each recipe with each setting")
+
+    args = parser.parse_args()
+
+    if not shutil.which("pdflatex"):
+        sys.exit("pdflatex is not installed")
+
+    from PIL import Image
+    recipes = sample_recipes(args.jsons)
+    with tempfile.TemporaryDirectory() as directory:
+        image = os.path.join(directory, "image.jpg")
+        Image.new("RGB", (480, 320), (200, 120, 60)).save(image)
+
+        print("{:<18} {:>8} {:>10} {:>10} {:>10}".format("", "compiles", "mean (ms)", "p50 (ms)", "p95 (ms)"))
+        create_latex.configure_preamble_format(None)
+        # What generate_latex does by default: latexmk if it is installed, otherwise pdflatex
+        scratch = compile_times(recipes, args.repeats, directory, image)
+        report("from scratch", scratch)
+
+        formats = os.path.join(directory, "formats")
+        create_latex.configure_preamble_format(formats)
+        start = time.perf_counter()
+        create_latex.preamble_format(create_latex.recipe_document(recipes[0], image), formats)
+        print("format built once in {:.0f} ms".format((time.perf_counter() - start) * 1000))
+        precompiled = compile_times(recipes, args.repeats, directory, image)
+        report("precompiled", precompiled)
+        print("{:.1f}x faster per recipe (median)".format(percentile(scratch, 0.5) / percentile(precompiled, 0.5)))
@@ -0,0 +1,113 @@
+import argparse
+import inspect
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup
+import fetch
+import images
+import recipes
+
+PARSERS = {"Bon Appetit": "parse_bon_appetit",
+           "New York Times Cooking": "parse_nyt_cooking",
+           "Serious Eats": "parse_serious_eats"}
+FIELDS = ["title", "active_time", "total_time", "servings", "ingredients", "food_list", "steps", "instructions"]
+
+
+def load_module_at(ref, filename="recipes.py"):
+    """
+    Load a module as it was at a git revision, to compare against the working tree
+    """
+    source = subprocess.check_output(["git", "show", ref + ":" + filename], cwd=ROOT)
+    module = types.ModuleType(filename[:-3] + "_" + ref)
+    module.__file__ = os.path.join(ROOT, filename)
+    exec(compile(source, filename + "@" + ref, "exec"), module.__dict__)
+    # Older revisions of recipes.py download the image with urlretrieve directly
+    module.urlretrieve = lambda *args, **kwargs: None
+    return module
+
+
+def parse(module, source, html, parser="html.parser"):
+    """
+    Parse a saved page without any network access and return the extracted fields
+    """
+    recipe = module.Recipe.__new__(module.Recipe)
+    recipe.url = ""
+    recipe.source = source
+    recipe.type = None
+    recipe.my_notes = None
+    for field in FIELDS:
+        setattr(recipe, field, None)
+    if "interactive" in inspect.signature(recipe.pull_data).parameters:
+        # Full path from page to fields, including the schema.org metadata fast path
+        recipe.url = "saved page"
+        fetch.get_page = lambda url: html
+        recipe.pull_data(parser, interactive=False)
+    elif hasattr(recipe, "parse_html") and "parser" in inspect.signature(recipe.parse_html).parameters:
+        recipe.parse_html(html, parser)
+    elif hasattr(recipe, "parse_html"):
+        recipe.parse_html(html)
+    else:
+        recipe.soup = BeautifulSoup(html, "html.parser")
+        getattr(recipe, PARSERS[source])()
+    return {field: getattr(recipe, field) for field in FIELDS}
+
+
+def best_time(module, source, html, repeats, parser="html.parser"):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parse(module, source, html, parser)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_memory(module, source, html, parser="html.parser"):
+    """
+    Peak memory allocated while parsing, in MB
+    """
+    tracemalloc.start()
+    parse(module, source, html, parser)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Time recipe page parsing before and after a change")
+
+    parser.add_argument("pages", nargs="+", help="Saved html pages, named after their website (e.g. bonappetit-pasta.html)")
+    parser.add_argument("--before", type=str, default="HEAD~1", help="Git revision to compare against")
+    parser.add_argument("--source", type=str, required=False, help="Website of every page, if not in the filenames")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per page, the fastest is reported")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=recipes.HTML_PARSERS,
+                        help="BeautifulSoup tree builder used by the working tree (the earlier revision uses its own)")
+
+    args = parser.parse_args()
+
+    fetch.get_image = lambda *args, **kwargs: None
+    images.fetch_image = lambda url: (b"", ".jpg")
+    images.save = lambda *args, **kwargs: None
+    before_module = load_module_at(args.before)
+
+    print("{:<40} {:>12} {:>12} {:>9} {:>12} {:>12}".format("page", "before (ms)", "after (ms)", "speedup",
+                                                           "before (MB)", "after (MB)"))
+    for page in args.pages:
+        source = args.source or recipes.source_from_url(os.path.basename(page))
+        with open(page, encoding="utf-8") as f:
+            html = f.read()
+        if parse(before_module, source, html) != parse(recipes, source, html, args.parser):
+            print("WARNING: {} parses differently before and after".format(page))
+        before = best_time(before_module, source, html, args.repeats)
+        after = best_time(recipes, source, html, args.repeats, args.parser)
+        print("{:<40} {:>12.1f} {:>12.1f} {:>8.1f}x {:>12.1f} {:>12.1f}".format(
+            os.path.basename(page)[:40], before * 1000, after * 1000, before / after,
+            peak_memory(before_module, source, html), peak_memory(recipes, source, html, args.parser)))
@@ -0,0 +1,99 @@
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from recipes import Recipe
+import glob
+import records
+
+PANTRY = ["salt", "sugar", "all-purpose flour", "unsalted butter", "large eggs", "olive oil", "garlic cloves",
+          "whole milk", "heavy cream", "white miso", "lemon juice", "onion", "kosher salt", "black pepper", "honey"]
+AMOUNTS = ["1 tsp.", "2 Tbsp.", "½ cup", "1 cup", "3", "¼ cup", "1 lb."]
+
+
+def generate(directory, count):
+    """
+    Write count made up recipes, with the repetition of real ones (shared ingredients, step names, sources)
+    """
+    for number in range(count):
+        ingredients = ["{} {}".format(random.choice(AMOUNTS), item) for item in random.sample(PANTRY, 10)]
+        instructions = ["Step {} of recipe {}: {}".format(step, number, " ".join(random.sample(PANTRY, 8)))
+                        for step in range(1, 7)]
+        recipe_dict = {"url": "https://www.bonappetit.com/recipe/{}".format(number), "source": "Bon Appetit",
+                       "title": "Recipe {}".format(number), "active_time": "30 minutes", "total_time": "1 hour",
+                       "servings": "4 servings", "ingredients": ingredients,
+                       "food_list": [item.split(" ", 1)[1] for item in ingredients],
+                       "steps": ["Step {}".format(step) for step in range(1, 7)], "instructions": instructions,
+                       "my_notes": None, "type": "dinner"}
+        with open(os.path.join(directory, recipe_dict["title"] + ".json"), "w", encoding="utf-8") as f:
+            json.dump(recipe_dict, f, ensure_ascii=False, indent=4)
+
+
+def load_recipes(directory):
+    # What Recipe(file=...) does for each recipe, without moving its image or saving the json again
+    return [Recipe.load(path) for path in sorted(glob.glob(os.path.join(directory, "*.json")))]
+
+
+def open_library(path):
+    return records.RecipeLibrary(path)
+
+
+def measure(function, *args):
+    """
+    Seconds taken and MB still allocated afterwards by what function returns
+    """
+    gc.collect()
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+    # Timed and measured separately, as tracing allocations slows everything down
+    gc.collect()
+    tracemalloc.start()
+    result = function(*args)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return seconds, retained / 1024 / 1024, result
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare memory use and load time of Recipe objects, RecipeRecords "
+                                                 "and a memory mapped JSON Lines library")
+
+    parser.add_argument("--jsons", type=str, required=False, help="Directory of recipe json files to load")
+    parser.add_argument("--generate", type=int, default=20000,
+                        help="Number of made up recipes to use when --jsons is not given")
+
+    args = parser.parse_args()
+
+    directory = args.jsons
+    if not directory:
+        directory = tempfile.mkdtemp()
+        generate(directory, args.generate)
+    library_path = os.path.join(tempfile.mkdtemp(), "recipes.jsonl")
+    count = records.consolidate(directory, library_path)
+
+    print("{} recipes".format(count))
+    print("{:<45} {:>10} {:>10}".format("", "time (s)", "memory (MB)"))
+    results = []
+    for name, function, argument in [("Recipe.load (as Recipe(file=...))", load_recipes, directory),
+                                      ("RecipeRecord", records.load_records, directory),
+                                      ("RecipeLibrary (open)", open_library, library_path)]:
+        seconds, megabytes, result = measure(function, argument)
+        results.append(result)
+        print("{:<45} {:>10.2f} {:>10.1f}".format(name, seconds, megabytes))
+
+    # Reading a field of every recipe decodes the whole library
+    library = results[-1]
+    seconds, megabytes, _ = measure(lambda: [recipe for recipe in library if recipe.title])
+    print("{:<45} {:>10.2f} {:>10.1f}".format("RecipeLibrary (read every recipe)", seconds, megabytes))
+    library.close()
@@ -0,0 +1,114 @@
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from create_latex import read_urls
+
+
+def percentile(latencies, fraction):
+    ordered = sorted(latencies)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def cache_options(args):
+    return ["--cache-dir", args.cache_dir] + (["--offline"] if args.offline else [])
+
+
+def cli_request(url, args):
+    """
+    Render one recipe the way a shell loop does: a new create_latex.py process. Returns (seconds, succeeded)
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "create_latex.py"), "--url", url,
+                             "--overwrite", "skip"] + cache_options(args), capture_output=True)
+    return time.perf_counter() - start, result.returncode == 0
+
+
+def service_request(url, address):
+    """
+    Render one recipe through the service: queue it, then wait for the pdf. Returns (seconds, succeeded)
+    """
+    start = time.perf_counter()
+    try:
+        with urlopen(Request(address + "/jobs", data=json.dumps({"url": url}).encode("utf-8"))) as response:
+            job = json.load(response)
+        with urlopen("{}/jobs/{}/pdf?wait=300".format(address, job["id"])) as response:
+            succeeded = response.status == 200 and response.read().startswith(b"%PDF")
+    except HTTPError:
+        succeeded = False
+    return time.perf_counter() - start, succeeded
+
+
+def start_service(args):
+    """
+    Start service.py and wait until it answers
+    """
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "service.py"), "--port", str(args.port),
+                                "--workers", str(args.workers), "--queue-size", str(len(args.urls))]
+                               + cache_options(args), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    address = "http://127.0.0.1:{}".format(args.port)
+    for _ in range(600):
+        try:
+            urlopen(address + "/status").close()
+            return process, address
+        except URLError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The service did not start")
+
+
+def run(request, urls, concurrency):
+    """
+    Send every url with concurrency requests at once, returning the total seconds and every (seconds, succeeded)
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(request, urls))
+    return time.perf_counter() - start, results
+
+
+def report(name, total, results):
+    latencies = [seconds * 1000 for seconds, _ in results]
+    failures = sum(not succeeded for _, succeeded in results)
+    print("{:<10} {:>8} {:>8} {:>12.2f} {:>10.0f} {:>10.0f}".format(name, len(results), failures,
+                                                                    len(results) / total,
+                                                                    percentile(latencies, 0.5),
+                                                                    percentile(latencies, 0.99)))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare throughput and latency of rendering recipes with one "
+                                                 "create_latex.py process each and with the render service")
+
+    parser.add_argument("urls_file", help="File with one recipe url per line")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of requests sent at once")
+    parser.add_argument("--workers", type=int, default=4, help="Number of service worker processes")
+    parser.add_argument("--port", type=int, default=8751, help="Port to run the service on")
+    parser.add_argument("--cache-dir", type=str, default=os.path.join(ROOT, "cache"),
+                        help="Response cache shared by both, so they are timed against the same pages")
+    parser.add_argument("--offline", action="store_true", help="Only use cached pages (time rendering alone)")
+
+    args = parser.parse_args()
+    args.urls = read_urls(args.urls_file)
+
+    print("{:<10} {:>8} {:>8} {:>12} {:>10} {:>10}".format("", "requests", "failed", "recipes/s", "p50 (ms)",
+                                                           "p99 (ms)"))
+    report("cli", *run(lambda url: cli_request(url, args), args.urls, args.concurrency))
+
+    process, address = start_service(args)
+    try:
+        report("service", *run(lambda url: service_request(url, address), args.urls, args.concurrency))
+    finally:
+        process.terminate()
+        process.wait()
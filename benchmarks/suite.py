@@ -0,0 +1,168 @@
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+import timeit
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from parse_benchmark import PARSERS, FIELDS
+from create_latex import recipe_document
+import recipes
+
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+RESULTS = os.path.join(ROOT, "benchmarks", "results.jsonl")
+
+
+def fixture_pages(directory=FIXTURES):
+    """
+    Name, website and html of every recipe page recorded in the test fixtures
+    """
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "entries", "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+        source = recipes.source_from_url(entry["url"])
+        if not source:
+            continue
+        with open(os.path.join(directory, "objects", entry["object"]), "rb") as f:
+            body = f.read()
+        if not body.lstrip()[:15].lower().startswith((b"<!doctype", b"<html")):
+            # Images from the same websites
+            continue
+        pages.append((urlparse(entry["url"]).path.rstrip("/").split("/")[-1], source, body.decode("utf-8")))
+    return pages
+
+
+def saved_pages(paths):
+    """
+    Name, website and html of saved pages named after their website (e.g. bonappetit-pasta.html)
+    """
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.splitext(os.path.basename(path))[0], recipes.source_from_url(path), f.read()))
+    return pages
+
+
+def parse(source, html, parser="html.parser"):
+    """
+    Recipe filled in by the site parser alone (no schema.org metadata), without network access
+    """
+    recipe = recipes.Recipe.__new__(recipes.Recipe)
+    recipe.root = os.getcwd()
+    recipe.url = ""
+    recipe.source = source
+    recipe.type = None
+    recipe.my_notes = None
+    for field in FIELDS:
+        setattr(recipe, field, None)
+    recipe.parse_html(html, parser)
+    return recipe
+
+
+def recipe_texts(recipe):
+    """
+    Ingredient and instruction text of a parsed recipe, including grouped ingredients and instructions
+    """
+    texts = []
+    for value in [recipe.ingredients, recipe.instructions]:
+        groups = value.values() if isinstance(value, dict) else [value or []]
+        for group in groups:
+            texts.extend(text for text in group if isinstance(text, str))
+    return texts
+
+
+def cases(name, source, html, parser="html.parser"):
+    """
+    (case name, function) of every timed step for one page
+    """
+    recipe = parse(source, html, parser)
+    texts = recipe_texts(recipe)
+    return [("{} {}".format(PARSERS[source], name), lambda: parse(source, html, parser)),
+            ("clean_text {}".format(name), lambda: recipes.clean_texts(texts)),
+            ("generate_latex {}".format(name), lambda: recipe_document(recipe, recipe.title + ".png").dumps())]
+
+
+def run(pages, repeats=5, parser="html.parser"):
+    """
+    Fastest time in ms of each case over repeats runs
+    """
+    results = {}
+    for name, source, html in pages:
+        for case, function in cases(name, source, html, parser):
+            number = max(1, int(0.05 / max(timeit.timeit(function, number=1), 1e-6)))
+            results[case] = min(timeit.repeat(function, number=number, repeat=repeats)) / number * 1000
+    return results
+
+
+def compare(results, baseline, threshold=0.2, noise=0.05):
+    """
+    Cases slower than the baseline by more than threshold (a fraction) and more than noise ms
+    """
+    return {case: (baseline[case], ms) for case, ms in results.items()
+            if case in baseline and ms > baseline[case] * (1 + threshold) and ms - baseline[case] > noise}
+
+
+def commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Time the site parsers, clean_text and LaTeX generation on every "
+                                                 "recorded fixture page and flag regressions against a baseline")
+
+    parser.add_argument("pages", nargs="*", help="Saved html pages to use instead of the recorded fixtures")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per case, the fastest is reported")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=recipes.HTML_PARSERS)
+    parser.add_argument("--baseline", type=str, default=BASELINE, help="Json file of baseline timings")
+    parser.add_argument("--save-baseline", action="store_true", help="Save these timings as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Slowdown (as a fraction of the baseline) reported as a regression")
+    parser.add_argument("--results", type=str, default=RESULTS, help="JSON Lines file every run is appended to")
+
+    args = parser.parse_args()
+
+    pages = saved_pages(args.pages) if args.pages else fixture_pages()
+    if not pages:
+        # Timing whatever the websites serve today would not be comparable with the baseline
+        parser.exit(1, "No recorded fixtures in {}: record them (see README) or pass saved pages\n".format(FIXTURES))
+
+    results = run(pages, args.repeats, args.parser)
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"commit": commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "parser": args.parser,
+                            "results": results}) + "\n")
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+
+    print("{:<60} {:>13} {:>10} {:>8}".format("case", "baseline (ms)", "now (ms)", "change"))
+    for case, ms in results.items():
+        if case in baseline:
+            print("{:<60} {:>13.3f} {:>10.3f} {:>+7.0%}{}".format(case[:60], baseline[case], ms,
+                                                                  ms / baseline[case] - 1,
+                                                                  "  REGRESSION" if case in regressions else ""))
+        else:
+            print("{:<60} {:>13} {:>10.3f}".format(case[:60], "-", ms))
+
+    if args.save_baseline or not baseline:
+        # The first run on a machine becomes its baseline
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print("Saved baseline to {}".format(args.baseline))
+    elif regressions:
+        print("{} regression(s) against {}".format(len(regressions), args.baseline))
+        sys.exit(1)
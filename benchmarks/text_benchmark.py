@@ -0,0 +1,44 @@
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from parse_benchmark import load_module_at
+from tests.test_TextCleaning import scraped_corpus
+import create_latex
+import recipes
+
+
+def best_time(function, repeats):
+    return min(timeit.repeat(function, number=1, repeat=repeats))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Time text normalisation before and after a change")
+
+    parser.add_argument("--before", type=str, default="HEAD~1", help="Git revision to compare against")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs of the whole corpus, the fastest is reported")
+
+    args = parser.parse_args()
+
+    before_recipes = load_module_at(args.before, "recipes.py")
+    before_latex = load_module_at(args.before, "create_latex.py")
+    corpus = scraped_corpus()
+
+    cases = [("clean_text", lambda: [before_recipes.clean_text(text) for text in corpus],
+              lambda: recipes.clean_texts(corpus)),
+             ("create_latex_friendly_text", lambda: [before_latex.create_latex_friendly_text(text) for text in corpus],
+              lambda: create_latex.create_latex_friendly_texts(corpus))]
+
+    print("{} texts".format(len(corpus)))
+    print("{:<30} {:>12} {:>12} {:>9}".format("function", "before (ms)", "after (ms)", "speedup"))
+    for name, before_function, after_function in cases:
+        if before_function() != after_function():
+            print("WARNING: {} gives different results before and after".format(name))
+        before = best_time(before_function, args.repeats)
+        after = best_time(after_function, args.repeats)
+        print("{:<30} {:>12.1f} {:>12.1f} {:>8.1f}x".format(name, before * 1000, after * 1000, before / after))
@@ -0,0 +1,227 @@
+import create_latex
+from create_latex import generate_latex
+from recipes import Recipe
+import images
+import argparse
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+MANIFEST = ".manifest.json"
+
+# Everything in create_latex that decides what a recipe pdf looks like
+TEMPLATE_FUNCTIONS = ["frac", "replacement_pattern", "latex_replacement", "clean_fractions", "clean_special_characters",
+                      "create_latex_friendly_text", "create_latex_friendly_texts", "create_document", "recipe_outline",
+                      "add_recipe", "add_steps", "recipe_document", "fixed_preamble", "preamble_format", "compile_pdf",
+                      "generate_latex"]
+
+
+def template_version():
+    """
+    Hash of the code and tables that decide what a recipe pdf looks like, so changing the template rebuilds
+    every pdf while changes elsewhere in create_latex.py do not
+    """
+    import inspect
+    source = "".join(inspect.getsource(getattr(create_latex, name)) for name in TEMPLATE_FUNCTIONS)
+    source += repr(sorted(create_latex.LATEX_REPLACEMENTS.items()))
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def file_state(path, previous=None):
+    """
+    Size, modification time and content hash of a file, or None if it does not exist. The hash recorded
+    previously is reused while the size and modification time are unchanged, so unchanged files are not read
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime_ns:
+        return previous
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest}
+
+
+def same_content(state, previous):
+    return state is not None and previous is not None and state["sha256"] == previous["sha256"]
+
+
+def image_path(title, root=None):
+    return images.image_path(os.path.join(root or os.getcwd(), "images"), title)
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path):
+    """
+    Write the manifest to a temporary file and rename it into place, so an interrupted build never leaves it
+    half written
+    """
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+
+
+def render(recipe):
+    """
+    Compile one recipe's pdf in a build directory of its own, then move it into its type folder in one step, so
+    renders running at the same time never share intermediate files and a pdf is never seen half written
+    """
+    pdfs = os.path.join(recipe.root, "pdfs")
+    destination = os.path.join(pdfs, recipe.type) if recipe.type else pdfs
+    os.makedirs(destination, exist_ok=True)
+    # Inside pdfs/ so the final rename stays on one filesystem
+    with tempfile.TemporaryDirectory(prefix=".build-", dir=pdfs) as directory:
+        generate_latex(recipe, image=image_path(recipe.title, recipe.root), directory=directory)
+        pdf = os.path.join(destination, recipe.title + ".pdf")
+        os.replace(os.path.join(directory, recipe.title + ".pdf"), pdf)
+    return pdf
+
+
+def render_file(path, root=None):
+    """
+    Worker task: render a saved recipe of the library in root, returning its title, the state of the image used
+    and the pdf path
+    """
+    recipe = Recipe.load(path, root)
+    image_state = file_state(image_path(recipe.title, recipe.root))
+    if image_state is None:
+        raise FileNotFoundError("no image at " + image_path(recipe.title, recipe.root))
+    return recipe.title, image_state, render(recipe)
+
+
+def render_all(paths, jobs=1, root=None):
+    """
+    Render recipe json files across jobs worker processes, yielding (path, result, error) as each one finishes
+    """
+    if jobs <= 1 or len(paths) <= 1:
+        for path in paths:
+            try:
+                yield path, render_file(path, root), None
+            except Exception as e:
+                yield path, None, e
+        return
+    # Starting the pool (and importing multiprocessing) is only worth it when there is more than one recipe to build
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    # Workers compile against the same preamble format, if any, whichever way they are started
+    with ProcessPoolExecutor(max_workers=jobs, initializer=create_latex.configure_preamble_format,
+                             initargs=(create_latex.format_directory,)) as executor:
+        futures = {executor.submit(render_file, path, root): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def build(directory="jsons", force=False, jobs=1, root=None):
+    """
+    Recompile the pdf of every recipe json in directory whose json, image or the LaTeX template changed since it
+    was last built, or whose pdf is missing, running jobs LaTeX compilations at once. Images are read from and
+    pdfs written to the library in root (the working directory by default). Returns the titles rebuilt and the
+    failures
+    """
+    root = root or os.getcwd()
+    pdfs = os.path.join(root, "pdfs")
+    manifest_path = os.path.join(pdfs, MANIFEST)
+    manifest = load_manifest(manifest_path)
+    version = template_version()
+    changed = False
+    rebuilt = []
+    failed = {}
+    stale = {}
+
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")))
+    names = {os.path.basename(path) for path in paths}
+    for name in [name for name in manifest if name not in names]:
+        # The json was deleted; its pdf is left where it is
+        del manifest[name]
+        changed = True
+
+    for path in paths:
+        name = os.path.basename(path)
+        entry = manifest.get(name)
+        json_state = file_state(path, entry and entry["json"])
+        if entry and not force and same_content(json_state, entry["json"]):
+            # The title (and so the image and pdf names) only change with the json
+            image_state = file_state(image_path(entry["title"], root), entry["image"])
+            if (same_content(image_state, entry["image"]) and entry["template"] == version
+                    and os.path.isfile(os.path.join(pdfs, entry["pdf"]))):
+                if json_state is not entry["json"] or image_state is not entry["image"]:
+                    # Touched but not modified: remember the new times so the files are not hashed again
+                    entry["json"], entry["image"] = json_state, image_state
+                    changed = True
+                continue
+        stale[path] = json_state
+
+    for path, result, error in render_all(list(stale), jobs, root):
+        name = os.path.basename(path)
+        if error:
+            failed[name] = "{}: {}".format(error.__class__.__name__, error)
+            continue
+        title, image_state, pdf = result
+        # The json hash from before the render, so an edit made while it ran is picked up next time
+        manifest[name] = {"title": title, "json": stale[path], "image": image_state, "template": version,
+                          "pdf": os.path.relpath(pdf, pdfs)}
+        rebuilt.append(title)
+        # Saved after every pdf so an interrupted build keeps what it finished
+        save_manifest(manifest, manifest_path)
+        changed = False
+
+    if changed:
+        save_manifest(manifest, manifest_path)
+    return rebuilt, failed
+
+
+def report(rebuilt, failed):
+    for title in rebuilt:
+        print("built   " + title)
+    for name, error in sorted(failed.items()):
+        print("FAILED  {}  ({})".format(name, error))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Rebuild only the recipe pdfs whose inputs changed")
+
+    parser.add_argument("--root", type=str, default=os.getcwd(),
+                        help="Recipe library directory holding jsons/, images/ and pdfs/ (default: this directory)")
+    parser.add_argument("--jsons", type=str, required=False,
+                        help="Directory of saved recipe json files (default: the library's jsons/)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every pdf")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Number of pdfs compiled at once")
+    parser.add_argument("--watch", type=float, required=False,
+                        help="Keep running, checking for changes every this many seconds")
+    parser.add_argument("--preamble-format", action="store_true",
+                        help="Compile against a precompiled preamble format (built in pdfs/.formats the first time, "
+                             "requires pdflatex with mylatexformat)")
+
+    args = parser.parse_args()
+    args.jsons = args.jsons or os.path.join(args.root, "jsons")
+
+    if args.preamble_format:
+        create_latex.configure_preamble_format(os.path.join(args.root, "pdfs", ".formats"))
+
+    start = time.perf_counter()
+    rebuilt, failed = build(args.jsons, args.force, args.jobs, args.root)
+    report(rebuilt, failed)
+    print("{} rebuilt, {} failed in {:.2f}s".format(len(rebuilt), len(failed), time.perf_counter() - start))
+
+    if args.watch:
+        try:
+            while True:
+                time.sleep(args.watch)
+                report(*build(args.jsons, jobs=args.jobs, root=args.root))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,252 @@
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urljoin, urlsplit, urlunsplit
+import argparse
+import glob
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+
+import fetch
+
+# Home page of each supported website, where its robots.txt lists its sitemaps
+SITE_HOMES = {"Bon Appetit": "https://www.bonappetit.com",
+              "New York Times Cooking": "https://cooking.nytimes.com",
+              "Serious Eats": "https://www.seriouseats.com"}
+
+# Urls of each website's recipe pages (after canonical_url), as opposed to its articles, videos and listings
+RECIPE_URLS = {"Bon Appetit": re.compile(r"^https://www\.bonappetit\.com/recipe/[a-z0-9-]+$"),
+               "New York Times Cooking": re.compile(r"^https://cooking\.nytimes\.com/recipes/\d+(?:-[a-z0-9-]+)?$"),
+               "Serious Eats": re.compile(r"^https://www\.seriouseats\.com/[a-z0-9-]+-recipe(?:-\d+)?$")}
+
+# Links in a collection page's html
+LINK = re.compile(r"<a\b[^>]*?\bhref\s*=\s*[\"']([^\"'#]+)", re.IGNORECASE)
+
+
+def canonical_url(url):
+    """
+    One spelling of each page's url: https, lower case host, and no query, fragment or trailing slash
+    """
+    parts = urlsplit(url.strip())
+    return urlunsplit(("https", parts.netloc.lower(), parts.path.rstrip("/"), "", ""))
+
+
+def recipe_source(url):
+    """
+    Name of the supported website url is a recipe page of, or None
+    """
+    return next((source for source, pattern in RECIPE_URLS.items() if pattern.match(url)), None)
+
+
+def parse_date(text):
+    """
+    Sitemap <lastmod> date (W3C datetime: a date, or a date and time with a time zone) in UTC, or None
+    """
+    try:
+        date = datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+def read_sitemap(url):
+    """
+    Whether the sitemap at url is an index of other sitemaps, and the (url, last modified date or None) of each of
+    its entries. Sitemaps may be gzipped
+    """
+    from xml.etree import ElementTree
+    body = fetch.download(url)
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    root = ElementTree.fromstring(body)
+    entries = []
+    for entry in root:
+        fields = {child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() for child in entry}
+        if fields.get("loc"):
+            entries.append((fields["loc"], parse_date(fields.get("lastmod"))))
+    return root.tag.rsplit("}", 1)[-1] == "sitemapindex", entries
+
+
+def collection_links(url):
+    """
+    Every link on a collection (listing) page, as absolute urls
+    """
+    html = fetch.get_page(url)
+    return [urljoin(url, link) for link in LINK.findall(html)]
+
+
+def library_urls(root=None):
+    """
+    Canonical urls of every recipe already saved in root's jsons/ directory or library database
+    """
+    root = root or os.getcwd()
+    urls = set()
+    for path in glob.glob(os.path.join(root, "jsons", "*.json")):
+        with open(path, encoding="utf-8") as f:
+            urls.add(json.load(f).get("url") or "")
+    if os.path.isfile(os.path.join(root, "library.db")):
+        from library import Library
+        store = Library(os.path.join(root, "library.db"))
+        urls.update(store.urls())
+        store.close()
+    return {canonical_url(url) for url in urls if url}
+
+
+class Robots:
+    """
+    The robots.txt rules of each website, read once. A website without one allows everything
+    """
+
+    def __init__(self):
+        self.parsers = {}
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        from urllib.robotparser import RobotFileParser
+        home = urlunsplit(urlsplit(url)[:2] + ("", "", ""))
+        with self.lock:
+            if home not in self.parsers:
+                parser = RobotFileParser(home + "/robots.txt")
+                try:
+                    parser.parse(fetch.download(home + "/robots.txt").decode("utf-8", "replace").splitlines())
+                except (fetch.DownloadError, fetch.CacheMiss):
+                    parser.parse([])
+                self.parsers[home] = parser
+                delay = parser.crawl_delay("*")
+                # Slow down to the website's Crawl-delay
+                if delay and fetch.rate_limiter:
+                    fetch.rate_limiter.limit(home, 1 / float(delay))
+            return self.parsers[home]
+
+    def allowed(self, url):
+        return self.get(url).can_fetch("*", url)
+
+    def sitemaps(self, url):
+        return self.get(url).site_maps() or []
+
+
+class Frontier:
+    """
+    Recipe urls found so far, each kept once whatever its spelling, leaving out those already in the library
+    """
+
+    def __init__(self, known=()):
+        self.seen = set(known)
+        self.found = 0
+
+    def add(self, url):
+        """
+        Canonical url if it is a recipe that is neither in the library nor found before, otherwise None
+        """
+        url = canonical_url(url)
+        if url in self.seen or not recipe_source(url):
+            return None
+        self.seen.add(url)
+        self.found += 1
+        return url
+
+
+def crawl(sources=SITE_HOMES, collections=(), known=(), since=None, limit=None, robots=None, log=None):
+    """
+    Yield the url of every new recipe of sources (names of supported websites) listed in their sitemaps, and of
+    every supported website linked from the collection pages, as soon as it is found, until limit urls. Sitemaps
+    and recipes modified before since (a datetime) are skipped, and so is anything robots.txt disallows. A website
+    that cannot be reached is logged and skipped
+    """
+    robots = robots or Robots()
+    frontier = Frontier(known)
+    log = log or (lambda message: None)
+
+    def new(urls):
+        for url in urls:
+            if limit is not None and frontier.found >= limit:
+                return
+            if recipe_source(canonical_url(url)) and robots.allowed(url):
+                url = frontier.add(url)
+                if url:
+                    yield url
+
+    for page in collections:
+        try:
+            yield from new(collection_links(page))
+        except Exception as e:
+            log("Could not read {} ({}: {})".format(page, e.__class__.__name__, e))
+
+    def sitemaps(home):
+        pending = list(reversed(robots.sitemaps(home) or [home + "/sitemap.xml"]))
+        visited = set()
+        while pending and (limit is None or frontier.found < limit):
+            sitemap = pending.pop()
+            if sitemap in visited or not robots.allowed(sitemap):
+                continue
+            visited.add(sitemap)
+            try:
+                is_index, entries = read_sitemap(sitemap)
+            except Exception as e:
+                log("Could not read {} ({}: {})".format(sitemap, e.__class__.__name__, e))
+                continue
+            entries = [url for url, modified in entries if since is None or modified is None or modified >= since]
+            if is_index:
+                # Depth first, in the order listed, so that recipes start flowing before every sitemap is read
+                pending.extend(reversed(entries))
+            else:
+                yield from new(entries)
+
+    for source in sources:
+        # A connection error (reading robots.txt, say) only ends the crawl of that website
+        try:
+            yield from sitemaps(SITE_HOMES[source])
+        except Exception as e:
+            log("Could not crawl {} ({}: {})".format(source, e.__class__.__name__, e))
+
+
+if __name__ == "__main__":
+
+    from create_latex import run_batch
+    from recipes import HTML_PARSERS
+
+    parser = argparse.ArgumentParser(description="Find new recipes in the supported websites' sitemaps and collection "
+                                                 "pages, and scrape and render them")
+
+    parser.add_argument("--source", type=str, action="append", choices=list(SITE_HOMES),
+                        help="Website whose sitemaps are crawled (repeat for several; default: all of them)")
+    parser.add_argument("--collection", type=str, action="append", default=[],
+                        help="Collection or listing page whose recipe links are crawled (repeatable)")
+    parser.add_argument("--no-sitemaps", action="store_true", help="Only crawl the collection pages")
+    parser.add_argument("--since", type=float, required=False,
+                        help="Only recipes (and sitemaps) modified in the last this many days, where sitemaps say")
+    parser.add_argument("--limit", type=int, required=False, help="Most new recipes to scrape")
+    parser.add_argument("--list", action="store_true", help="Print the new recipe urls instead of scraping them")
+    parser.add_argument("--type", type=str, required=False, help="Type of dish")
+    parser.add_argument("--root", type=str, default=os.getcwd(),
+                        help="Recipe library directory holding jsons/, images/ and pdfs/ (default: this directory)")
+    parser.add_argument("--workers", type=int, default=4, help="Number of recipes fetched at once")
+    parser.add_argument("--rate", type=float, default=0.5, help="Maximum requests per second to each website")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=HTML_PARSERS,
+                        help="BeautifulSoup tree builder used to parse recipe pages")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stop downloading a page once its recipe metadata has arrived")
+    parser.add_argument("--cache-dir", type=str, default=os.path.join(os.getcwd(), "cache"),
+                        help="Directory caching downloaded pages, sitemaps and images (empty string disables it)")
+    parser.add_argument("--cache-ttl", type=float, default=24,
+                        help="Hours before a cached page or sitemap is revalidated with the website")
+    parser.add_argument("--cache-size", type=float, default=500, help="Maximum size of the cache in MB")
+
+    args = parser.parse_args()
+
+    fetch.configure_cache(args.cache_dir, ttl=args.cache_ttl * 60 * 60, max_bytes=int(args.cache_size * 1024 * 1024))
+    fetch.set_rate_limit(args.rate)
+
+    since = datetime.now(timezone.utc) - timedelta(days=args.since) if args.since else None
+    urls = crawl([] if args.no_sitemaps else args.source or list(SITE_HOMES), args.collection, library_urls(args.root),
+                 since, args.limit, log=lambda message: print(message, file=sys.stderr))
+    if args.list:
+        for url in urls:
+            print(url)
+    else:
+        results = run_batch(urls, type=args.type, workers=args.workers, parser=args.parser, stream=args.stream,
+                            root=args.root)
+        if any(succeeded is False for succeeded, _ in results.values()):
+            sys.exit(1)
@@ -1,58 +1,170 @@
-from recipes import Recipe
+from recipes import Recipe, DuplicateRecipe, HTML_PARSERS, OVERWRITE_POLICIES, DUPLICATE_POLICIES
+from functools import partial
+import fetch
+import glob
+import images
+import metrics
 import re
-from pylatex import Document, Section, Subsection, Itemize, Command, NoEscape, Package, Figure, NewLine
-from pylatex.utils import bold
+import shutil
+import sys
 import os
 import argparse
 
+# Directory of precompiled preamble formats, or None to compile every recipe from scratch
+format_directory = None
+
+
 def frac(a, b):
-    return r"$\\frac{"+str(a)+"}{"+str(b)+"}$"
+    return r"$\frac{"+str(a)+"}{"+str(b)+"}$"
+
+def replacement_pattern(replacements):
+    # Longest tokens first so that e.g. "1 /2" is replaced as a whole
+    return re.compile("|".join(re.escape(token) for token in sorted(replacements, key=len, reverse=True)))
+
+# Unicode fractions, and ASCII fractions with or without a space before the slash
+FRACTIONS = {"¼": frac(1, 4), "⅓": frac(1, 3), "½": frac(1, 2), "⅔": frac(2, 3), "²⁄₃": frac(2, 3),
+             "¾": frac(3, 4), "⅛": frac(1, 8), "⅜": frac(3, 8), "⅝": frac(5, 8)}
+FRACTIONS.update({"{}{}/{}".format(a, space, b): frac(a, b) for space in ["", " "]
+                  for a, b in [(1, 4), (1, 3), (1, 2), (2, 3), (3, 4), (1, 8), (3, 8), (5, 8)]})
+SPECIAL_CHARACTERS = {"˚": r"$\degree$", "#": r"\#", "&": r"\&", "ồ": "o", "%": r"\%"}
+LATEX_REPLACEMENTS = {**FRACTIONS, **SPECIAL_CHARACTERS}
+
+FRACTIONS_PATTERN = replacement_pattern(FRACTIONS)
+SPECIAL_CHARACTERS_PATTERN = replacement_pattern(SPECIAL_CHARACTERS)
+LATEX_PATTERN = replacement_pattern(LATEX_REPLACEMENTS)
+
+def latex_replacement(match):
+    return LATEX_REPLACEMENTS[match.group(0)]
 
 def clean_fractions(text):
-    text = re.sub("¼", frac(1, 4), text)
-    text = re.sub("1( |)/4", frac(1, 4), text)
-    text = re.sub("⅓", frac(1, 3), text)
-    text = re.sub("1( |)/3", frac(1, 3), text)
-    text = re.sub("½", frac(1, 2), text)
-    text = re.sub("1( |)/2", frac(1, 2), text)
-    text = re.sub("⅔", frac(2, 3), text)
-    text = re.sub("²⁄₃", frac(2, 3), text)
-    text = re.sub("2( |)/3", frac(2, 3), text)
-    text = re.sub("¾", frac(3, 4), text)
-    text = re.sub("3( |)/4", frac(3, 4), text)
-    text = re.sub("⅛", frac(1, 8), text)
-    text = re.sub("1( |)/8", frac(1, 8), text)
-    text = re.sub("⅜", frac(3, 8), text)
-    text = re.sub("3( |)/8", frac(3, 8), text)
-    text = re.sub("⅝", frac(5, 8), text)
-    text = re.sub("5( |)/8", frac(5, 8), text)
-    return text
+    return FRACTIONS_PATTERN.sub(latex_replacement, text)
 
 def clean_special_characters(text):
-    text = re.sub("˚", r"$\\degree$", text)
-    text = re.sub("#", r"\\#", text)
-    text = re.sub("&", r"\\&", text)
-    text = re.sub("ồ", "o", text)
-    text = re.sub("%", r"\\%", text)
-    return text
+    return SPECIAL_CHARACTERS_PATTERN.sub(latex_replacement, text)
 
 def create_latex_friendly_text(text):
-    text = clean_fractions(text)
-    text = clean_special_characters(text)
-    return text
+    """
+    Replace fractions and characters LaTeX treats specially in a single scan of the text
+    """
+    return LATEX_PATTERN.sub(latex_replacement, text)
 
-def generate_latex(recipe):
+def create_latex_friendly_texts(texts):
     """
-    Takes a Recipe object containing necessary information about the recipe, then generates a latex
-    string & compiles to produce the pdf
+    create_latex_friendly_text for a whole list, scanning all the texts together
     """
-    # Set up initial document packages
+    if not texts or any("\0" in text for text in texts):
+        return [create_latex_friendly_text(text) for text in texts]
+    return create_latex_friendly_text("\0".join(texts)).split("\0")
+
+def create_document():
+    """
+    Empty document with the page layout and packages every recipe uses
+    """
+    from pylatex import Document, Package
     geometry_options = {"tmargin": "1cm", "lmargin": "2cm", "rmargin": "2cm", "bmargin": "1cm"}
     doc = Document(fontenc="T1", geometry_options=geometry_options)
     doc.packages.append(Package("amsmath"))
     doc.packages.append(Package("nopageno"))
     doc.packages.append(Package("gensymb"))
     doc.packages.append(Package("times"))
+    return doc
+
+def recipe_outline(recipe):
+    """
+    What every rendering of a recipe shows, in order and as plain text: its (label, time) pairs, then its
+    (heading, content) sections. Ingredients are (servings or None, [(group or None, ingredients)]), Preparation
+    is [(group or None, [(step, instruction)])], My Notes and Source are text
+    """
+    times = [(label, time) for label, time in [("Active Time", recipe.active_time), ("Total Time", recipe.total_time)]
+             if time]
+
+    if isinstance(recipe.ingredients, (list, tuple)):
+        ingredients = [(None, recipe.ingredients)]
+    else:
+        ingredients = list(recipe.ingredients.items())
+
+    # Steps are numbered across instruction groups (e.g. "Step 1" ... "Do ahead")
+    if isinstance(recipe.instructions, (list, tuple)):
+        preparation = [(None, [(recipe.steps[i], recipe.instructions[i]) for i in range(len(recipe.steps))])]
+    else:
+        preparation = []
+        i = 0
+        for group, instructions_list in recipe.instructions.items():
+            preparation.append((group, [(recipe.steps[i + j], ins) for j, ins in enumerate(instructions_list)]))
+            i += len(instructions_list)
+
+    sections = [("Ingredients", (recipe.servings if isinstance(recipe.servings, str) else None, ingredients)),
+                ("Preparation", preparation)]
+    if recipe.my_notes:
+        sections.append(("My Notes", recipe.my_notes))
+    if recipe.url:
+        sections.append(("Source", recipe.url))
+    return times, sections
+
+def add_recipe(doc, recipe, section=None, subsection=None):
+    """
+    Append the timing, ingredients, preparation steps, notes and source of a recipe, using the given sectioning
+    levels for its parts and steps (Section and Subsection by default)
+    """
+    from pylatex import Section, Subsection, Itemize, Command, NoEscape, NewLine
+    from pylatex.utils import bold
+    section = section or Section
+    subsection = subsection or Subsection
+    times, sections = recipe_outline(recipe)
+
+    # Add recipe timing (active & total), on one line
+    for label, time in times:
+        doc.append(Command("noindent"))
+        doc.append(bold(label + ": "))
+        doc.append(time + " " if label == "Active Time" else time)
+
+    for heading, content in sections:
+        with doc.create(section(heading, numbering=False)):
+            if heading == "Ingredients":
+                # Add list of ingredients, under their group names if they have them
+                servings, groups = content
+                if servings is not None:
+                    doc.append(bold(servings))
+                if groups and groups[0][0] is None:
+                    with doc.create(Itemize()) as itemize:
+                        for ingredient in create_latex_friendly_texts(groups[0][1]):
+                            itemize.add_item(NoEscape(ingredient))
+                else:
+                    doc.append(NewLine())
+                    doc.append(NewLine())
+                    for group, ingredient_list in groups:
+                        doc.append(bold(group))
+                        with doc.create(Itemize()) as itemize:
+                            for ingredient in create_latex_friendly_texts(ingredient_list):
+                                itemize.add_item(NoEscape(ingredient))
+            elif heading == "Preparation":
+                # Add preparation steps, inside their group's subsection if they have one
+                for group, steps in content:
+                    if group is None:
+                        add_steps(doc, steps, subsection)
+                    else:
+                        with doc.create(subsection(group, numbering=False)):
+                            add_steps(doc, steps, subsection)
+            else:
+                # Add optional notes and source URL
+                doc.append(content)
+
+def add_steps(doc, steps, subsection):
+    """
+    Append a subsection for each (step, instruction) pair
+    """
+    from pylatex import NoEscape
+    for step, instruction in steps:
+        with doc.create(subsection(step, numbering=False)):
+            doc.append(NoEscape(create_latex_friendly_text(instruction)))
+
+def recipe_document(recipe, image):
+    """
+    The complete LaTeX document of a single recipe, showing the image at the given path
+    """
+    from pylatex import Command, NoEscape, Figure
+    # Set up initial document packages
+    doc = create_document()
     doc.preamble.append(Command("title", recipe.title))
     if recipe.source:
         doc.preamble.append(Command("author", recipe.source))
@@ -61,91 +173,334 @@ def generate_latex(recipe):
 
     # Add image to recipe)
     with doc.create(Figure(position="h!")) as food_picture:
-        food_picture.add_image(recipe.title + ".png", width="240px")
+        food_picture.add_image(image, width="240px")
 
-    # Add recipe timing (active & total)
-    if recipe.active_time:
-        doc.append(Command("noindent"))
-        doc.append(bold("Active Time: "))
-        doc.append(recipe.active_time + " ")
-    if recipe.total_time:
-        doc.append(Command("noindent"))
-        doc.append(bold("Total Time: "))
-        doc.append(recipe.total_time)
-
-    # Add list of ingredients
-    with doc.create(Section("Ingredients", numbering=False)):
-        if isinstance(recipe.servings, str):
-            doc.append(bold(recipe.servings))
-        if isinstance(recipe.ingredients, list):
-            with doc.create(Itemize()) as itemize:
-                for ingredient in recipe.ingredients:
-                    itemize.add_item(NoEscape(create_latex_friendly_text(ingredient)))
-        else:
-            doc.append(NewLine())
-            doc.append(NewLine())
-            for group, ingredient_list in recipe.ingredients.items():
-                doc.append(bold(group))
-                with doc.create(Itemize()) as itemize:
-                    for ingredient in ingredient_list:
-                        itemize.add_item(NoEscape(create_latex_friendly_text(ingredient)))
-
-
-    # Add preparation steps
-    with doc.create(Section("Preparation", numbering=False)):
-        if isinstance(recipe.instructions, list):
-            for i in range(len(recipe.steps)):
-                with doc.create(Subsection(recipe.steps[i], numbering=False)):
-                    doc.append(NoEscape(create_latex_friendly_text(recipe.instructions[i])))
-        else:
-            i = 0
-            for group, instructions_list in recipe.instructions.items():
-                with doc.create(Subsection(group, numbering=False)):
-                    for ins in instructions_list:
-                        with doc.create(Subsection(recipe.steps[i], numbering=False)):
-                            doc.append(NoEscape(create_latex_friendly_text(ins)))
-                        i += 1
-
-    # Add optional notes
-    if recipe.my_notes:
-        with doc.create(Section("My Notes", numbering=False)):
-            doc.append(recipe.my_notes)
+    add_recipe(doc, recipe)
+    return doc
 
-    # Add source URL
-    if recipe.url:
-        with doc.create(Section("Source", numbering=False)):
-            doc.append(recipe.url)
+
+def configure_preamble_format(directory):
+    """
+    Compile recipes against a precompiled preamble format kept in directory (from scratch if directory is None)
+    """
+    global format_directory
+    format_directory = directory
+
+
+def fixed_preamble(doc):
+    """
+    The part of a document's preamble that is the same for every recipe: its class and packages
+    """
+    return doc.documentclass.dumps() + "%\n" + doc.dumps_packages() + "%\n"
+
+
+def preamble_format(doc, directory):
+    """
+    Path (without the .fmt extension) of a pdflatex format with doc's fixed preamble already loaded, dumped with
+    mylatexformat in directory the first time it is needed. Its name is a hash of the preamble and of the pdflatex
+    binary, so changing the template's packages or updating TeX builds a new format rather than using a stale one
+    """
+    # Only needed with a preamble format
+    import hashlib
+    import subprocess
+    import tempfile
+    pdflatex = shutil.which("pdflatex")
+    if pdflatex is None:
+        raise FileNotFoundError("pdflatex is needed to precompile the preamble")
+    preamble = fixed_preamble(doc)
+    key = hashlib.sha256("{}{}{}".format(preamble, os.path.realpath(pdflatex),
+                                         os.stat(pdflatex).st_mtime_ns).encode("utf-8")).hexdigest()[:16]
+    name = "recipe-" + key
+    path = os.path.join(directory, name)
+    if not os.path.isfile(path + ".fmt"):
+        os.makedirs(directory, exist_ok=True)
+        # Built in a directory of its own and renamed into place, so concurrent renders never see half a format
+        with tempfile.TemporaryDirectory(prefix=".build-", dir=directory) as build:
+            with open(os.path.join(build, "preamble.tex"), "w", encoding="utf-8") as f:
+                f.write(preamble + "\\csname endofdump\\endcsname\n\\begin{document}\n\\end{document}\n")
+            subprocess.run([pdflatex, "-ini", "-interaction=nonstopmode", "-jobname=" + name, "&pdflatex",
+                            "mylatexformat.ltx", "preamble.tex"], cwd=build, check=True, capture_output=True)
+            os.replace(os.path.join(build, name + ".fmt"), path + ".fmt")
+    return path
+
+
+def compile_pdf(doc, filepath):
+    """
+    Compile doc to filepath.pdf, against the precompiled preamble format if one is configured. The format skips
+    everything before \\endofdump, which is a no-op when compiling without it
+    """
+    if not format_directory:
+        doc.generate_pdf(filepath=filepath, clean_tex=True)
+        return
+    from pylatex import NoEscape
+    path = preamble_format(doc, format_directory)
+    doc.preamble.insert(0, NoEscape(r"\csname endofdump\endcsname"))
+    doc.generate_pdf(filepath=filepath, clean_tex=True, compiler="pdflatex", compiler_args=["-fmt=" + path])
+
+
+def generate_latex(recipe, image=None, directory=None):
+    """
+    Takes a Recipe object containing necessary information about the recipe, then generates a latex
+    string & compiles to produce the pdf in directory (the recipe library's pdfs/ by default). The image path is
+    relative to that directory and defaults to the recipe image downloaded there
+    """
+    directory = directory or os.path.join(recipe.root, "pdfs")
+    with metrics.stage("document"):
+        doc = recipe_document(recipe, image or os.path.basename(images.image_path(directory, recipe.title)))
 
     # Generate and save the final pdf document
-    doc.generate_pdf(filepath=str(os.path.join(os.getcwd(), "pdfs", recipe.title)), clean_tex=True)
+    with metrics.stage("compile"):
+        compile_pdf(doc, str(os.path.join(directory, recipe.title)))
+
+
+def load_recipes(directory, type=None, root=None):
+    """
+    All recipes saved as json files in directory (optionally only those of one type), sorted by title, belonging
+    to the library in root (the working directory by default)
+    """
+    recipes = [Recipe.load(path, root) for path in glob.glob(os.path.join(directory, "*.json"))]
+    if type:
+        recipes = [recipe for recipe in recipes if recipe.type == type]
+    return sorted(recipes, key=lambda recipe: recipe.title.lower())
+
+
+def generate_cookbook(recipes, title="Cookbook", root=None):
+    """
+    Compile many recipes into a single pdf in root's pdfs/ (the working directory's by default), one recipe per
+    page after a table of contents, with one LaTeX run instead of one per recipe
+    """
+    root = root or os.getcwd()
+    from pylatex import Section, Subsection, Subsubsection, Command, NoEscape, Figure
+    from pylatex.utils import italic
+    doc = create_document()
+    doc.preamble.append(Command("title", title))
+    doc.preamble.append(Command("date", ""))
+    doc.append(NoEscape(r"\maketitle"))
+    doc.append(NoEscape(r"\tableofcontents"))
+
+    for recipe in recipes:
+        doc.append(NoEscape(r"\clearpage"))
+        doc.append(Command("addcontentsline", arguments=["toc", "section", recipe.title]))
+        with doc.create(Section(recipe.title, numbering=False, label=False)):
+            if recipe.source:
+                doc.append(italic(recipe.source))
+            # The document is compiled in pdfs/, recipe images are kept in images/
+            image = images.image_path(os.path.join(root, "images"), recipe.title)
+            if os.path.isfile(image):
+                with doc.create(Figure(position="h!")) as food_picture:
+                    food_picture.add_image("../images/" + os.path.basename(image), width="240px")
+            # Every recipe has the same part names, so they get no (duplicate) labels
+            add_recipe(doc, recipe, section=partial(Subsection, label=False),
+                       subsection=partial(Subsubsection, label=False))
+
+    filepath = str(os.path.join(root, "pdfs", title))
+    if shutil.which("latexmk"):
+        doc.generate_pdf(filepath=filepath, clean_tex=True)
+    else:
+        # pdflatex needs a second pass to fill in the table of contents
+        doc.generate_pdf(filepath=filepath, clean=False, clean_tex=False, compiler="pdflatex")
+        doc.generate_pdf(filepath=filepath, clean_tex=True, compiler="pdflatex")
+
+
+def move_pdf(recipe, type=None):
+    """
+    Move the compiled pdf into its type folder and return where it ends up
+    """
+    type = type or recipe.type
+    pdfs = os.path.join(recipe.root, "pdfs")
+    if type:
+        os.makedirs(os.path.join(pdfs, type), exist_ok=True)
+        os.rename(os.path.join(pdfs, recipe.title + ".pdf"), os.path.join(pdfs, type, recipe.title + ".pdf"))
+        return os.path.join(pdfs, type, recipe.title + ".pdf")
+    return os.path.join(pdfs, recipe.title + ".pdf")
+
+
+def file_pdf(recipe, type=None):
+    """
+    Move the compiled pdf into its type folder and put the recipe image back in the images directory
+    """
+    move_pdf(recipe, type)
+    # Remove the downloaded recipe image
+    images.move(recipe.title, os.path.join(recipe.root, "pdfs"), os.path.join(recipe.root, "images"))
+
+
+def render_preview(recipe, format):
+    """
+    Save an html or Markdown preview of the recipe in previews/ instead of compiling its pdf
+    """
+    import preview
+    with metrics.stage("preview"):
+        return preview.file_preview(recipe, format)
+
+
+def read_urls(urls_file):
+    """
+    Read one url per line from a file (or stdin for "-"), skipping blanks, comments and repeats
+    """
+    if urls_file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(urls_file, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    urls = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#") and line not in urls:
+            urls.append(line)
+    return urls
+
+
+def scrape(url, source=None, type=None, parser="html.parser", overwrite="skip", stream=False, duplicates="skip",
+           root=None):
+    """
+    Worker task for batch mode: fetch and parse one recipe, failing instead of asking for missing information
+    """
+    with metrics.recipe(url):
+        return Recipe(url=url, source=source, type=type, parser=parser, interactive=False, overwrite=overwrite,
+                      root=root, stream=stream, duplicates=duplicates)
+
+
+def run_batch(urls, source=None, type=None, workers=8, parser="html.parser", overwrite="skip", stream=False,
+              duplicates="skip", preview=None, root=None):
+    """
+    Fetch and parse recipes concurrently, rendering each pdf (or preview, in the preview format given) as soon as
+    its recipe is ready, then print a summary of which urls succeeded. Recipes skipped as duplicates of saved ones
+    are not failures. urls can be any iterable, e.g. a crawl still discovering them: it is read only as fast as
+    recipes finish, with at most twice workers recipes waiting at once. Recipes are saved in the library in root
+    (the working directory by default)
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    results = {}
+    futures = {}
+
+    def finish(done):
+        for future in done:
+            url = futures.pop(future)
+            try:
+                recipe = future.result()
+                with metrics.recipe(url):
+                    if preview:
+                        render_preview(recipe, preview)
+                    else:
+                        generate_latex(recipe)
+                        file_pdf(recipe, type)
+                results[url] = (True, recipe.title)
+            except DuplicateRecipe as e:
+                results[url] = (None, str(e))
+            except Exception as e:
+                results[url] = (False, "{}: {}".format(e.__class__.__name__, e))
+
+    submitted = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for url in urls:
+            if url in results or url in futures.values():
+                continue
+            submitted.append(url)
+            futures[executor.submit(scrape, url, source, type, parser, overwrite, stream, duplicates, root)] = url
+            if len(futures) >= 2 * workers:
+                finish(wait(futures, return_when=FIRST_COMPLETED).done)
+        while futures:
+            finish(wait(futures, return_when=FIRST_COMPLETED).done)
+
+    failures = 0
+    for url in submitted:
+        succeeded, detail = results[url]
+        if succeeded:
+            print("OK      {} -> {}".format(url, detail))
+        elif succeeded is None:
+            print("SKIPPED {} ({})".format(url, detail))
+        else:
+            failures += 1
+            print("FAILED  {} ({})".format(url, detail))
+    print("{} of {} recipes succeeded".format(len(submitted) - failures, len(submitted)))
+    return results
 
 
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Enter a recipe URL")
 
-    parser.add_argument("--url", type=str, required=False, help="Bon Appetit, NY Times Cooking, or Serious Eats")
-    parser.add_argument("--file", type=str, required=False, help="Filename of existing recipe")
+    parser.add_argument("--url", type=str, required=False,
+                        help="Bon Appetit, NY Times Cooking, Serious Eats, or any page with schema.org recipe metadata")
+    parser.add_argument("--file", type=str, required=False,
+                        help="Filename of existing recipe, or its id or title in the library")
     parser.add_argument("--type", type=str, required=False, help="Type of dish")
     parser.add_argument("--source", type=str, required=False, help="Source of recipe")
+    parser.add_argument("--root", type=str, default=os.getcwd(),
+                        help="Recipe library directory holding jsons/, images/ and pdfs/ (default: this directory)")
+    parser.add_argument("--cookbook", type=str, required=False,
+                        help="Directory of recipe json files to compile into a single pdf (use --type to pick one type)")
+    parser.add_argument("--cookbook-title", type=str, default="Cookbook", help="Title and filename of the cookbook")
+    parser.add_argument("--urls-file", type=str, required=False,
+                        help="File with one recipe url per line (\"-\" reads from stdin) to process as a batch")
+    parser.add_argument("--workers", type=int, default=8, help="Number of recipes fetched at once in batch mode")
+    parser.add_argument("--rate", type=float, default=0.5,
+                        help="Maximum requests per second to each website in batch mode")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=HTML_PARSERS,
+                        help="BeautifulSoup tree builder used to parse recipe pages (lxml is the fastest)")
+    parser.add_argument("--cache-dir", type=str, default=os.path.join(os.getcwd(), "cache"),
+                        help="Directory caching downloaded pages and images (empty string disables the cache)")
+    parser.add_argument("--cache-ttl", type=float, default=24,
+                        help="Hours before a cached page is revalidated with the website")
+    parser.add_argument("--cache-size", type=float, default=500, help="Maximum size of the cache in MB")
+    parser.add_argument("--offline", action="store_true", help="Only use cached pages and images")
+    parser.add_argument("--timeout", type=float, default=30,
+                        help="Seconds to wait for a website to send data before retrying")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="Times to retry a download after a dropped connection, timeout or server error")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stop downloading a page once its recipe metadata has arrived, when the rest of the page "
+                             "is not needed")
+    parser.add_argument("--metrics", type=str, required=False,
+                        help="Append wall time, CPU time, bytes downloaded and peak memory of every stage of every "
+                             "recipe to this file as JSON lines (\"-\" writes them to standard error)")
+    parser.add_argument("--profile", type=str, required=False,
+                        help="Directory to save a cProfile dump of every stage of every recipe in")
+    parser.add_argument("--preamble-format", action="store_true",
+                        help="Compile against a precompiled preamble format (built in pdfs/.formats the first time, "
+                             "requires pdflatex with mylatexformat)")
+    parser.add_argument("--preview", type=str, required=False, choices=["html", "markdown"],
+                        help="Save an html or Markdown preview of each recipe in previews/ instead of its pdf, to "
+                             "review before rendering it with --file or build.py")
+    parser.add_argument("--overwrite", type=str, required=False, choices=OVERWRITE_POLICIES,
+                        help="What to do when the recipe's json file already exists (default: ask, or skip in batch "
+                             "mode); version keeps the old file in jsons/versions/")
+    parser.add_argument("--duplicates", type=str, required=False, choices=DUPLICATE_POLICIES,
+                        help="What to do when a new recipe is nearly the same as one saved under another title "
+                             "(default: ask, or skip in batch mode)")
 
     args = parser.parse_args()
 
-    # Create the recipe object from the url and generate the pdf
-    selected_recipe = Recipe(url=args.url, file=args.file, source=args.source, type=args.type)
-
-    generate_latex(selected_recipe)
-
-    if args.type:
-        if not os.path.exists(os.path.join(os.getcwd(), "pdfs", args.type)):
-            os.mkdir(os.path.join(os.getcwd(), "pdfs", args.type))
-        os.rename(os.path.join(os.getcwd(), "pdfs", selected_recipe.title + ".pdf"),
-                  os.path.join(os.getcwd(), "pdfs", args.type, selected_recipe.title + ".pdf"))
-    elif selected_recipe.type:
-        if not os.path.exists(os.path.join(os.getcwd(), "pdfs", selected_recipe.type)):
-            os.mkdir(os.path.join(os.getcwd(), "pdfs", selected_recipe.type))
-        os.rename(os.path.join(os.getcwd(), "pdfs", selected_recipe.title + ".pdf"),
-                  os.path.join(os.getcwd(), "pdfs", selected_recipe.type, selected_recipe.title + ".pdf"))
-    # Remove the downloaded recipe image
-    os.rename(os.path.join(os.getcwd(), "pdfs", selected_recipe.title + ".png"),
-              os.path.join(os.getcwd(), "images", selected_recipe.title + ".png"))
+    fetch.configure_cache(args.cache_dir, ttl=args.cache_ttl * 60 * 60, max_bytes=int(args.cache_size * 1024 * 1024),
+                          offline=args.offline)
+    fetch.configure_client(read_timeout=args.timeout, retries=args.retries)
+    metrics.configure(args.metrics, args.profile)
+    if args.preamble_format:
+        configure_preamble_format(os.path.join(args.root, "pdfs", ".formats"))
+
+    if args.cookbook:
+        generate_cookbook(load_recipes(args.cookbook, args.type, args.root), args.cookbook_title, args.root)
+    elif args.urls_file:
+        fetch.set_rate_limit(args.rate)
+        batch_results = run_batch(read_urls(args.urls_file), source=args.source, type=args.type,
+                                  workers=args.workers, parser=args.parser, overwrite=args.overwrite or "skip",
+                                  stream=args.stream, duplicates=args.duplicates or "skip", preview=args.preview,
+                                  root=args.root)
+        if any(succeeded is False for succeeded, _ in batch_results.values()):
+            sys.exit(1)
+    else:
+        # Create the recipe object from the url and generate the pdf
+        with metrics.recipe(args.url or args.file):
+            try:
+                selected_recipe = Recipe(url=args.url, file=args.file, source=args.source, type=args.type,
+                                         parser=args.parser, overwrite=args.overwrite or "ask", root=args.root,
+                                         stream=args.stream, duplicates=args.duplicates or "ask")
+            except DuplicateRecipe as e:
+                parser.exit(0, "Skipped: {}\n".format(e))
+
+            if args.preview:
+                print(render_preview(selected_recipe, args.preview))
+            else:
+                generate_latex(selected_recipe)
+
+                file_pdf(selected_recipe, args.type)
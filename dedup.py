@@ -0,0 +1,247 @@
+from collections import defaultdict
+import argparse
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+from pantry import ingredient_name
+from quantities import recipe_quantities
+
+# Signature length, and the bands it is split into for locality-sensitive hashing: two recipes share a bucket in
+# some band with probability 1 - (1 - s^8)^16 for Jaccard similarity s, i.e. almost surely above 0.8 and rarely
+# below 0.5
+PERMUTATIONS = 128
+BANDS = 16
+THRESHOLD = 0.7
+WORDS = re.compile(r"[a-z]+")
+# Signatures of the recipes in a directory are kept here between runs
+SIGNATURES_FILE = ".signatures.npz"
+
+
+def mix(values):
+    """
+    SplitMix64 finaliser: scrambles 64-bit integers so that the minimum of mix(seed ^ hash) over a set behaves like
+    the minimum of an independent random permutation for every seed
+    """
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def shingles(recipe):
+    """
+    Features of a recipe (or record) compared for near-duplicates: its normalised ingredient names and every run
+    of three words of its instructions. Titles are left out, since duplicates are the same recipe under another
+    title
+    """
+    features = {"i:" + name for name in map(ingredient_name, (ingredient["item"] for ingredient in
+                                                             recipe_quantities(recipe))) if name}
+    for instruction in recipe.instructions or []:
+        words = WORDS.findall(instruction.lower())
+        if words:
+            # Instructions shorter than three words are one feature
+            features.update("s:" + " ".join(words[i:i + 3]) for i in range(max(len(words) - 2, 1)))
+    return features
+
+
+class DuplicateIndex:
+    """
+    MinHash signatures of recipes, bucketed by band so that recipes likely to be near-duplicates of one another
+    are found by looking up BANDS buckets rather than comparing against every recipe
+    """
+
+    def __init__(self, permutations=PERMUTATIONS, bands=BANDS, seed=1):
+        self.seeds = np.random.default_rng(seed).integers(0, np.iinfo(np.uint64).max, permutations, dtype=np.uint64,
+                                                          endpoint=True)
+        self.bands = bands
+        self.rows = permutations // bands
+        self.keys = []
+        self.signatures = []
+        self.positions = {}
+        self.buckets = defaultdict(list)
+
+    def signature(self, recipe):
+        """
+        MinHash signature of a recipe, or None if it has nothing to compare
+        """
+        features = shingles(recipe)
+        if not features:
+            return None
+        hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint64,
+                             count=len(features))
+        # The low 32 bits of each minimum are kept: enough to tell minima apart, at half the size
+        return mix(self.seeds[:, None] ^ hashes[None, :]).min(axis=1).astype(np.uint32)
+
+    def band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, key, signature):
+        self.remove(key)
+        if signature is None:
+            return
+        position = len(self.keys)
+        self.keys.append(key)
+        self.signatures.append(signature)
+        self.positions[key] = position
+        for band_key in self.band_keys(signature):
+            self.buckets[band_key].append(position)
+
+    def remove(self, key):
+        # Removed recipes stay in their buckets but are no longer found
+        position = self.positions.pop(key, None)
+        if position is not None:
+            self.keys[position] = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def query(self, signature, threshold=THRESHOLD, exclude=None):
+        """
+        (key, estimated similarity) of the indexed recipes at least threshold similar to signature, most similar
+        first
+        """
+        if signature is None:
+            return []
+        candidates = {position for band_key in self.band_keys(signature)
+                      for position in self.buckets.get(band_key, [])}
+        matches = []
+        for position in candidates:
+            key = self.keys[position]
+            if key is None or key == exclude:
+                continue
+            similarity = float(np.mean(self.signatures[position] == signature))
+            if similarity >= threshold:
+                matches.append((key, similarity))
+        return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+    def duplicates(self, threshold=THRESHOLD):
+        """
+        Every pair of indexed recipes at least threshold similar, as (key, key, estimated similarity), most similar
+        first
+        """
+        pairs = set()
+        for positions in self.buckets.values():
+            live = [position for position in positions if self.keys[position] is not None]
+            pairs.update((first, second) for i, first in enumerate(live) for second in live[i + 1:])
+        found = []
+        for first, second in pairs:
+            similarity = float(np.mean(self.signatures[first] == self.signatures[second]))
+            if similarity >= threshold:
+                found.append((*sorted([self.keys[first], self.keys[second]]), similarity))
+        return sorted(found, key=lambda pair: (-pair[2], pair[0], pair[1]))
+
+
+class DirectoryIndex(DuplicateIndex):
+    """
+    DuplicateIndex of the recipe json files in a directory, keyed by title. Signatures are saved to
+    directory/.signatures.npz, and refresh only reads the files added or changed since
+    """
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+        self.modified = {}
+        path = os.path.join(directory, SIGNATURES_FILE)
+        if os.path.isfile(path):
+            with np.load(path) as saved:
+                if saved["signatures"].shape[1:] == (len(self.seeds),):
+                    for title, modified, empty, signature in zip(saved["titles"].tolist(), saved["modified"].tolist(),
+                                                                 saved["empty"].tolist(), saved["signatures"]):
+                        self.modified[title] = modified
+                        self.add(title, None if empty else signature)
+
+    def refresh(self):
+        """
+        Bring the index up to date with the directory, saving the signatures if any changed
+        """
+        from records import RecipeRecord
+        current = {}
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json") and entry.is_file():
+                    current[entry.name[:-len(".json")]] = entry.stat().st_mtime_ns
+        changed = [title for title, modified in current.items() if self.modified.get(title) != modified]
+        deleted = [title for title in self.modified if title not in current]
+        for title in deleted:
+            self.remove(title)
+            del self.modified[title]
+        for title in changed:
+            with open(os.path.join(self.directory, title + ".json"), encoding="utf-8") as f:
+                self.add(title, self.signature(RecipeRecord(json.load(f))))
+            self.modified[title] = current[title]
+        if changed or deleted:
+            self.save()
+        return self
+
+    def save(self):
+        titles = list(self.modified)
+        # Recipes with nothing to compare are kept too, so that they are not read again
+        empty = np.array([title not in self.positions for title in titles], dtype=bool)
+        signatures = np.zeros((len(titles), len(self.seeds)), dtype=np.uint32)
+        for row, title in enumerate(titles):
+            if title in self.positions:
+                signatures[row] = self.signatures[self.positions[title]]
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as f:
+            np.savez(f, titles=np.array(titles, dtype=str), signatures=signatures, empty=empty,
+                     modified=np.array([self.modified[title] for title in titles], dtype=np.int64))
+        os.replace(temporary, os.path.join(self.directory, SIGNATURES_FILE))
+
+
+# One index per directory for the life of the process, shared by the threads of a batch
+indexes = {}
+indexes_lock = threading.Lock()
+
+
+def find_duplicates(recipe, directory, threshold=THRESHOLD):
+    """
+    Saved recipes in directory with another title that recipe is at least threshold similar to, as (title,
+    estimated similarity), most similar first. The recipe is added to the index straight away, before its json
+    file is saved, so that a near duplicate checked by another thread meanwhile finds it; call unregister if it is
+    not saved after all
+    """
+    with indexes_lock:
+        directory = os.path.abspath(directory)
+        if directory not in indexes:
+            indexes[directory] = DirectoryIndex(directory)
+        index = indexes[directory].refresh()
+        signature = index.signature(recipe)
+        matches = index.query(signature, threshold, exclude=recipe.title)
+        index.add(recipe.title, signature)
+        return matches
+
+
+def unregister(title, directory):
+    """
+    Take a recipe that find_duplicates added but was not saved back out of directory's index. A json file already
+    saved under its title is read again by the next check
+    """
+    with indexes_lock:
+        index = indexes.get(os.path.abspath(directory))
+        if index is not None:
+            index.remove(title)
+            index.modified.pop(title, None)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Report recipes saved more than once under different titles")
+
+    parser.add_argument("directory", nargs="?", default=os.path.join(os.getcwd(), "jsons"),
+                        help="Directory of recipe json files")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Lowest estimated similarity (share of ingredients and instruction phrases in common) "
+                             "reported")
+
+    args = parser.parse_args()
+
+    index = DirectoryIndex(args.directory).refresh()
+    pairs = index.duplicates(args.threshold)
+    for first, second, similarity in pairs:
+        print("{:>4.0%}  {}  <->  {}".format(similarity, first, second))
+    print("{} likely duplicates among {} recipes".format(len(pairs), len(index)))
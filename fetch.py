@@ -0,0 +1,378 @@
+import metrics
+import codecs
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to `capacity` requests
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available, then take it
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def url_host(url):
+    """
+    Host (and port) of url
+    """
+    # Only imported by the first request, since it is slow to import
+    from urllib.parse import urlparse
+    return urlparse(url).netloc
+
+
+class HostRateLimiter:
+    """
+    Keeps one token bucket per host so that concurrent workers stay polite to each website
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        host = url_host(url)
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.capacity)
+            bucket = self.buckets[host]
+        bucket.acquire()
+
+    def limit(self, url, rate):
+        """
+        Hold url's host to at most rate requests per second, if that is slower than the rate of every host
+        """
+        host = url_host(url)
+        with self.lock:
+            if rate < self.rate and (host not in self.buckets or rate < self.buckets[host].rate):
+                self.buckets[host] = TokenBucket(rate, self.capacity)
+
+
+class CacheMiss(Exception):
+    pass
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ResponseCache:
+    """
+    On-disk cache of downloaded pages and images. Each body is stored once under the hash of its content in
+    `objects/`, and `entries/` holds one small json file per url with the validators (ETag/Last-Modified) and
+    timestamps used for expiry, revalidation and least-recently-used eviction
+    """
+
+    def __init__(self, directory, ttl=24 * 60 * 60, max_bytes=500 * 1024 * 1024, offline=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.size = None
+        os.makedirs(os.path.join(directory, "entries"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+
+    def entry_path(self, url):
+        return os.path.join(self.directory, "entries", hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest)
+
+    def lookup(self, url):
+        """
+        Cache entry for a url, or None if it has not been downloaded (or its body was evicted)
+        """
+        try:
+            with open(self.entry_path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isfile(self.object_path(entry["object"])):
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry["fetched"] < self.ttl
+
+    def validators(self, entry):
+        """
+        Conditional request headers that let the website answer 304 Not Modified
+        """
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, entry, revalidated=False):
+        with open(self.object_path(entry["object"]), "rb") as f:
+            body = f.read()
+        if self.offline:
+            # Nothing is added or evicted offline, and the cache may be read only (e.g. recorded test fixtures)
+            return body
+        entry["used"] = time.time()
+        if revalidated:
+            entry["fetched"] = entry["used"]
+        self.write_entry(entry)
+        return body
+
+    def store(self, url, body, headers):
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.object_path(digest)
+        added = 0
+        if not os.path.isfile(path):
+            self.write_atomic(path, body)
+            added = len(body)
+        now = time.time()
+        self.write_entry({"url": url, "object": digest, "size": len(body), "etag": headers.get("ETag"),
+                          "last_modified": headers.get("Last-Modified"), "fetched": now, "used": now})
+        with self.lock:
+            if self.size is None:
+                self.size = sum(os.path.getsize(os.path.join(self.directory, "objects", name))
+                                for name in os.listdir(os.path.join(self.directory, "objects")))
+            else:
+                self.size += added
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """
+        Drop the least recently used entries until the stored bodies fit within max_bytes
+        """
+        entries = []
+        for name in os.listdir(os.path.join(self.directory, "entries")):
+            try:
+                with open(os.path.join(self.directory, "entries", name), encoding="utf-8") as f:
+                    entries.append((json.load(f), name))
+            except (OSError, ValueError):
+                pass
+        entries.sort(key=lambda item: item[0]["used"])
+        references = {}
+        for entry, _ in entries:
+            references[entry["object"]] = references.get(entry["object"], 0) + 1
+        for entry, name in entries:
+            if self.size <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, "entries", name))
+            references[entry["object"]] -= 1
+            if references[entry["object"]] == 0 and os.path.isfile(self.object_path(entry["object"])):
+                self.size -= os.path.getsize(self.object_path(entry["object"]))
+                os.remove(self.object_path(entry["object"]))
+
+    def write_entry(self, entry):
+        self.write_atomic(self.entry_path(entry["url"]), json.dumps(entry).encode("utf-8"))
+
+    def write_atomic(self, path, data):
+        import tempfile
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(handle, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+
+rate_limiter = None
+cache = None
+client = None
+client_lock = threading.Lock()
+# Connections kept open to each website, seconds to wait for a connection and for data, and retries (with
+# backoff_factor * 2 ** retry seconds between them) of failed connections and of 429 and 5xx responses
+client_options = {"pool_size": 8, "connect_timeout": 10, "read_timeout": 30, "retries": 3, "backoff_factor": 0.5}
+
+
+def set_rate_limit(rate, burst=1):
+    """
+    Limit every host to `rate` requests per second (no limit if rate is 0 or None)
+    """
+    global rate_limiter
+    rate_limiter = HostRateLimiter(rate, burst) if rate else None
+
+
+def configure_cache(directory, ttl=24 * 60 * 60, max_bytes=500 * 1024 * 1024, offline=False):
+    """
+    Cache downloads in directory (no caching if directory is empty or None). In offline mode only cached
+    responses are used and a missing url raises CacheMiss
+    """
+    global cache
+    cache = ResponseCache(directory, ttl, max_bytes, offline) if directory else None
+
+
+def configure_client(**options):
+    """
+    Change the options of the shared HTTP client (see client_options); it is created again on its next use
+    """
+    global client
+    unknown = set(options) - set(client_options)
+    if unknown:
+        raise ValueError("Unknown client options: {}".format(", ".join(sorted(unknown))))
+    with client_lock:
+        client_options.update(options)
+        client = None
+
+
+def get_client():
+    """
+    The HTTP client shared by every download, which keeps connections to each website open between requests,
+    asks for compressed responses and retries failures
+    """
+    global client
+    with client_lock:
+        if client is None:
+            # urllib3 (and the http.client it uses) is only imported once something is downloaded
+            import urllib3
+            retries = urllib3.Retry(total=None, connect=client_options["retries"], read=client_options["retries"],
+                                    status=client_options["retries"], redirect=10,
+                                    backoff_factor=client_options["backoff_factor"],
+                                    status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+            client = urllib3.PoolManager(num_pools=16, maxsize=client_options["pool_size"], retries=retries,
+                                         timeout=urllib3.Timeout(connect=client_options["connect_timeout"],
+                                                                 read=client_options["read_timeout"]),
+                                         headers=urllib3.make_headers(accept_encoding=True))
+        return client
+
+
+def forget_client():
+    global client
+    client = None
+
+
+# Connections open in a parent process are not shared with its worker processes
+os.register_at_fork(after_in_child=forget_client)
+
+
+# Bytes read at a time when streaming a page
+CHUNK_SIZE = 16 * 1024
+
+
+def lookup(url):
+    """
+    The cache entry of url, and whether it can be used without asking the website. Offline, a url that is not
+    cached raises CacheMiss
+    """
+    entry = cache.lookup(url) if cache else None
+    if entry and (cache.offline or cache.is_fresh(entry)):
+        return entry, True
+    if cache and cache.offline:
+        raise CacheMiss("{} is not in the cache".format(url))
+    return entry, False
+
+
+def open_url(url, entry):
+    """
+    Response to a request for url (conditional on the cache entry, if any), with its body still to be read, or
+    None if the website answers that the cached body has not changed. Compressed bodies are decompressed as they
+    are read
+    """
+    response = get_client().request("GET", url, headers=cache.validators(entry) if cache else {},
+                                    preload_content=False, decode_content=True)
+    if response.status == 304 and entry:
+        response.release_conn()
+        return None
+    if response.status >= 400:
+        response.drain_conn()
+        response.release_conn()
+        raise DownloadError("{} {} for {}".format(response.status, response.reason, url))
+    return response
+
+
+def download(url):
+    """
+    Return the body of url, from the cache when it is fresh or the website confirms it has not changed
+    """
+    entry, usable = lookup(url)
+    if usable:
+        return cache.read(entry)
+
+    if rate_limiter:
+        with metrics.stage("rate_limit"):
+            rate_limiter.wait(url)
+    with metrics.stage("request"):
+        response = open_url(url, entry)
+        if response is None:
+            return cache.read(entry, revalidated=True)
+        body = response.read()
+        # Bytes as transferred, before decompression
+        metrics.add_bytes(response.tell())
+        # Keep the connection open for the next request to the website
+        response.release_conn()
+    if cache:
+        cache.store(url, body, response.headers)
+    return body
+
+
+def stream_page(url, done, chunk_size=CHUNK_SIZE):
+    """
+    Download a page chunk by chunk, passing each decoded chunk to done(text) as it arrives, and stop reading (closing
+    the connection rather than reading the rest to reuse it) as soon as done returns True. Returns the html read and
+    whether it is the whole page. Whole pages are cached like download() does; pages cut short are not
+    """
+    entry, usable = lookup(url)
+    if usable:
+        return cache.read(entry).decode("utf-8"), True
+
+    if rate_limiter:
+        with metrics.stage("rate_limit"):
+            rate_limiter.wait(url)
+    with metrics.stage("request"):
+        response = open_url(url, entry)
+        if response is None:
+            return cache.read(entry, revalidated=True).decode("utf-8"), True
+        # Characters split between chunks are decoded once the rest of their bytes arrive
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        chunks = []
+        texts = []
+        transferred = 0
+        for chunk in response.stream(chunk_size):
+            metrics.add_bytes(response.tell() - transferred)
+            transferred = response.tell()
+            chunks.append(chunk)
+            texts.append(decoder.decode(chunk))
+            if done(texts[-1]):
+                response.close()
+                return "".join(texts), False
+        response.release_conn()
+        texts.append(decoder.decode(b"", final=True))
+    if cache:
+        cache.store(url, b"".join(chunks), response.headers)
+    return "".join(texts), True
+
+
+def get_page(url):
+    """
+    Download a page and return the decoded html
+    """
+    return download(url).decode("utf-8")
+
+
+def get_image(url, filename):
+    """
+    Download an image and save it to filename
+    """
+    with open(filename, "wb") as f:
+        f.write(download(url))
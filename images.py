@@ -0,0 +1,171 @@
+from io import BytesIO
+import fetch
+import metrics
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+# The template shows recipe images 240px wide; twice that keeps them sharp when printed
+DISPLAY_WIDTH = 480
+JPEG_QUALITY = 85
+EXTENSIONS = [".jpg", ".png"]
+FORMATS = {".jpg": "JPEG", ".png": "PNG"}
+
+# Images are downloaded and resized in the background while their page is parsed, on a pool started by the first
+# image (concurrent.futures is slow to import)
+executor = None
+executor_lock = threading.Lock()
+
+
+def convert(data, width=DISPLAY_WIDTH):
+    """
+    Decode an image in any format Pillow reads (JPEG, PNG, WebP, GIF, ...), shrink it to width pixels wide and
+    re-encode it: as PNG if it has transparency, otherwise as JPEG. Returns the encoded bytes and their extension
+    """
+    from PIL import Image, ImageOps
+    with Image.open(BytesIO(data)) as image:
+        if image.width > width:
+            # JPEGs can be decoded straight at a reduced scale, which is much faster than decoding in full
+            image.draft(None, (width, round(image.height * width / image.width)))
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        output = BytesIO()
+        if image.mode in ["RGBA", "LA", "PA"] or "transparency" in image.info:
+            image.save(output, "PNG", optimize=True)
+            return output.getvalue(), ".png"
+        image.convert("RGB").save(output, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        return output.getvalue(), ".jpg"
+
+
+def fetch_image(url):
+    """
+    Download an image and convert it for the recipe template
+    """
+    with metrics.stage("image_download"):
+        data = fetch.download(url)
+    with metrics.stage("image_convert"):
+        return convert(data)
+
+
+def prefetch(url):
+    """
+    Start downloading and converting an image, returning a future for its bytes and extension
+    """
+    global executor
+    recipe = metrics.current_recipe()
+    with executor_lock:
+        if executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=4)
+
+    def task():
+        # Measured as part of the recipe being parsed in the thread that asked for the image
+        with metrics.recipe(recipe):
+            return fetch_image(url)
+    return executor.submit(task)
+
+
+def image_path(directory, title):
+    """
+    Path of the recipe image for title in directory, whichever format it was saved in (the original <title>.png
+    if there is none yet)
+    """
+    for extension in EXTENSIONS:
+        path = os.path.join(directory, title + extension)
+        if os.path.isfile(path):
+            return path
+    return os.path.join(directory, title + ".png")
+
+
+def store(data, extension, directory=None):
+    """
+    Save image bytes once under the hash of their content in the image store, so recipes sharing an image keep a
+    single copy of it. Returns the stored file's path
+    """
+    directory = directory or os.path.join(os.getcwd(), "images", "store")
+    path = os.path.join(directory, hashlib.sha256(data).hexdigest() + extension)
+    if not os.path.isfile(path):
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory)
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+    return path
+
+
+def save(image, directory, title, store_directory=None):
+    """
+    Save converted image bytes and extension as the recipe image for title in directory, linked to its copy in
+    the image store. Returns the image's path
+    """
+    data, extension = image
+    stored = store(data, extension, store_directory)
+    path = os.path.join(directory, title + extension)
+    for other in EXTENSIONS:
+        # An earlier image of the recipe in another format would otherwise be picked up instead
+        if os.path.isfile(os.path.join(directory, title + other)):
+            os.remove(os.path.join(directory, title + other))
+    try:
+        os.link(stored, path)
+    except OSError:
+        # Different filesystems, or no hard links
+        shutil.copyfile(stored, path)
+    return path
+
+
+def move(title, source, destination):
+    """
+    Move the recipe image for title from one directory to another, returning its new path (None if there is none)
+    """
+    path = image_path(source, title)
+    if not os.path.isfile(path):
+        return None
+    moved = os.path.join(destination, os.path.basename(path))
+    os.rename(path, moved)
+    return moved
+
+
+def convert_directory(directory):
+    """
+    Convert, shrink and deduplicate every recipe image already saved in directory, e.g. those saved as full size
+    <title>.png files before images were converted, into the image store of the library holding directory. Returns
+    the number of bytes saved
+    """
+    from PIL import Image
+    store_directory = os.path.join(os.path.dirname(os.path.abspath(directory)), "images", "store")
+    saved = 0
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        if not os.path.isfile(path):
+            continue
+        title, extension = os.path.splitext(os.path.basename(path))
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            with Image.open(BytesIO(data)) as image:
+                if image.width <= DISPLAY_WIDTH and FORMATS.get(extension) == image.format:
+                    # Already converted; converting again would only lose quality
+                    continue
+            image = convert(data)
+        except OSError:
+            print("Skipping {}, it is not an image".format(path))
+            continue
+        save(image, directory, title, store_directory)
+        saved += len(data) - len(image[0])
+    return saved
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Convert and shrink recipe images saved before image conversion")
+
+    parser.add_argument("directory", nargs="?", default=os.path.join(os.getcwd(), "images"),
+                        help="Directory of recipe images")
+
+    args = parser.parse_args()
+
+    print("Saved {:.1f} MB".format(convert_directory(args.directory) / 1024 / 1024))
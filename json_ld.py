@@ -0,0 +1,243 @@
+from html import unescape
+import json
+import re
+
+SCRIPT = re.compile(r"<script\b[^>]*application/ld\+json[^>]*>(.*?)</script\s*>", re.DOTALL | re.IGNORECASE)
+TITLE = re.compile(r"<title\b[^>]*>(.*?)</title\s*>", re.DOTALL | re.IGNORECASE)
+SCRIPT_START = re.compile(r"<script\b[^>]*application/ld\+json", re.IGNORECASE)
+TITLE_START = re.compile(r"<title\b", re.IGNORECASE)
+DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:\d+(?:\.\d+)?S)?)?$")
+MARKUP = re.compile(r"<[^>]+>")
+# Runs of spaces, tabs and no-break spaces (&nbsp;), but not line breaks, which separate instructions
+SPACES = re.compile(r"[^\S\n]+")
+DO_AHEAD = re.compile("Do ahead: ", re.IGNORECASE)
+# Longest end marker a PageScanner can find across the chunks of a download
+END_MARKER_LENGTH = 200
+
+
+def page_title(html):
+    """
+    Text of the page's <title> element, read without parsing the whole page
+    """
+    match = TITLE.search(html)
+    return unescape(match.group(1)) if match else None
+
+
+def find_recipe(html):
+    """
+    The schema.org Recipe object embedded in the page as application/ld+json, or None
+    """
+    for block in SCRIPT.findall(html):
+        recipe = block_recipe(block)
+        if recipe:
+            return recipe
+    return None
+
+
+def block_recipe(block):
+    """
+    The schema.org Recipe object in the text of one application/ld+json script, or None
+    """
+    try:
+        data = json.loads(block.strip(), strict=False)
+    except ValueError:
+        return None
+    return search(data)
+
+
+def resume_position(html, position, start):
+    """
+    Where to search a page that is still downloading for a complete element next time, after no complete element
+    was found from position: the first opening tag matching start, whose element is not complete yet, or else the
+    last "<", which may be the start of an opening tag cut off by the end of the download so far
+    """
+    match = start.search(html, position)
+    if match:
+        return match.start()
+    cut = html.rfind("<", position)
+    return cut if cut != -1 else len(html)
+
+
+class PageScanner:
+    """
+    Finds the page title, the schema.org Recipe and the end marker (a compiled pattern, if any) of a page while it
+    downloads, as soon as each is complete. Every part of the page is searched once, apart from elements still being
+    downloaded
+    """
+
+    def __init__(self, end=None):
+        self.html = ""
+        self.title = None
+        self.recipe = None
+        self.end = end
+        self.ended = False
+        self.title_position = 0
+        self.script_position = 0
+        self.end_position = 0
+
+    def feed(self, text):
+        self.html += text
+        if self.title is None:
+            match = TITLE.search(self.html, self.title_position)
+            if match:
+                self.title = unescape(match.group(1))
+            else:
+                self.title_position = resume_position(self.html, self.title_position, TITLE_START)
+        while self.recipe is None:
+            match = SCRIPT.search(self.html, self.script_position)
+            if not match:
+                self.script_position = resume_position(self.html, self.script_position, SCRIPT_START)
+                break
+            self.script_position = match.end()
+            self.recipe = block_recipe(match.group(1))
+        if self.end is not None and not self.ended:
+            self.ended = self.end.search(self.html, self.end_position) is not None
+            # A marker may be cut off by the end of the download so far
+            self.end_position = max(self.end_position, len(self.html) - END_MARKER_LENGTH)
+
+
+def search(data):
+    if isinstance(data, list):
+        for item in data:
+            recipe = search(item)
+            if recipe:
+                return recipe
+    elif isinstance(data, dict):
+        types = data.get("@type")
+        if types == "Recipe" or (isinstance(types, list) and "Recipe" in types):
+            return data
+        for key in ["@graph", "mainEntity"]:
+            if key in data:
+                recipe = search(data[key])
+                if recipe:
+                    return recipe
+    return None
+
+
+def text(value):
+    """
+    Plain text of a schema.org string, which may contain html tags and entities, with its spaces made single
+    plain spaces
+    """
+    return SPACES.sub(" ", unescape(MARKUP.sub(" ", value)))
+
+
+def format_duration(value):
+    """
+    Turn an ISO 8601 duration such as "PT1H45M" into "1 hour 45 minutes"
+    """
+    match = DURATION.match(value.strip()) if isinstance(value, str) else None
+    if not match:
+        return None
+    days, hours, minutes = [int(group or 0) for group in match.groups()]
+    hours += 24 * days
+    parts = []
+    if hours:
+        parts.append("{} hour{}".format(hours, "" if hours == 1 else "s"))
+    if minutes:
+        parts.append("{} minute{}".format(minutes, "" if minutes == 1 else "s"))
+    return " ".join(parts) or None
+
+
+def format_yield(value):
+    """
+    Servings text from recipeYield, which may be a number, a string or a list of both
+    """
+    if isinstance(value, list):
+        # Prefer a description such as "4 servings" over a bare number
+        described = [item for item in value if isinstance(item, str) and re.search("[a-zA-Z]", item)]
+        value = described[0] if described else (value[0] if value else None)
+    if value is None or value == "":
+        return None
+    servings = text(str(value)).strip()
+    if re.search(r"\d+$", servings) and not re.search("serv(es|ings)", servings, re.IGNORECASE):
+        servings += " servings"
+    return servings
+
+
+def instruction_list(value):
+    """
+    Flatten recipeInstructions (a string, HowToSteps, or HowToSections of HowToSteps) into a list of strings
+    """
+    if isinstance(value, str):
+        return [line for line in text(value).splitlines() if line.strip()]
+    instructions = []
+    for item in value or []:
+        if isinstance(item, str):
+            instructions.append(text(item))
+        elif isinstance(item, dict) and "itemListElement" in item:
+            instructions.extend(instruction_list(item["itemListElement"]))
+        elif isinstance(item, dict) and (item.get("text") or item.get("name")):
+            instructions.append(text(item.get("text") or item.get("name")))
+    return instructions
+
+
+def number_steps(instructions):
+    """
+    Label instructions "Step 1", "Step 2", ..., splitting out "Do ahead: " notes as their own unnumbered steps
+    """
+    steps = []
+    labelled = []
+    number = 1
+    for instruction in instructions:
+        parts = DO_AHEAD.split(instruction, maxsplit=1)
+        if len(parts) == 2 and DO_AHEAD.match(instruction):
+            steps.append("Do ahead")
+            labelled.append(parts[1])
+            continue
+        steps.append("Step {}".format(number))
+        labelled.append(parts[0])
+        number += 1
+        if len(parts) == 2:
+            steps.append("Do ahead")
+            labelled.append(parts[1])
+    return steps, labelled
+
+
+def image_url(value):
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get("url") or value.get("contentUrl")
+    return value if isinstance(value, str) and value else None
+
+
+def recipe_fields(html, url=""):
+    """
+    Recipe fields found in the page's schema.org metadata. Fields the metadata does not provide are left out
+    """
+    recipe = find_recipe(html)
+    if not recipe:
+        return {}
+    return fields_of(recipe, url)
+
+
+def fields_of(recipe, url=""):
+    """
+    Recipe fields of a schema.org Recipe object, leaving out those it does not provide
+    """
+    fields = {}
+    if recipe.get("name"):
+        fields["title"] = text(recipe["name"])
+    total_time = format_duration(recipe.get("totalTime"))
+    if total_time:
+        fields["total_time"] = total_time
+    servings = format_yield(recipe.get("recipeYield"))
+    if servings:
+        fields["servings"] = servings
+    ingredients = [text(ingredient) for ingredient in recipe.get("recipeIngredient") or []
+                   if isinstance(ingredient, str)]
+    if ingredients:
+        fields["ingredients"] = ingredients
+    instructions = instruction_list(recipe.get("recipeInstructions"))
+    if instructions:
+        fields["steps"], fields["instructions"] = number_steps(instructions)
+    if image_url(recipe.get("image")):
+        fields["image_url"] = image_url(recipe.get("image"))
+    publisher = recipe.get("publisher")
+    if isinstance(publisher, dict) and publisher.get("name"):
+        fields["source"] = text(publisher["name"])
+    elif url:
+        from urllib.parse import urlparse
+        fields["source"] = urlparse(url).netloc
+    return fields
@@ -0,0 +1,186 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+
+# Recipe fields that can be searched, in the order of the full-text index's columns
+SEARCH_FIELDS = ["title", "ingredients", "food_list", "instructions", "my_notes"]
+
+# Parts of a full-text query: quoted phrases, parentheses and everything between spaces
+QUERY_TOKENS = re.compile(r'"(?:[^"]|"")*"|[()]|[^\s()"]+')
+# Terms FTS5 reads as they are, with an optional prefix *
+BAREWORD = re.compile(r"^\w+\*?$")
+QUERY_OPERATORS = ["AND", "OR", "NOT"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE,
+    recipe TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5(
+    title, ingredients, food_list, instructions, my_notes,
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+"""
+
+
+def searchable_text(value):
+    """
+    Text of a recipe field for the search index: lists are one item per line, and grouped ingredients (a dict of
+    group name to list) include the group names
+    """
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        return "\n".join(group + "\n" + searchable_text(items) for group, items in value.items())
+    if isinstance(value, list):
+        return "\n".join(searchable_text(item) for item in value)
+    return str(value)
+
+
+class QueryError(Exception):
+    pass
+
+
+def fts_query(query):
+    """
+    Full-text query with each term FTS5 would read as syntax quoted as a phrase, e.g. gluten-free -> "gluten-free".
+    Column filters, operators, parentheses, quoted phrases and prefix searches are kept
+    """
+    tokens = []
+    for token in QUERY_TOKENS.findall(query):
+        column, colon, rest = token.partition(":")
+        if colon and column in SEARCH_FIELDS:
+            tokens.append(column + colon)
+            token = rest
+            if not token:
+                continue
+        if token.startswith('"') or token in ("(", ")") or token in QUERY_OPERATORS or BAREWORD.match(token):
+            tokens.append(token)
+        else:
+            tokens.append('"{}"'.format(token.rstrip("*").replace('"', '""')) + "*" * token.endswith("*"))
+    return " ".join(tokens)
+
+
+class Library:
+    """
+    Recipes kept in a SQLite database, with a full-text index over their titles, ingredients, instructions and
+    notes. Each recipe is stored as the same dict that is saved to its json file
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(os.getcwd(), "library.db")
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, recipe_dict):
+        """
+        Add a recipe, replacing any recipe with the same title, and return its id
+        """
+        with self.connection:
+            return self.insert(recipe_dict)
+
+    def insert(self, recipe_dict):
+        row = self.connection.execute("SELECT id FROM recipes WHERE title = ?", [recipe_dict["title"]]).fetchone()
+        recipe = json.dumps(recipe_dict, ensure_ascii=False)
+        if row:
+            recipe_id = row[0]
+            self.connection.execute("UPDATE recipes SET recipe = ? WHERE id = ?", [recipe, recipe_id])
+            self.connection.execute("DELETE FROM recipe_search WHERE rowid = ?", [recipe_id])
+        else:
+            recipe_id = self.connection.execute("INSERT INTO recipes (title, recipe) VALUES (?, ?)",
+                                                [recipe_dict["title"], recipe]).lastrowid
+        texts = [searchable_text(recipe_dict.get(field)) for field in SEARCH_FIELDS]
+        self.connection.execute("INSERT INTO recipe_search (rowid, {}) VALUES (?, ?, ?, ?, ?, ?)".format(
+            ", ".join(SEARCH_FIELDS)), [recipe_id] + texts)
+        return recipe_id
+
+    def import_directory(self, directory):
+        """
+        Add every recipe json file in directory in a single transaction, returning how many were imported
+        """
+        count = 0
+        with self.connection:
+            for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+                with open(path, encoding="utf-8") as f:
+                    self.insert(json.load(f))
+                count += 1
+        return count
+
+    def get(self, key):
+        """
+        The recipe dict with id or title key, or None. A key made of digits is tried as an id first
+        """
+        row = None
+        if isinstance(key, int) or key.isdigit():
+            row = self.connection.execute("SELECT recipe FROM recipes WHERE id = ?", [int(key)]).fetchone()
+        if row is None:
+            row = self.connection.execute("SELECT recipe FROM recipes WHERE title = ?", [str(key)]).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def urls(self):
+        """
+        Urls of every recipe in the library that has one
+        """
+        return {url for url, in self.connection.execute(
+            "SELECT json_extract(recipe, '$.url') FROM recipes WHERE json_extract(recipe, '$.url') != ''") if url}
+
+    def search(self, query, limit=20):
+        """
+        Ids and titles of the recipes best matching a full-text query, e.g. "miso", "miso pasta",
+        "ingredients: miso NOT instructions: bake", "choc*" or "gluten-free". Raises QueryError if the query is
+        still not valid FTS5 syntax, e.g. "(miso"
+        """
+        try:
+            return self.connection.execute(
+                "SELECT recipes.id, recipes.title FROM recipe_search JOIN recipes ON recipes.id = recipe_search.rowid "
+                "WHERE recipe_search MATCH ? ORDER BY rank LIMIT ?", [fts_query(query), limit]).fetchall()
+        except sqlite3.OperationalError as e:
+            raise QueryError("Invalid search {!r}: {}".format(query, e)) from e
+
+    def __len__(self):
+        return self.connection.execute("SELECT count(*) FROM recipes").fetchone()[0]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Import and search the recipe library")
+
+    parser.add_argument("--db", type=str, default=os.path.join(os.getcwd(), "library.db"),
+                        help="Library database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_command = commands.add_parser("import", help="Add (or update) every recipe json file in a directory")
+    import_command.add_argument("directory", nargs="?", default=os.path.join(os.getcwd(), "jsons"))
+    search_command = commands.add_parser("search", help="Full-text search over titles, ingredients, instructions "
+                                                        "and notes")
+    search_command.add_argument("query", type=str)
+    search_command.add_argument("--limit", type=int, default=20)
+    show_command = commands.add_parser("show", help="Print a recipe by id or title")
+    show_command.add_argument("recipe", type=str)
+
+    args = parser.parse_args()
+
+    library = Library(args.db)
+    if args.command == "import":
+        print("Imported {} recipes ({} in the library)".format(library.import_directory(args.directory),
+                                                               len(library)))
+    elif args.command == "search":
+        try:
+            results = library.search(args.query, args.limit)
+        except QueryError as e:
+            library.close()
+            parser.exit(1, "{}\n".format(e))
+        for recipe_id, title in results:
+            print("{:>6}  {}".format(recipe_id, title))
+    else:
+        recipe_dict = library.get(args.recipe)
+        if recipe_dict is None:
+            parser.exit(1, "No recipe {}\n".format(args.recipe))
+        print(json.dumps(recipe_dict, ensure_ascii=False, indent=4))
+    library.close()
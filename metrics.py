@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where peak memory is not reported
+    resource = None
+
+# Per thread: the recipe being worked on, bytes downloaded so far and whether a stage is being profiled
+local = threading.local()
+output = None
+profile_directory = None
+lock = threading.Lock()
+
+
+def configure(metrics_file=None, profile=None):
+    """
+    Record every pipeline stage as a JSON line in metrics_file ("-" for standard error), and/or save a cProfile
+    dump of every stage in the directory profile. Neither is recorded if both are empty or None
+    """
+    global output, profile_directory
+    if output not in [None, sys.stderr]:
+        output.close()
+    output = None
+    if metrics_file == "-":
+        output = sys.stderr
+    elif metrics_file:
+        output = open(metrics_file, "a", encoding="utf-8")
+    profile_directory = profile or None
+    if profile_directory:
+        os.makedirs(profile_directory, exist_ok=True)
+
+
+def enabled():
+    return output is not None or profile_directory is not None
+
+
+def peak_rss():
+    """
+    Peak resident memory of the process so far, in MB
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def add_bytes(count):
+    """
+    Count bytes downloaded by this thread
+    """
+    local.bytes = getattr(local, "bytes", 0) + count
+
+
+def current_recipe():
+    return getattr(local, "recipe", None)
+
+
+@contextmanager
+def recipe(name):
+    """
+    Attribute the stages run by this thread to the recipe name (e.g. its url)
+    """
+    previous = current_recipe()
+    local.recipe = name
+    try:
+        yield
+    finally:
+        local.recipe = previous
+
+
+@contextmanager
+def stage(name):
+    """
+    Measure wall time, CPU time of this thread, bytes downloaded and peak memory of one pipeline stage for the
+    current recipe, and write them as a JSON line
+    """
+    if not enabled():
+        yield
+        return
+    profiler = None
+    if profile_directory and not getattr(local, "profiling", False):
+        import cProfile
+        # Nested stages are part of the outer stage's profile
+        profiler = cProfile.Profile()
+        local.profiling = True
+        profiler.enable()
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    transferred = getattr(local, "bytes", 0)
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e.__class__.__name__
+        raise
+    finally:
+        record = {"recipe": current_recipe(), "stage": name, "wall": round(time.perf_counter() - wall, 6),
+                  "cpu": round(time.thread_time() - cpu, 6), "bytes": getattr(local, "bytes", 0) - transferred,
+                  "peak_rss_mb": peak_rss()}
+        if error:
+            record["error"] = error
+        if profiler:
+            profiler.disable()
+            local.profiling = False
+            profiler.dump_stats(os.path.join(profile_directory, "{}-{}-{}.prof".format(
+                re.sub(r"[^\w.-]+", "_", str(current_recipe()))[-80:], name, time.time_ns())))
+        if output is not None:
+            with lock:
+                output.write(json.dumps(record) + "\n")
+                output.flush()
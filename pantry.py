@@ -0,0 +1,218 @@
+import argparse
+import os
+import re
+
+import numpy as np
+
+from quantities import recipe_quantities
+
+# Ingredients every kitchen is assumed to have, counted as in the pantry unless --no-staples is given
+STAPLES = ["salt", "black pepper", "water"]
+
+# Words describing an ingredient's size, preparation or use rather than what it is
+DESCRIPTORS = {"large", "medium", "small", "extra-large", "fresh", "freshly", "chopped", "minced", "finely",
+               "coarsely", "roughly", "thinly", "sliced", "diced", "grated", "peeled", "crushed", "cracked", "ground",
+               "torn", "halved", "quartered", "trimmed", "rinsed", "drained", "softened", "melted", "cold", "warm",
+               "room-temperature", "unsalted", "salted", "kosher", "flaky", "extra-virgin", "virgin", "whole",
+               "boneless", "skinless", "skin-on", "packed", "lightly", "plus", "more", "about", "optional", "for",
+               "serving", "garnish", "to", "taste", "and", "of", "a", "an", "the", "leaves", "leaf"}
+NAME_CHARACTERS = re.compile(r"[^a-z\- ]+")
+# Names that are another ingredient's, e.g. when a unit is written after the item
+SYNONYMS = {"garlic clove": "garlic"}
+# Plural forms that singular() would get wrong
+UNCOUNTABLE = {"molasses", "hummus", "couscous", "asparagus", "swiss", "brussels", "grits", "oats", "greens",
+               "herbes", "chips", "noodles", "lentils", "chickpeas", "peas", "beans", "sprinkles"}
+
+
+def singular(word):
+    if word in UNCOUNTABLE or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith("s") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def ingredient_name(item):
+    """
+    Normalised name of an ingredient item (without its quantity and unit, see quantities.parse_ingredient), e.g.
+    "Large eggs" -> "egg", "garlic cloves" -> "garlic", "unsalted butter or ghee" -> "butter"
+    """
+    name = NAME_CHARACTERS.sub(" ", item.lower().split(" or ")[0])
+    words = [word.strip("-") for word in name.split() if word not in DESCRIPTORS]
+    words = [word for word in words if word]
+    if not words:
+        return ""
+    words[-1] = singular(words[-1])
+    name = " ".join(words)
+    return SYNONYMS.get(name, name)
+
+
+def recipe_ingredients(recipe):
+    """
+    Sorted normalised names of a recipe's (or record's) ingredients, from its food_list if it has one
+    """
+    items = recipe.food_list or [ingredient["item"] for ingredient in recipe_quantities(recipe)]
+    return sorted({name for name in map(ingredient_name, items) if name})
+
+
+class IngredientMatrix:
+    """
+    Sparse recipe x ingredient incidence matrix, kept both by recipe (the ingredients of recipe r are
+    indices[indptr[r]:indptr[r + 1]]) and by ingredient (the recipes using ingredient i are
+    recipes[ingredient_indptr[i]:ingredient_indptr[i + 1]]), so that pantry and co-occurrence queries only touch
+    the rows and columns they need, counted with np.bincount
+    """
+
+    def __init__(self, titles, vocabulary, indptr, indices):
+        self.titles = np.asarray(titles)
+        self.vocabulary = np.asarray(vocabulary)
+        self.ids = {name: number for number, name in enumerate(self.vocabulary.tolist())}
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.sizes = np.diff(self.indptr)
+        # Transpose: entries sorted by ingredient, keeping recipes in order within each ingredient
+        order = np.argsort(self.indices, kind="stable")
+        self.recipes = np.repeat(np.arange(len(self.titles), dtype=np.int32), self.sizes)[order]
+        self.ingredient_indptr = np.concatenate([[0], np.cumsum(np.bincount(self.indices,
+                                                                            minlength=len(self.vocabulary)))])
+
+    @classmethod
+    def from_recipes(cls, recipes):
+        titles = []
+        vocabulary = {}
+        indptr = [0]
+        indices = []
+        for recipe in recipes:
+            titles.append(recipe.title)
+            indices.extend(vocabulary.setdefault(name, len(vocabulary)) for name in recipe_ingredients(recipe))
+            indptr.append(len(indices))
+        return cls(titles, list(vocabulary), indptr, indices)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez_compressed(f, titles=self.titles, vocabulary=self.vocabulary, indptr=self.indptr,
+                                indices=self.indices)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays["titles"], arrays["vocabulary"], arrays["indptr"], arrays["indices"])
+
+    def __len__(self):
+        return len(self.titles)
+
+    def lookup(self, names):
+        """
+        Ingredient ids of names (normalised first), and the names that no recipe uses
+        """
+        ids = []
+        unknown = []
+        for name in names:
+            number = self.ids.get(ingredient_name(name))
+            if number is None:
+                unknown.append(name)
+            else:
+                ids.append(number)
+        return np.unique(np.array(ids, dtype=np.int32)), unknown
+
+    def users(self, ingredient):
+        return self.recipes[self.ingredient_indptr[ingredient]:self.ingredient_indptr[ingredient + 1]]
+
+    def cook(self, pantry, missing=2, limit=20, staples=STAPLES):
+        """
+        Recipes needing at most missing ingredients that are not in the pantry, as (title, share of its
+        ingredients in the pantry, names of those missing), best covered first
+        """
+        ids, _ = self.lookup(list(pantry) + list(staples))
+        users = np.concatenate([self.users(ingredient) for ingredient in ids] or [np.zeros(0, dtype=np.int32)])
+        have = np.bincount(users, minlength=len(self))
+        lacking = self.sizes - have
+        candidates = np.flatnonzero((lacking <= missing) & (self.sizes > 0))
+        coverage = have[candidates] / self.sizes[candidates]
+        # Highest coverage first, then fewest missing, then most ingredients in common
+        order = np.lexsort((-have[candidates], lacking[candidates], -coverage))[:limit]
+        results = []
+        for position, recipe in zip(order.tolist(), candidates[order].tolist()):
+            lacking_ids = np.setdiff1d(self.indices[self.indptr[recipe]:self.indptr[recipe + 1]], ids)
+            results.append((self.titles[recipe].item(), coverage[position].item(),
+                            self.vocabulary[lacking_ids].tolist()))
+        return results
+
+    def pairs(self, ingredient, limit=20):
+        """
+        Ingredients used most often in the same recipes as ingredient, as (name, number of recipes, share of
+        the recipes using ingredient)
+        """
+        ids, unknown = self.lookup([ingredient])
+        if unknown:
+            raise KeyError("No recipe uses {}".format(ingredient))
+        users = self.users(ids[0])
+        starts = self.indptr[users]
+        # Every entry of every row using the ingredient, gathered without a Python loop over the rows
+        lengths = self.sizes[users]
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        entries = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+        counts = np.bincount(self.indices[entries], minlength=len(self.vocabulary))
+        counts[ids[0]] = 0
+        order = np.argsort(-counts, kind="stable")[:limit]
+        return [(self.vocabulary[other].item(), counts[other].item(), counts[other].item() / len(users))
+                for other in order.tolist() if counts[other]]
+
+
+def load_recipes(source):
+    """
+    Records of every recipe in a directory of json files or a JSON Lines library
+    """
+    from records import RecipeLibrary, load_records
+    if os.path.isdir(source):
+        return load_records(source)
+    return RecipeLibrary(source)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Find recipes to cook with the ingredients at hand")
+
+    parser.add_argument("--matrix", type=str, default=os.path.join(os.getcwd(), "pantry.npz"),
+                        help="Recipe x ingredient matrix file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_command = commands.add_parser("build", help="Build the matrix from a directory of recipe json files or a "
+                                                      "JSON Lines library")
+    build_command.add_argument("source", nargs="?", default=os.path.join(os.getcwd(), "jsons"))
+    cook_command = commands.add_parser("cook", help="Recipes missing the fewest ingredients from a pantry")
+    cook_command.add_argument("ingredients", nargs="+", type=str)
+    cook_command.add_argument("--missing", type=int, default=2, help="Most ingredients a recipe may be missing")
+    cook_command.add_argument("--limit", type=int, default=20)
+    cook_command.add_argument("--no-staples", action="store_true",
+                              help="Do not assume {} are at hand".format(", ".join(STAPLES)))
+    pairs_command = commands.add_parser("pairs", help="Ingredients most often used together with an ingredient")
+    pairs_command.add_argument("ingredient", type=str)
+    pairs_command.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        matrix = IngredientMatrix.from_recipes(load_recipes(args.source))
+        matrix.save(args.matrix)
+        print("Indexed {} recipes with {} ingredients in {}".format(len(matrix), len(matrix.vocabulary), args.matrix))
+    elif args.command == "cook":
+        matrix = IngredientMatrix.load(args.matrix)
+        _, unknown = matrix.lookup(args.ingredients)
+        if unknown:
+            print("No recipe uses {}".format(", ".join(unknown)))
+        for title, coverage, lacking in matrix.cook(args.ingredients, args.missing, args.limit,
+                                                    [] if args.no_staples else STAPLES):
+            print("{:>4.0%}  {}{}".format(coverage, title, "  (missing {})".format(", ".join(lacking)) if lacking
+                                          else ""))
+    else:
+        matrix = IngredientMatrix.load(args.matrix)
+        try:
+            pairs = matrix.pairs(args.ingredient, args.limit)
+        except KeyError as e:
+            parser.exit(1, e.args[0] + "\n")
+        for name, count, share in pairs:
+            print("{:>6} {:>5.0%}  {}".format(count, share, name))
@@ -0,0 +1,210 @@
+from create_latex import recipe_outline
+import argparse
+import base64
+import glob
+import html
+import images
+import os
+import re
+import sys
+import time
+
+PREVIEW_FORMATS = ["html", "markdown"]
+EXTENSIONS = {"html": ".html", "markdown": ".md"}
+
+# Roughly the pdf's layout: a narrow page, the image at the size it is shown there and unnumbered headings
+STYLE = """body { font-family: "Times New Roman", Times, serif; max-width: 44em; margin: 2em auto; padding: 0 1em; }
+h1, .source { text-align: center; }
+.source { font-style: italic; }
+img { display: block; width: 240px; margin: 1em auto; }
+h2 { border-bottom: 1px solid #ccc; }
+h4 { margin-bottom: 0.2em; }"""
+
+# Characters Markdown would read as formatting
+MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]<>#|])")
+# Sources that are links rather than names
+WEB_ADDRESS = re.compile(r"https?://")
+
+
+def markdown_text(text):
+    """
+    Escape text so that Markdown shows it as it is
+    """
+    return MARKDOWN_SPECIAL.sub(r"\\\1", text)
+
+
+def image_uri(image):
+    """
+    The image file as a data: uri, so that an html preview needs no other file
+    """
+    import mimetypes
+    mimetype = mimetypes.guess_type(image)[0] or "image/jpeg"
+    with open(image, "rb") as f:
+        return "data:{};base64,{}".format(mimetype, base64.b64encode(f.read()).decode("ascii"))
+
+
+def to_html(recipe, image=None):
+    """
+    Standalone html page of a recipe, with the same parts as its pdf and the image (a path) embedded
+    """
+    text = html.escape
+    times, sections = recipe_outline(recipe)
+    lines = ["<!DOCTYPE html>", '<html lang="en">', "<head>", '<meta charset="utf-8">',
+             "<title>{}</title>".format(text(recipe.title)), "<style>", STYLE, "</style>", "</head>", "<body>",
+             "<h1>{}</h1>".format(text(recipe.title))]
+    if recipe.source:
+        lines.append('<p class="source">{}</p>'.format(text(recipe.source)))
+    if image:
+        lines.append('<img src="{}" alt="{}">'.format(image_uri(image), text(recipe.title)))
+    if times:
+        lines.append("<p>{}</p>".format(" ".join("<b>{}:</b> {}".format(label, text(time)) for label, time in times)))
+
+    for heading, content in sections:
+        lines.append("<h2>{}</h2>".format(heading))
+        if heading == "Ingredients":
+            servings, groups = content
+            if servings:
+                lines.append("<p><b>{}</b></p>".format(text(servings)))
+            for group, ingredient_list in groups:
+                if group is not None:
+                    lines.append("<p><b>{}</b></p>".format(text(group)))
+                lines.append("<ul>")
+                lines.extend("<li>{}</li>".format(text(ingredient)) for ingredient in ingredient_list)
+                lines.append("</ul>")
+        elif heading == "Preparation":
+            for group, steps in content:
+                if group is not None:
+                    lines.append("<h3>{}</h3>".format(text(group)))
+                for step, instruction in steps:
+                    lines.append("<{0}>{1}</{0}>".format("h3" if group is None else "h4", text(step)))
+                    lines.append("<p>{}</p>".format(text(instruction)))
+        elif heading == "Source" and WEB_ADDRESS.match(content):
+            lines.append('<p><a href="{0}">{0}</a></p>'.format(text(content)))
+        else:
+            lines.append("<p>{}</p>".format(text(content)))
+
+    lines.extend(["</body>", "</html>", ""])
+    return "\n".join(lines)
+
+
+def to_markdown(recipe, image=None):
+    """
+    Markdown document of a recipe, with the same parts as its pdf and a link to the image (a path or url)
+    """
+    text = markdown_text
+    times, sections = recipe_outline(recipe)
+    lines = ["# " + text(recipe.title), ""]
+    if recipe.source:
+        lines.extend(["*{}*".format(text(recipe.source)), ""])
+    if image:
+        lines.extend(["![{}](<{}>)".format(text(recipe.title), image.replace(os.sep, "/")), ""])
+    if times:
+        lines.extend([" ".join("**{}:** {}".format(label, text(time)) for label, time in times), ""])
+
+    for heading, content in sections:
+        lines.extend(["## " + heading, ""])
+        if heading == "Ingredients":
+            servings, groups = content
+            if servings:
+                lines.extend(["**{}**".format(text(servings)), ""])
+            for group, ingredient_list in groups:
+                if group is not None:
+                    lines.extend(["**{}**".format(text(group)), ""])
+                lines.extend("- " + text(ingredient) for ingredient in ingredient_list)
+                lines.append("")
+        elif heading == "Preparation":
+            for group, steps in content:
+                if group is not None:
+                    lines.extend(["### " + text(group), ""])
+                for step, instruction in steps:
+                    lines.extend(["{} {}".format("###" if group is None else "####", text(step)), "",
+                                  text(instruction), ""])
+        elif heading == "Source":
+            lines.extend(["<{}>".format(content), ""])
+        else:
+            lines.extend([text(content), ""])
+
+    return "\n".join(lines)
+
+
+def write_preview(recipe, format="html", directory=None, image=None):
+    """
+    Save the preview of a recipe as <title>.html or <title>.md in directory (the recipe library's previews/ by
+    default) and return its path. The image defaults to the recipe image saved in the library's images/
+    """
+    directory = directory or os.path.join(recipe.root, "previews")
+    os.makedirs(directory, exist_ok=True)
+    image = image or images.image_path(os.path.join(recipe.root, "images"), recipe.title)
+    if not os.path.isfile(image):
+        image = None
+    path = os.path.join(directory, recipe.title + EXTENSIONS[format])
+    with open(path, "w", encoding="utf-8") as f:
+        if format == "html":
+            f.write(to_html(recipe, image))
+        else:
+            f.write(to_markdown(recipe, image and os.path.relpath(image, directory)))
+    return path
+
+
+def file_preview(recipe, format="html"):
+    """
+    Put the downloaded recipe image in the images directory and save the recipe's preview, instead of its pdf
+    """
+    images.move(recipe.title, os.path.join(recipe.root, "pdfs"), os.path.join(recipe.root, "images"))
+    return write_preview(recipe, format)
+
+
+def write_index(paths, directory):
+    """
+    Html page linking to every preview in paths, to review a batch from
+    """
+    links = ['<li><a href="{}">{}</a></li>'.format(html.escape(os.path.relpath(path, directory)),
+                                                   html.escape(os.path.splitext(os.path.basename(path))[0]))
+             for path in paths]
+    path = os.path.join(directory, "index.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(["<!DOCTYPE html>", '<html lang="en">', "<head>", '<meta charset="utf-8">',
+                           "<title>Previews</title>", "<style>", STYLE, "</style>", "</head>", "<body>",
+                           "<h1>Previews</h1>", "<ul>"] + links + ["</ul>", "</body>", "</html>", ""]))
+    return path
+
+
+if __name__ == "__main__":
+
+    from recipes import Recipe
+
+    parser = argparse.ArgumentParser(description="Render saved recipes as html or Markdown previews, without LaTeX")
+
+    parser.add_argument("titles", nargs="*", help="Titles of the recipes to preview (default: every saved recipe)")
+    parser.add_argument("--root", type=str, default=os.getcwd(),
+                        help="Recipe library directory holding jsons/ and images/ (default: this directory)")
+    parser.add_argument("--jsons", type=str, required=False,
+                        help="Directory of recipe json files (default: the library's jsons/)")
+    parser.add_argument("--type", type=str, required=False, help="Only preview recipes of this type of dish")
+    parser.add_argument("--format", type=str, default="html", choices=PREVIEW_FORMATS, help="Preview format")
+    parser.add_argument("--output", type=str, required=False,
+                        help="Directory to save the previews in (default: the library's previews/; \"-\" prints them "
+                             "instead)")
+
+    args = parser.parse_args()
+    args.jsons = args.jsons or os.path.join(args.root, "jsons")
+    args.output = args.output or os.path.join(args.root, "previews")
+
+    start = time.perf_counter()
+    paths = [os.path.join(args.jsons, title + ".json") for title in args.titles] or \
+        sorted(glob.glob(os.path.join(args.jsons, "*.json")))
+    selected = [Recipe.load(path, args.root) for path in paths]
+    if args.type:
+        selected = [recipe for recipe in selected if recipe.type == args.type]
+
+    if args.output == "-":
+        for recipe in selected:
+            image = images.image_path(os.path.join(args.root, "images"), recipe.title)
+            image = image if os.path.isfile(image) else None
+            sys.stdout.write(to_html(recipe, image) if args.format == "html" else to_markdown(recipe, image))
+    else:
+        previews = [write_preview(recipe, args.format, args.output) for recipe in selected]
+        if args.format == "html" and len(previews) > 1:
+            write_index(previews, args.output)
+        print("Wrote {} previews to {} in {:.0f} ms".format(len(previews), args.output,
+                                                           (time.perf_counter() - start) * 1000))
@@ -0,0 +1,324 @@
+from fractions import Fraction
+import argparse
+import os
+import re
+
+# Unicode fractions, and the superscript/subscript digits of fractions such as ²⁄₃
+UNICODE_FRACTIONS = {"¼": 1 / 4, "½": 1 / 2, "¾": 3 / 4, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 1 / 8, "⅜": 3 / 8, "⅝": 5 / 8,
+                     "⅞": 7 / 8, "⅕": 1 / 5, "⅖": 2 / 5, "⅗": 3 / 5, "⅘": 4 / 5, "⅙": 1 / 6, "⅚": 5 / 6}
+SCRIPT_DIGITS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹₀₁₂₃₄₅₆₇₈₉⁄", "01234567890123456789/")
+
+# Spellings of each unit -> (unit, dimension, size in ml, g or the unit itself)
+UNITS = {"tsp": (["teaspoons", "teaspoon", "tsp"], "volume", 4.92892),
+         "tbsp": (["tablespoons", "tablespoon", "tbsp", "tbs"], "volume", 14.7868),
+         "fl oz": (["fluid ounces", "fluid ounce", "fl oz", "fl. oz"], "volume", 29.5735),
+         "cup": (["cups", "cup", "c"], "volume", 236.588),
+         "pint": (["pints", "pint", "pt"], "volume", 473.176),
+         "quart": (["quarts", "quart", "qt"], "volume", 946.353),
+         "gallon": (["gallons", "gallon", "gal"], "volume", 3785.41),
+         "ml": (["milliliters", "milliliter", "millilitres", "millilitre", "ml"], "volume", 1),
+         "l": (["liters", "liter", "litres", "litre", "l"], "volume", 1000),
+         "oz": (["ounces", "ounce", "oz"], "mass", 28.3495),
+         "lb": (["pounds", "pound", "lbs", "lb"], "mass", 453.592),
+         "g": (["grams", "gram", "g"], "mass", 1),
+         "kg": (["kilograms", "kilogram", "kg"], "mass", 1000),
+         "clove": (["cloves", "clove"], "count", 1),
+         "can": (["cans", "can"], "count", 1),
+         "pinch": (["pinches", "pinch"], "count", 1),
+         "dash": (["dashes", "dash"], "count", 1),
+         "sprig": (["sprigs", "sprig"], "count", 1),
+         "bunch": (["bunches", "bunch"], "count", 1),
+         "stick": (["sticks", "stick"], "count", 1),
+         "slice": (["slices", "slice"], "count", 1),
+         "head": (["heads", "head"], "count", 1),
+         "package": (["packages", "package", "pkg"], "count", 1),
+         "jar": (["jars", "jar"], "count", 1)}
+SPELLINGS = {spelling: unit for unit, (spellings, _, _) in UNITS.items() for spelling in spellings}
+
+NUMBER = r"(?:\d+\s*[{0}]|\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?|[{0}])".format("".join(UNICODE_FRACTIONS))
+QUANTITY = re.compile(r"\s*(?P<low>{0})(?:\s*(?:-|–|—|to|or)\s*(?P<high>{0}))?(?=[\s(]|$)".format(NUMBER))
+UNIT = re.compile(r"\s*(?P<unit>{})\.?(?=[\s,(]|$)".format("|".join(
+    re.escape(spelling) for spelling in sorted(SPELLINGS, key=len, reverse=True))), re.IGNORECASE)
+PARENTHESES = re.compile(r"\s*\(([^)]*)\)")
+OF = re.compile(r"^of\s+", re.IGNORECASE)
+SERVINGS = re.compile(r"\d+(?:\.\d+)?")
+
+# Units each system shows amounts in, and the smallest amount (in ml or g) shown in each
+DISPLAY_UNITS = {"us": {"volume": [("tsp", 0), ("tbsp", 14.7868), ("cup", 59.147), ("quart", 946.353)],
+                        "mass": [("oz", 0), ("lb", 453.592)]},
+                 "metric": {"volume": [("ml", 0), ("l", 1000)], "mass": [("g", 0), ("kg", 1000)]}}
+SYSTEMS = ["original"] + list(DISPLAY_UNITS)
+METRIC_UNITS = {"ml", "l", "g", "kg"}
+
+# Units by number, the first being no unit at all, as used by QuantityTable
+UNIT_NAMES = [None] + list(UNITS)
+UNIT_CODES = {unit: code for code, unit in enumerate(UNIT_NAMES)}
+DIMENSIONS = ["count", "volume", "mass"]
+
+
+def number(text):
+    """
+    Value of a quantity such as "2", "1.5", "1/2", "1 1/2", "½" or "1½", or None for a fraction over zero
+    """
+    text = text.strip()
+    if text[-1] in UNICODE_FRACTIONS:
+        return float(text[:-1] or 0) + UNICODE_FRACTIONS[text[-1]]
+    if "/" in text:
+        whole, _, fraction = text.rpartition(" ")
+        numerator, denominator = fraction.split("/")
+        if int(denominator) == 0:
+            return None
+        return float(whole or 0) + int(numerator) / int(denominator)
+    return float(text)
+
+
+def parse_ingredient(text):
+    """
+    Split an ingredient such as "1–2 Tbsp. olive oil (optional), divided" into its quantity (a [low, high]
+    range, or None), unit, item and note ("optional, divided")
+    """
+    rest = text.translate(SCRIPT_DIGITS).replace("\xa0", " ")
+    quantity = None
+    unit = None
+    notes = []
+    match = QUANTITY.match(rest)
+    low = number(match.group("low")) if match else None
+    high = number(match.group("high")) if match and match.group("high") else low
+    # e.g. "1/0 cup", which has no quantity that can be read
+    if low is not None and high is not None:
+        quantity = [low, high]
+        rest = rest[match.end():]
+        # e.g. "1 (14-oz.) can", where the size is a note on the unit
+        size = PARENTHESES.match(rest)
+        if size:
+            notes.append(size.group(1))
+            rest = rest[size.end():]
+        match = UNIT.match(rest)
+        if match:
+            unit = SPELLINGS[match.group("unit").lower().replace(".", "")]
+            rest = rest[match.end():]
+    notes.extend(PARENTHESES.findall(rest))
+    rest = PARENTHESES.sub("", rest)
+    item, _, note = rest.partition(",")
+    if note.strip():
+        notes.append(note.strip())
+    return {"quantity": quantity, "unit": unit, "item": OF.sub("", item.strip()), "note": ", ".join(notes) or None}
+
+
+def parse_ingredients(ingredients):
+    """
+    parse_ingredient for a recipe's ingredients, a list or a mapping of groups to lists, keeping the same shape
+    """
+    if ingredients is None:
+        return None
+    if isinstance(ingredients, (list, tuple)):
+        return [parse_ingredient(ingredient) for ingredient in ingredients]
+    return {group: parse_ingredients(group_ingredients) for group, group_ingredients in ingredients.items()}
+
+
+def recipe_quantities(recipe):
+    """
+    Parsed ingredients of a recipe (or record) as a flat list, parsing them if they were not saved with it
+    """
+    parsed = getattr(recipe, "quantities", None) or parse_ingredients(recipe.ingredients) or []
+    if isinstance(parsed, (list, tuple)):
+        return list(parsed)
+    return [ingredient for group in parsed.values() for ingredient in group]
+
+
+def serving_count(servings):
+    """
+    Number of servings in text such as "4 servings", "Serves 6" or "6 to 8 Servings" (the lowest), or None
+    """
+    match = SERVINGS.search(servings or "")
+    return float(match.group(0)) if match else None
+
+
+def format_number(value, unit):
+    if unit in METRIC_UNITS:
+        return "{:g}".format(round(value, 2 if value < 10 else 0))
+    # Cooks' fractions: nearest eighth
+    fraction = Fraction(round(value * 8), 8)
+    whole, part = divmod(fraction, 1)
+    if not fraction:
+        return "{:g}".format(round(value, 2))
+    text = str(whole) if whole else ""
+    if part:
+        text += ("{}/{}" if not whole else " {}/{}").format(part.numerator, part.denominator)
+    return text
+
+
+def unit_name(unit, value):
+    if unit is None or round(value, 2) <= 1 or UNITS[unit][1] != "count" and unit not in ["cup", "quart"]:
+        return unit or ""
+    return unit + ("es" if unit.endswith(("ch", "sh", "s")) else "s")
+
+
+def format_quantity(low, high, unit):
+    """
+    Text of an amount such as "1 1/2 cups" or "2-3 cloves"
+    """
+    if low != low:
+        # NaN: no quantity given
+        return ""
+    amount = format_number(low, unit)
+    if high != low:
+        amount += "-" + format_number(high, unit)
+    return " ".join(part for part in [amount, unit_name(unit, high)] if part)
+
+
+class QuantityTable:
+    """
+    Quantities of the ingredients of many recipes as numpy arrays (one row per ingredient), so that scaling to
+    a number of servings, converting units and adding up a shopping list are each a few array operations over
+    every ingredient at once
+    """
+
+    def __init__(self, recipe, low, high, unit, item, items, titles):
+        # Row -> recipe number, lowest and highest amounts (NaN without one), unit code and item number
+        self.recipe = recipe
+        self.low = low
+        self.high = high
+        self.unit = unit
+        self.item = item
+        self.items = items
+        self.titles = titles
+
+    @classmethod
+    def from_recipes(cls, recipes):
+        import numpy as np
+        recipe_numbers, lows, highs, units, item_numbers = [], [], [], [], []
+        items = {}
+        titles = []
+        for number, recipe in enumerate(recipes):
+            titles.append(recipe.title)
+            for ingredient in recipe_quantities(recipe):
+                quantity = ingredient["quantity"] or [np.nan, np.nan]
+                recipe_numbers.append(number)
+                lows.append(quantity[0])
+                highs.append(quantity[1])
+                units.append(UNIT_CODES[ingredient["unit"]])
+                item_numbers.append(items.setdefault(ingredient["item"].lower(), len(items)))
+        return cls(np.array(recipe_numbers, dtype=np.int32), np.array(lows, dtype=float),
+                   np.array(highs, dtype=float), np.array(units, dtype=np.int16),
+                   np.array(item_numbers, dtype=np.int32), list(items), titles)
+
+    def replace(self, **arrays):
+        fields = dict(vars(self))
+        fields.update(arrays)
+        return QuantityTable(**fields)
+
+    def scaled(self, factors):
+        """
+        Every amount multiplied by its recipe's factor (one per recipe, in order)
+        """
+        import numpy as np
+        factors = np.asarray(factors, dtype=float)[self.recipe]
+        return self.replace(low=self.low * factors, high=self.high * factors)
+
+    def converted(self, system="us"):
+        """
+        Amounts of weight and volume in the units of a system ("us" or "metric"), picking the largest unit each
+        amount is at least one (or a quarter cup) of. Other amounts keep their units
+        """
+        import numpy as np
+        if system == "original":
+            return self
+        sizes = np.array([1] + [size for _, _, size in UNITS.values()])
+        dimensions = np.array([0] + [DIMENSIONS.index(dimension) for _, dimension, _ in UNITS.values()])
+        base_low = self.low * sizes[self.unit]
+        base_high = self.high * sizes[self.unit]
+        unit = self.unit.copy()
+        for dimension, display in DISPLAY_UNITS[system].items():
+            rows = dimensions[self.unit] == DIMENSIONS.index(dimension)
+            codes = np.array([UNIT_CODES[name] for name, _ in display], dtype=np.int16)
+            smallest = np.array([threshold for _, threshold in display])
+            chosen = np.searchsorted(smallest, np.nan_to_num(base_low[rows]), side="right") - 1
+            unit[rows] = codes[np.maximum(chosen, 0)]
+        return self.replace(low=base_low / sizes[unit], high=base_high / sizes[unit], unit=unit)
+
+    def shopping_list(self, system="us"):
+        """
+        Total of each item over every row, adding up amounts of the same dimension (weight, volume, or each count
+        unit) whatever their units, as a table with one row per item and dimension in the units of system
+        """
+        import numpy as np
+        sizes = np.array([1] + [size for _, _, size in UNITS.values()])
+        # Weights and volumes add up in grams and ml, counts of different units (cans, cloves) separately
+        base_unit = np.array([0] + [code if dimension == "count" else UNIT_CODES[{"volume": "ml", "mass": "g"}[
+            dimension]] for code, (_, dimension, _) in enumerate(UNITS.values(), 1)], dtype=np.int16)[self.unit]
+        key = self.item.astype(np.int64) * len(UNIT_NAMES) + base_unit
+        keys, rows = np.unique(key, return_inverse=True)
+        has_amount = ~np.isnan(self.low)
+        low = np.bincount(rows, weights=np.where(has_amount, self.low * sizes[self.unit], 0), minlength=len(keys))
+        high = np.bincount(rows, weights=np.where(has_amount, self.high * sizes[self.unit], 0), minlength=len(keys))
+        # Items only ever listed without an amount (e.g. "Kosher salt") keep no amount
+        counted = np.bincount(rows, weights=has_amount, minlength=len(keys)) > 0
+        low[~counted] = np.nan
+        high[~counted] = np.nan
+        return QuantityTable(np.zeros(len(keys), dtype=np.int32), low, high,
+                             (keys % len(UNIT_NAMES)).astype(np.int16), (keys // len(UNIT_NAMES)).astype(np.int32),
+                             self.items, ["Shopping list"]).converted(system)
+
+    def amounts(self):
+        """
+        Text of the amount of every row, in order
+        """
+        return [format_quantity(low, high, UNIT_NAMES[unit])
+                for low, high, unit in zip(self.low.tolist(), self.high.tolist(), self.unit.tolist())]
+
+    def lines(self):
+        """
+        (item, amount text) of every row, sorted by item
+        """
+        return sorted(zip([self.items[item] for item in self.item.tolist()], self.amounts()))
+
+
+def plan(recipes, servings):
+    """
+    QuantityTable of recipes each scaled to a number of servings (one number for all, or one per recipe).
+    Recipes without a servings count are left as they are
+    """
+    table = QuantityTable.from_recipes(recipes)
+    if isinstance(servings, (int, float)):
+        servings = [servings] * len(recipes)
+    factors = [target / serving_count(recipe.servings) if target and serving_count(recipe.servings) else 1
+               for recipe, target in zip(recipes, servings)]
+    return table.scaled(factors)
+
+
+if __name__ == "__main__":
+
+    from recipes import Recipe
+
+    parser = argparse.ArgumentParser(description="Scale recipes to a number of servings and add up their shopping list")
+
+    parser.add_argument("titles", nargs="+", help="Titles of saved recipes (their json file names), optionally "
+                                                  "followed by :servings, e.g. \"Chili:8\"")
+    parser.add_argument("--servings", type=float, required=False, help="Servings to scale every recipe to")
+    parser.add_argument("--units", type=str, default="us", choices=SYSTEMS, help="Units to show amounts in")
+    parser.add_argument("--jsons", type=str, default=os.path.join(os.getcwd(), "jsons"),
+                        help="Directory of saved recipe json files")
+    parser.add_argument("--list", action="store_true", help="Print each recipe's scaled ingredients instead of the "
+                                                            "shopping list")
+
+    args = parser.parse_args()
+
+    recipes = []
+    targets = []
+    for title in args.titles:
+        name, _, target = title.partition(":")
+        recipes.append(Recipe.load(os.path.join(args.jsons, name + ".json")))
+        targets.append(float(target) if target else args.servings)
+
+    table = plan(recipes, targets)
+    if args.list:
+        amounts = iter(table.converted(args.units).amounts())
+        for recipe in recipes:
+            print(recipe.title)
+            for ingredient, amount in zip(recipe_quantities(recipe), amounts):
+                note = "({})".format(ingredient["note"]) if ingredient["note"] else ""
+                print("    " + " ".join(part for part in [amount, ingredient["item"], note] if part))
+    else:
+        for item, amount in table.shopping_list(args.units).lines():
+            print("{:<40} {}".format(item, amount))
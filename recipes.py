@@ -1,125 +1,362 @@
-from bs4 import BeautifulSoup
-from urllib.request import urlopen, urlretrieve
+from soup_index import SoupIndex
+import fetch
+import images
+import json_ld
+import metrics
+from contextlib import contextmanager
 import os
 import re
 import json
+import shutil
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where saves are still atomic but not locked
+    fcntl = None
+
+# Class and id patterns used by the site parsers, compiled once
+NYT_SERVINGS_CLASS = re.compile("ingredients_recipeYield_*")
+NYT_SERVINGS_TEXT_CLASS = re.compile("pantry--ui ingredients_fontOverride_*")
+NYT_INGREDIENTS_CLASS = re.compile("recipebody_ingredients-block_*")
+NYT_QUANTITY_CLASS = re.compile("ingredient_quantity_*")
+NYT_PREPARATION_CLASS = re.compile("recipebody_prep-block_*")
+NYT_STEP_NUMBER_CLASS = re.compile("pantry--ui-lg-strong preparation_stepNumber_*")
+NYT_TIPS_CLASS = re.compile("tips_tips_*")
+SE_HEADING_ID = re.compile("mntl-sc-block_*")
+
+# Markup none of the site parsers read: scripts (apart from schema.org metadata), styles, inline icons, embeds
+# (self-closing tags such as <svg/> have no content to cut)
+UNUSED_MARKUP = re.compile(r"<(script|style|svg|iframe|template)\b([^>]*)(?<!/)>[^<]*(?:<(?!/\1\s*>)[^<]*)*</\1\s*>",
+                           re.IGNORECASE)
+
+# Fields a recipe is parsed into
+RECIPE_FIELDS = ["title", "active_time", "total_time", "servings", "ingredients", "food_list", "steps", "instructions"]
+
+# Websites with their own parser. Their markup is always parsed and wins over the schema.org metadata, which has no
+# active times, ingredient groups, ingredient names, Tips or Notes and only standardised times and yields. So these
+# pages cost a full parse, as before the metadata was read, plus the (much cheaper) metadata read
+PARSED_SITES = ["Bon Appetit", "New York Times Cooking", "Serious Eats"]
+
+# What follows the part of each supported website's page that its parser reads: the ratings, reviews and comments.
+# --stream stops downloading there
+RECIPE_END_MARKERS = {"Bon Appetit": re.compile(r">\s*How would you rate\b"),
+                      "New York Times Cooking": re.compile(r">\s*(?:Cooking|Community) Notes\s*<"),
+                      "Serious Eats": re.compile(r">\s*Was this page helpful\?")}
+
+# Fields without which a recipe cannot be rendered
+REQUIRED_FIELDS = ["title", "ingredients", "instructions"]
+
+# What to do when a recipe's json file already exists
+OVERWRITE_POLICIES = ["ask", "skip", "overwrite", "version"]
+
+# What to do with a new recipe that is nearly the same as one saved under another title
+DUPLICATE_POLICIES = ["ignore", "warn", "ask", "skip"]
+
+# BeautifulSoup tree builders that can be chosen with parser=; lxml is the fastest
+HTML_PARSERS = ["html.parser", "lxml"]
+
+REPEATED_SPACES = re.compile(" {2,}")
+EDITORS_NOTE = "Editor’s note: "
+
+class DuplicateRecipe(Exception):
+    pass
 
 def clean_text(text):
-    text = re.sub("\n", " ", text)
-    text = re.sub("\xa0", "", text)
-    text = text.split("Editor’s note: ")[0]
+    # Plain string operations are much cheaper than a regex pass for single characters
+    text = text.replace("\n", " ").replace("\xa0", "")
+    editors_note = text.find(EDITORS_NOTE)
+    if editors_note != -1:
+        text = text[:editors_note]
     text = text.strip()
-    text = re.sub(" {2,}", " ", text)
-    return text
+    return REPEATED_SPACES.sub(" ", text) if "  " in text else text
+
+def clean_texts(texts):
+    return [clean_text(text) for text in texts]
+
+def slice_html(html):
+    """
+    Cut markup the site parsers never look at out of the page before it is parsed
+    """
+    return UNUSED_MARKUP.sub(keep_json_ld, html)
+
+def keep_json_ld(match):
+    if match.group(1).lower() == "script" and "application/ld+json" in match.group(2):
+        return match.group(0)
+    return ""
+
+def title_from_page(source, page_title):
+    """
+    Recipe title from the text of a supported website's <title> element
+    """
+    if source == "Bon Appetit":
+        return clean_text(page_title.split(" | ")[0])
+    elif source == "New York Times Cooking":
+        return page_title.split(" - ")[0].replace(" Recipe", "")
+    else:
+        return page_title.replace(" Recipe", "")
+
+def source_from_url(url):
+    """
+    Name of the supported website a recipe url belongs to, or an empty string
+    """
+    if "bonappetit" in url:
+        return "Bon Appetit"
+    elif "nytimes" in url:
+        return "New York Times Cooking"
+    elif "seriouseats" in url:
+        return "Serious Eats"
+    return ""
+
+def parse_quantities(ingredients):
+    """
+    Structured quantities of the ingredients (see quantities.parse_ingredients), whose parser is only imported once
+    a recipe needs it
+    """
+    import quantities
+    return quantities.parse_ingredients(ingredients)
 
 class Recipe:
 
-    def __init__(self, url="", file="", source="", type=""):
+    def __init__(self, url="", file="", source="", type="", parser="html.parser", interactive=True, overwrite="ask",
+                 root=None, stream=False, duplicates="ignore"):
+
+        # Library root holding the jsons/, images/ and pdfs/ directories
+        self.root = root or os.getcwd()
 
         if file:
-            recipe_dict = json.load(open(os.path.join(os.getcwd(), "jsons", file + ".json")))
-            self.url = recipe_dict["url"]
-            self.source = recipe_dict["source"]
-            self.title = recipe_dict["title"]
-            self.active_time = recipe_dict["active_time"]
-            self.total_time = recipe_dict["total_time"]
-            self.servings = recipe_dict["servings"]
-            self.ingredients = recipe_dict["ingredients"]
-            self.food_list = recipe_dict["food_list"]
-            self.steps = recipe_dict["steps"]
-            self.instructions = recipe_dict["instructions"]
-            if "my_notes" in recipe_dict.keys():
-                self.my_notes = recipe_dict["my_notes"]
-            else:
-                self.my_notes = None
-            if "type" in recipe_dict.keys():
-                self.type = recipe_dict["type"]
-            else:
-                self.type = None
+            recipe_dict = None
+            if os.path.isfile(os.path.join(self.root, "jsons", file + ".json")):
+                recipe_dict = json.load(open(os.path.join(self.root, "jsons", file + ".json")))
+            elif os.path.isfile(os.path.join(self.root, "library.db")):
+                # Not saved as json here; look the recipe up in the library by id or title
+                from library import Library
+                store = Library(os.path.join(self.root, "library.db"))
+                recipe_dict = store.get(file)
+                store.close()
+            if recipe_dict is None:
+                raise FileNotFoundError("No json file or library recipe called {}".format(file))
+            self.set_fields(recipe_dict)
 
             # Transfer file to pdf folder
-            os.rename(os.path.join(os.getcwd(), "images", self.title + ".png"),
-                      os.path.join(os.getcwd(), "pdfs", self.title + ".png"))
+            if not images.move(self.title, os.path.join(self.root, "images"), os.path.join(self.root, "pdfs")):
+                raise FileNotFoundError(images.image_path(os.path.join(self.root, "images"), self.title))
 
         else:
             self.url = url
-            if "bonappetit" in self.url:
-                self.source = "Bon Appetit"
-            elif "nytimes" in self.url:
-                self.source = "New York Times Cooking"
-            elif "seriouseats" in self.url:
-                self.source = "Serious Eats"
-            else:
-                self.source = source
+            self.source = source_from_url(self.url) or source
             self.type = type
             self.title = None
             self.active_time = None
             self.total_time = None
             self.soup = None
+            self.index = None
             self.servings = None
             self.ingredients = None
             self.food_list = None
             self.steps = None
             self.instructions = None
             self.my_notes = None
-            self.pull_data()
+            self.pull_data(parser, interactive, stream)
+            if duplicates != "ignore":
+                with metrics.stage("dedup"):
+                    self.check_duplicates(duplicates)
 
         # Save json file
-        self.to_json()
-
-    def pull_data(self):
+        saved = None
+        try:
+            with metrics.stage("save"):
+                saved = self.to_json(overwrite)
+        finally:
+            if saved is None and not file and duplicates != "ignore":
+                # Added to the duplicate index by check_duplicates, but not saved
+                import dedup
+                dedup.unregister(self.title, os.path.join(self.root, "jsons"))
+
+    @classmethod
+    def load(cls, path, root=None):
         """
-        Pull html from website to parse recipe
+        Recipe from a saved json file, without moving its image or saving the json again
         """
-
-        if self.source in ["Bon Appetit", "New York Times Cooking", "Serious Eats"]:
-            page = urlopen(self.url)
-            html = page.read().decode("utf-8")
-            self.soup = BeautifulSoup(html, "html.parser")
-
-        if self.source == "Bon Appetit":
-            self.parse_bon_appetit()
-        elif self.source == "New York Times Cooking":
-            self.parse_nyt_cooking()
-        elif self.source == "Serious Eats":
-            self.parse_serious_eats()
+        recipe = cls.__new__(cls)
+        recipe.root = root or os.getcwd()
+        with open(path, encoding="utf-8") as f:
+            recipe.set_fields(json.load(f))
+        return recipe
+
+    def set_fields(self, recipe_dict):
+        self.url = recipe_dict["url"]
+        self.source = recipe_dict["source"]
+        self.title = recipe_dict["title"]
+        self.active_time = recipe_dict["active_time"]
+        self.total_time = recipe_dict["total_time"]
+        self.servings = recipe_dict["servings"]
+        self.ingredients = recipe_dict["ingredients"]
+        # Recipes saved before quantities were parsed have none stored
+        self.quantities = recipe_dict.get("quantities") or parse_quantities(self.ingredients)
+        self.food_list = recipe_dict["food_list"]
+        self.steps = recipe_dict["steps"]
+        self.instructions = recipe_dict["instructions"]
+        if "my_notes" in recipe_dict.keys():
+            self.my_notes = recipe_dict["my_notes"]
+        else:
+            self.my_notes = None
+        if "type" in recipe_dict.keys():
+            self.type = recipe_dict["type"]
         else:
+            self.type = None
+
+    def pull_data(self, parser="html.parser", interactive=True, stream=False):
+        """
+        Pull html from website to parse recipe. The page's schema.org metadata is read first. The pages of the
+        supported websites are then parsed in full as well (there is no fast path for them), and the metadata only
+        fills in the fields their parser did not find; other websites' recipes come from the metadata alone. Without either, the recipe is entered by hand (or
+        a ValueError is raised if interactive is False). With stream, the download stops as soon as what is read of
+        the page has arrived: the end of the recipe on the supported websites, and the metadata on others
+        """
+        if self.url:
+            with metrics.stage("page"):
+                if stream:
+                    scanner = json_ld.PageScanner(RECIPE_END_MARKERS.get(self.source))
+
+                    def done(text):
+                        scanner.feed(text)
+                        return self.metadata_complete(scanner)
+                    html, complete = fetch.stream_page(self.url, done)
+                else:
+                    html, complete = fetch.get_page(self.url), True
+            with metrics.stage("metadata"):
+                image_url = self.parse_json_ld(html)
+            # The metadata image is downloaded and converted while the page is parsed
+            image = images.prefetch(image_url) if image_url else None
+            if self.source in PARSED_SITES:
+                from_metadata = {field: getattr(self, field) for field in RECIPE_FIELDS
+                                 if getattr(self, field) is not None}
+                try:
+                    page_image_url = self.parse_site(html, complete, parser)
+                    # The metadata image is usually the full size original, which is now shrunk locally
+                    image_url = image_url or page_image_url
+                except Exception:
+                    if any(field not in from_metadata for field in REQUIRED_FIELDS):
+                        raise
+                    print("Could not parse the page of {}, using its metadata only".format(self.url))
+                    for field in RECIPE_FIELDS:
+                        setattr(self, field, None)
+                for field, value in from_metadata.items():
+                    if getattr(self, field) is None:
+                        setattr(self, field, value)
+            if image_url:
+                image = image or images.prefetch(image_url)
+                with metrics.stage("image"):
+                    images.save(image.result(), os.path.join(self.root, "pdfs"), self.title,
+                                os.path.join(self.root, "images", "store"))
+
+        if any(getattr(self, field) is None for field in REQUIRED_FIELDS):
+            if not interactive:
+                raise ValueError("Could not find a recipe at {}".format(self.url or "an empty url"))
             self.enter_information_manually()
+        self.quantities = parse_quantities(self.ingredients)
+
+    def metadata_complete(self, scanner):
+        """
+        Whether the part of the page scanned so far has everything pull_data would read from the whole page: up to
+        the end of the recipe on the supported websites, whose markup is parsed, and the schema.org Recipe on others
+        """
+        if self.source in PARSED_SITES:
+            return scanner.ended
+        return scanner.recipe is not None
+
+    def parse_site(self, html, complete, parser="html.parser"):
+        """
+        Run the website's parser on an empty recipe, so that whatever it finds wins, and return the image url. A page
+        cut short at its end of recipe marker is downloaded in full if its parser fails or misses a required field
+        there, in case the website moved the marker before the recipe
+        """
+        for field in RECIPE_FIELDS:
+            setattr(self, field, None)
+        if not complete:
+            try:
+                image_url = self.parse_html(html, parser)
+                if all(getattr(self, field) is not None for field in REQUIRED_FIELDS):
+                    return image_url
+            except Exception:
+                pass
+            with metrics.stage("page"):
+                html = fetch.get_page(self.url)
+            for field in RECIPE_FIELDS:
+                setattr(self, field, None)
+        return self.parse_html(html, parser)
+
+    def parse_json_ld(self, html):
+        """
+        Fill in the fields found in the page's schema.org Recipe metadata and return its image url
+        """
+        fields = json_ld.recipe_fields(html, self.url)
+        if not fields:
+            return None
+        if self.source in PARSED_SITES and json_ld.page_title(html):
+            # Keep titles (and so file names) the same as when they are read from the page
+            self.title = title_from_page(self.source, json_ld.page_title(html))
+        elif "title" in fields:
+            self.title = clean_text(fields["title"])
+        if not self.source and "source" in fields:
+            self.source = fields["source"]
+        self.total_time = fields.get("total_time")
+        self.servings = fields.get("servings")
+        if "ingredients" in fields:
+            self.ingredients = clean_texts(fields["ingredients"])
+        if "instructions" in fields:
+            self.steps = fields["steps"]
+            self.instructions = clean_texts(fields["instructions"])
+        return fields.get("image_url")
+
+    def parse_html(self, html, parser="html.parser"):
+        """
+        Build the soup (with the chosen BeautifulSoup tree builder) from the recipe-relevant part of the page and
+        index it, then run the parser for the recipe's website and return the url of the recipe image
+        """
+        # Only imported by the code paths that parse html, since it is the slowest import of the pipeline
+        from bs4 import BeautifulSoup
+        with metrics.stage("soup"):
+            self.soup = BeautifulSoup(slice_html(html), parser)
+        with metrics.stage("index"):
+            self.index = SoupIndex(self.soup)
+
+        with metrics.stage("site_parser"):
+            if self.source == "Bon Appetit":
+                return self.parse_bon_appetit()
+            elif self.source == "New York Times Cooking":
+                return self.parse_nyt_cooking()
+            elif self.source == "Serious Eats":
+                return self.parse_serious_eats()
 
     def parse_bon_appetit(self):
         """
         Extract recipe from bon appetit html
         """
-        self.title = clean_text(self.soup.title.text.split(" | ")[0])
+        self.title = title_from_page(self.source, self.index.find("title").text)
 
         # Get active and total times
-        for i in range(len(self.soup.find_all("p"))):
-            if self.soup.find_all("p")[i].text == "Active Time":
-                self.active_time = clean_text(self.soup.find_all("p")[i+1].text)
-            elif self.soup.find_all("p")[i].text == "Total Time":
-                self.total_time = clean_text(self.soup.find_all("p")[i+1].text)
-
-        # Pull ingredients & preparations tags
-        ingredients_tag = None
-        servings_tag = None
-        preparation_tag = None
-
-        for i in range(len(self.soup.find_all("h2"))):
-            if self.soup.find_all("h2")[i].text == "Ingredients":
-                ingredients_tag = self.soup.find_all("h2")[i]
-            elif self.soup.find_all("h2")[i].text == "Recipe information":
-                servings_tag = self.soup.find_all("h2")[i]
-            elif self.soup.find_all("h2")[i].text == "Preparation":
-                preparation_tag = self.soup.find_all("h2")[i]
-            else:
-                pass
+        paragraphs = self.index.find_all("p")
+        for i in range(len(paragraphs)):
+            if paragraphs[i].text == "Active Time":
+                self.active_time = clean_text(paragraphs[i+1].text)
+            elif paragraphs[i].text == "Total Time":
+                self.total_time = clean_text(paragraphs[i+1].text)
+
+        # Pull ingredients & preparations tags (the last matching heading wins)
+        ingredients_tag = (self.index.heading("h2", "Ingredients") or [None])[-1]
+        servings_tag = (self.index.heading("h2", "Recipe information") or [None])[-1]
+        preparation_tag = (self.index.heading("h2", "Preparation") or [None])[-1]
 
         # Pull servings
         if servings_tag:
-            if len(servings_tag.parent.find_all("p")) == 2:
-                self.servings = clean_text(servings_tag.parent.find_all("p")[1].text)
-            elif len(servings_tag.parent.find_all("p")) == 4:
-                self.servings = clean_text(servings_tag.parent.find_all("p")[3].text)
+            servings_paragraphs = servings_tag.parent.find_all("p")
+            if len(servings_paragraphs) == 2:
+                self.servings = clean_text(servings_paragraphs[1].text)
+            elif len(servings_paragraphs) == 4:
+                self.servings = clean_text(servings_paragraphs[3].text)
             else:
                 pass
         else:
@@ -139,8 +376,7 @@ class Recipe:
             ingredients_list = [i.text if len(i)>0 else None for i in ingredients]
             final_ingredients = [amount + " " + ingredient if isinstance(amount, str) else ingredient
                                  for amount, ingredient in zip(amounts_list, ingredients_list)]
-            final_ingredients = [clean_text(x) for x in final_ingredients]
-            self.ingredients = final_ingredients
+            self.ingredients = clean_texts(final_ingredients)
 
         # Pull preparation steps
         if preparation_tag:
@@ -164,26 +400,26 @@ class Recipe:
                         step_numbers.insert(i+1, "Do ahead")
                     else:
                         pass
-            instructions = [clean_text(x) for x in instructions]
+            instructions = clean_texts(instructions)
             self.steps = step_numbers
             self.instructions = instructions
 
-        # Pull image & save temporarily
-        image_url = self.soup.find("source", {"media": "(max-width: 767px)"})["srcset"].split(" ")[-2]
-        urlretrieve(image_url, filename=os.path.join(os.getcwd(), "pdfs", self.title + ".png"))
+        # Pull image url
+        image_tag = [tag for tag in self.index.find_all("source") if tag.get("media") == "(max-width: 767px)"][0]
+        image_url = image_tag["srcset"].split(" ")[-2]
+        return image_url
 
     def parse_nyt_cooking(self):
         """
         Extract recipe from nytimes cooking html
         """
-        self.title = self.soup.title.text.split(" - ")[0].replace(" Recipe", "")
+        self.title = title_from_page(self.source, self.index.find("title").text)
 
-        self.total_time = self.soup.find_all("dd", class_="pantry--ui")[0].text
+        self.total_time = self.index.find_all("dd", class_="pantry--ui")[0].text
 
         # Pull number of servings
-        servings_tag = self.soup.find("div", class_=re.compile("ingredients_recipeYield_*"))
-        servings_text = servings_tag.find_all("span",
-                                              class_=re.compile("pantry--ui ingredients_fontOverride_*"))[0].text
+        servings_tag = self.index.find("div", class_=NYT_SERVINGS_CLASS)
+        servings_text = servings_tag.find_all("span", class_=NYT_SERVINGS_TEXT_CLASS)[0].text
         if re.search(r"\d+$", servings_text):
             if re.search("serv(es|ings)", servings_text, re.IGNORECASE):
                 self.servings = servings_text
@@ -193,10 +429,10 @@ class Recipe:
             self.servings = servings_text
 
         # Pull ingredients
-        ingredients_list = self.soup.find("div", class_=re.compile("recipebody_ingredients-block_*")).find_all("li")
+        ingredients_list = self.index.find("div", class_=NYT_INGREDIENTS_CLASS).find_all("li")
         ingredients = []
         for ingredient in ingredients_list:
-            span = ingredient.find("span", class_=re.compile("ingredient_quantity_*"))
+            span = ingredient.find("span", class_=NYT_QUANTITY_CLASS)
             if span:
                 quantity = span.text
                 ingredient_name = ingredient.text.strip()[len(quantity):]
@@ -207,55 +443,56 @@ class Recipe:
         self.ingredients = ingredients
 
         # Pull preparation steps
-        steps_list = self.soup.find("div", class_=re.compile("recipebody_prep-block_*")).find_all("li")
+        steps_list = self.index.find("div", class_=NYT_PREPARATION_CLASS).find_all("li")
         step_numbers = []
         instructions = []
         for step in steps_list:
-            if step.find("div", class_=re.compile("pantry--ui-lg-strong preparation_stepNumber_*")):
-                step_numbers.append(step.find("div", class_=re.compile("pantry--ui-lg-strong preparation_stepNumber_*")).text)
+            step_number = step.find("div", class_=NYT_STEP_NUMBER_CLASS)
+            if step_number:
+                step_numbers.append(step_number.text)
                 instructions.append(step.find("p", class_="pantry--body-long").text)
 
         # Pull optional Tip instructions
-        if self.soup.find("div", class_=re.compile("tips_tips_*")):
-            tips = self.soup.find("div", class_=re.compile("tips_tips_*"))
+        tips = self.index.find("div", class_=NYT_TIPS_CLASS)
+        if tips:
             step_numbers.append(tips.find("span", class_="pantry--label").text)
             instructions.append(tips.find("li", class_="pantry--body-long").text)
 
         self.steps = step_numbers
         self.instructions = instructions
 
-        # Pull image & save temporarily
-        image_url = self.soup.find("img")["src"]
-        urlretrieve(image_url, filename=os.path.join(os.getcwd(), "pdfs", self.title + ".png"))
+        # Pull image url
+        image_url = self.index.find("img")["src"]
+        return image_url
 
     def parse_serious_eats(self):
 
-        self.title = self.soup.title.text.replace(" Recipe", "")
+        self.title = title_from_page(self.source, self.index.find("title").text)
 
         # Find active and total times and servings
-        if self.soup.find("div", class_="active-time project-meta__active-time"):
-            active_tag = self.soup.find("div", class_="active-time project-meta__active-time")
+        active_tag = self.index.find("div", class_="active-time project-meta__active-time")
+        if active_tag:
             self.active_time = clean_text(active_tag.find(class_="meta-text__data").text)
-        total_tag = self.soup.find("div", class_="total-time project-meta__total-time")
-        serving_tag = self.soup.find("div", class_="recipe-serving project-meta__recipe-serving")
+        total_tag = self.index.find("div", class_="total-time project-meta__total-time")
+        serving_tag = self.index.find("div", class_="recipe-serving project-meta__recipe-serving")
         self.total_time = clean_text(total_tag.find(class_="meta-text__data").text)
         self.servings = clean_text(serving_tag.find(class_="meta-text__data").text)
 
         # Get the ingredients from the recipe
 
         food_list = []
-        if len(self.soup.find_all("ul", class_="structured-ingredients__list text-passage")) == 1:
+        ingredient_sections = self.index.find_all("ul", class_="structured-ingredients__list text-passage")
+        if len(ingredient_sections) == 1:
             ingredients = []
-            ingredients_list = self.soup.find("ul", class_="structured-ingredients__list text-passage").find_all("p")
+            ingredients_list = ingredient_sections[0].find_all("p")
             for ingredient in ingredients_list:
                 ingredients.append(ingredient.text)
                 food_list.append(ingredient.find("span", {"data-ingredient-name": "true"}).text.lower())
         else:
             ingredients = {}
             ingredients_headers = [heading.text for heading in
-                                   self.soup.find_all("p", class_="structured-ingredients__list-heading")]
-            ingredients_lists = [section_list.find_all("p") for section_list in
-                                 self.soup.find_all("ul", class_="structured-ingredients__list text-passage")]
+                                   self.index.find_all("p", class_="structured-ingredients__list-heading")]
+            ingredients_lists = [section_list.find_all("p") for section_list in ingredient_sections]
             clean_ingredients_lists = []
             for ingredient_sublist in ingredients_lists:
                 clean_ingredients_lists.append([ingredient.text for ingredient in ingredient_sublist])
@@ -269,7 +506,7 @@ class Recipe:
         step_numbers = []
         step_index = 1
 
-        instructions_tag = self.soup.find("ol", class_="comp mntl-sc-block mntl-sc-block-startgroup mntl-sc-block-group--OL")
+        instructions_tag = self.index.find("ol", class_="comp mntl-sc-block mntl-sc-block-startgroup mntl-sc-block-group--OL")
         instruction_list = instructions_tag.find_all("p", class_="comp mntl-sc-block mntl-sc-block-html")
         for instruction in instruction_list:
             instructions.append(clean_text(instruction.text))
@@ -277,8 +514,8 @@ class Recipe:
             step_index += 1
 
         # Find if there are extra notes and add to the instructions
-        extra_notes_block = self.soup.find_all("h2", id=re.compile("mntl-sc-block_*"),
-                                               class_="comp mntl-sc-block lifestyle-sc-block-heading mntl-sc-block-heading")
+        extra_notes_block = self.index.find_all("h2", tag_id=SE_HEADING_ID,
+                                                class_="comp mntl-sc-block lifestyle-sc-block-heading mntl-sc-block-heading")
         notes_tag = None
         for item in extra_notes_block:
             if re.search("Notes", item.text):
@@ -288,8 +525,8 @@ class Recipe:
             notes_id = int(split_id[-1]) + 1
             notes_text_id = "-".join(split_id[:-1] + [str(notes_id)])
             notes_text = ""
-            while self.soup.find("p", id=notes_text_id):
-                notes_text += " " + self.soup.find("p", id=notes_text_id).text.strip()
+            while self.index.find("p", tag_id=notes_text_id):
+                notes_text += " " + self.index.find("p", tag_id=notes_text_id).text.strip()
                 notes_id += 2
                 notes_text_id = "-".join(split_id[:-1] + [str(notes_id)])
 
@@ -299,12 +536,12 @@ class Recipe:
         self.steps = step_numbers
         self.instructions = instructions
 
-        # Pull image & save temporarily
+        # Pull image url
         try:
-            image_url = self.soup.find("figure").find("img")["src"]
+            image_url = self.index.find("figure").find("img")["src"]
         except:
-            image_url = self.soup.find("figure").find("img")["data-src"]
-        urlretrieve(image_url, filename=os.path.join(os.getcwd(), "pdfs", self.title + ".png"))
+            image_url = self.index.find("figure").find("img")["data-src"]
+        return image_url
 
     def enter_information_manually(self):
 
@@ -315,10 +552,7 @@ class Recipe:
         self.total_time = input("Enter total time: ")
         self.servings = input("Enter number of servings: ")
 
-        if os.path.exists(os.path.join(os.getcwd(), "images", self.title + ".png")):
-            os.rename(os.path.join(os.getcwd(), "images", self.title + ".png"),
-                      os.path.join(os.getcwd(), "pdfs", self.title + ".png"))
-        else:
+        if not images.move(self.title, os.path.join(self.root, "images"), os.path.join(self.root, "pdfs")):
             print("Save an image of the recipe in the pdf directory")
 
         self.ingredients = collect_list_of_things("ingredients")
@@ -337,32 +571,110 @@ class Recipe:
         self.steps = steps_list
         self.instructions = instruction_list
 
-        if os.path.exists(os.path.join(os.getcwd(), "images", self.title + ".png")):
-            os.rename(os.path.join(os.getcwd(), "images", self.title + ".png"),
-                      os.path.join(os.getcwd(), "pdfs", self.title + ".png"))
-        elif os.path.exists(os.path.join(os.getcwd(), "pdfs", self.title + ".png")):
+        if images.move(self.title, os.path.join(self.root, "images"), os.path.join(self.root, "pdfs")):
+            pass
+        elif os.path.exists(images.image_path(os.path.join(self.root, "pdfs"), self.title)):
             pass
         else:
             print("Save an image of the recipe in the pdf directory")
 
-    def to_json(self):
-        if os.path.isfile(os.path.join(os.getcwd(), "jsons", self.title + ".json")):
-            user_says = input("This json file already exists. Overwrite? (y/n): ")
-            if user_says == "y":
-                recipe_dict = vars(self)
-                if "soup" in recipe_dict.keys():
-                    recipe_dict.pop("soup")
-                with open(os.path.join(os.getcwd(), "jsons", self.title + ".json"), "w", encoding="utf-8") as f:
-                    json.dump(recipe_dict, f, ensure_ascii=False, indent=4)
-            else:
-                print("Did not overwrite the json file.")
+    def check_duplicates(self, duplicates="warn"):
+        """
+        Look for a saved recipe with another title that is nearly the same as this one (e.g. saved with and without
+        a trailing " Recipe"). duplicates decides what happens if there is one: "warn" and carry on, "ask" the user
+        whether to save it anyway, or "skip" it, which removes its image and raises DuplicateRecipe. Until then, the
+        recipe counts as saved for the checks of other threads, so two near duplicates scraped at once are caught
+        """
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError("duplicates must be one of {}".format(", ".join(DUPLICATE_POLICIES)))
+        import dedup
+        matches = dedup.find_duplicates(self, os.path.join(self.root, "jsons"))
+        if not matches:
+            return
+        message = "{} looks like a duplicate of {} ({:.0%} similar)".format(self.title, *matches[0])
+        if duplicates == "ask":
+            duplicates = "warn" if input(message + ". Save it anyway? (y/n): ") == "y" else "skip"
         else:
-            recipe_dict = vars(self)
-            if "soup" in recipe_dict.keys():
-                recipe_dict.pop("soup")
-            with open(os.path.join(os.getcwd(), "jsons", self.title + ".json"), "w", encoding="utf-8") as f:
-                json.dump(recipe_dict, f, ensure_ascii=False, indent=4)
-
+            print(message)
+        if duplicates == "skip":
+            image = images.image_path(os.path.join(self.root, "pdfs"), self.title)
+            if os.path.isfile(image):
+                os.remove(image)
+            dedup.unregister(self.title, os.path.join(self.root, "jsons"))
+            raise DuplicateRecipe(message)
+
+    def to_json(self, overwrite="ask"):
+        """
+        Save the recipe to jsons/<title>.json. If the file already exists, overwrite decides what happens: "ask" the
+        user, "skip" saving, "overwrite" it, or keep the existing file as a numbered "version" in jsons/versions/ and
+        save over it. The file is written whole and renamed into place while holding a lock on the recipe, so
+        workers saving the same recipe at once never interleave. Returns the path saved to, or None if skipped
+        """
+        if overwrite not in OVERWRITE_POLICIES:
+            raise ValueError("overwrite must be one of {}".format(", ".join(OVERWRITE_POLICIES)))
+        for parsed_page in ["soup", "index"]:
+            vars(self).pop(parsed_page, None)
+        directory = os.path.join(self.root, "jsons")
+        path = os.path.join(directory, self.title + ".json")
+        os.makedirs(directory, exist_ok=True)
+        with recipe_lock(directory, self.title):
+            if os.path.isfile(path):
+                if overwrite == "ask":
+                    user_says = input("This json file already exists. Overwrite? (y/n): ")
+                    overwrite = "overwrite" if user_says == "y" else "skip"
+                if overwrite == "skip":
+                    print("Did not overwrite the json file.")
+                    return None
+                if overwrite == "version":
+                    keep_version(path)
+            recipe_dict = {field: value for field, value in vars(self).items() if field != "root"}
+            write_atomic(path, json.dumps(recipe_dict, ensure_ascii=False, indent=4))
+        return path
+
+
+@contextmanager
+def recipe_lock(directory, title):
+    """
+    Exclusive lock on one recipe, shared by threads and processes through a lock file in directory/.locks
+    """
+    os.makedirs(os.path.join(directory, ".locks"), exist_ok=True)
+    with open(os.path.join(directory, ".locks", title + ".lock"), "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_atomic(path, text):
+    """
+    Write text to a temporary file next to path and rename it into place, so readers see the old or new file whole
+    """
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def keep_version(path):
+    """
+    Copy a recipe json file to the next free versions/<title>.<n>.json beside it
+    """
+    directory = os.path.join(os.path.dirname(path), "versions")
+    os.makedirs(directory, exist_ok=True)
+    title = os.path.splitext(os.path.basename(path))[0]
+    number = 1
+    while os.path.exists(os.path.join(directory, "{}.{}.json".format(title, number))):
+        number += 1
+    shutil.copyfile(path, os.path.join(directory, "{}.{}.json".format(title, number)))
 
 
 def collect_list_of_things(type_of_thing):
@@ -0,0 +1,167 @@
+from array import array
+from types import MappingProxyType
+import argparse
+import glob
+import json
+import mmap
+import os
+import sys
+import tempfile
+
+RECORD_FIELDS = ["url", "source", "title", "type", "active_time", "total_time", "servings", "ingredients",
+                 "quantities", "food_list", "steps", "instructions", "my_notes"]
+# Strings that repeat across many recipes ("salt", "1 Tbsp. olive oil", "Step 1", "Serious Eats") are kept once
+INTERNED_FIELDS = {"source", "type", "ingredients", "food_list", "steps"}
+INTERNING = [(field, field in INTERNED_FIELDS) for field in RECORD_FIELDS]
+set_slot = object.__setattr__
+
+
+def compact(value, intern=False):
+    """
+    Read-only, compact copy of a recipe field: lists become tuples, grouped lists a read-only mapping of tuples
+    """
+    if isinstance(value, str):
+        return sys.intern(value) if intern else value
+    if isinstance(value, list):
+        if all(type(item) is str for item in value):
+            return tuple(map(sys.intern, value)) if intern else tuple(value)
+        return tuple(compact(item, intern) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({compact(key, intern): compact(item, intern) for key, item in value.items()})
+    return value
+
+
+class RecipeRecord:
+    """
+    Read-only recipe with the same fields as Recipe, stored in slots rather than a per-instance dict and with
+    repeated strings interned, for holding many thousands of recipes in memory. It can be passed to
+    create_latex.add_recipe like a Recipe
+    """
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, recipe_dict):
+        for field, intern in INTERNING:
+            value = recipe_dict.get(field)
+            # Most fields are plain strings that are kept as they are
+            if value is not None and (intern or type(value) is not str):
+                value = compact(value, intern)
+            set_slot(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RecipeRecord is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("RecipeRecord is read-only")
+
+    def __repr__(self):
+        return "RecipeRecord({!r})".format(self.title)
+
+
+class LazyRecipe:
+    """
+    A recipe in a RecipeLibrary whose line is only decoded when one of its fields is first read
+    """
+    __slots__ = ["library", "number", "record"]
+
+    def __init__(self, library, number):
+        self.library = library
+        self.number = number
+        self.record = None
+
+    def __getattr__(self, name):
+        # Only called for names that are not slots, i.e. the recipe fields
+        if name not in RECORD_FIELDS:
+            raise AttributeError(name)
+        if self.record is None:
+            self.record = RecipeRecord(json.loads(self.library.line(self.number)))
+        return getattr(self.record, name)
+
+    def __repr__(self):
+        return "LazyRecipe({}, {})".format(self.library.path, self.number)
+
+
+class RecipeLibrary:
+    """
+    Recipes in a JSON Lines file (one recipe json per line), memory mapped so that opening it only finds where
+    each line starts and a recipe is only read and decoded when it is used
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.offsets = array("Q")
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.map = b""
+            return
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        start = 0
+        end = len(self.map)
+        while start < end:
+            self.offsets.append(start)
+            newline = self.map.find(b"\n", start)
+            start = end if newline == -1 else newline + 1
+        self.offsets.append(end)
+
+    def line(self, number):
+        return self.map[self.offsets[number]:self.offsets[number + 1]]
+
+    def __len__(self):
+        return max(len(self.offsets) - 1, 0)
+
+    def __getitem__(self, number):
+        if number < 0:
+            number += len(self)
+        if not 0 <= number < len(self):
+            raise IndexError(number)
+        return LazyRecipe(self, number)
+
+    def __iter__(self):
+        return (LazyRecipe(self, number) for number in range(len(self)))
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+
+def consolidate(directory, path):
+    """
+    Write every recipe json file in directory to one JSON Lines file, returning the number of recipes written
+    """
+    count = 0
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(descriptor, "w", encoding="utf-8") as output:
+        for json_path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            with open(json_path, encoding="utf-8") as f:
+                recipe_dict = json.load(f)
+            for parsed_page in ["soup", "index"]:
+                recipe_dict.pop(parsed_page, None)
+            output.write(json.dumps(recipe_dict, ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(temporary, path)
+    return count
+
+
+def load_records(directory):
+    """
+    RecipeRecords for every recipe json file in directory
+    """
+    records = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            records.append(RecipeRecord(json.load(f)))
+    return records
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Consolidate saved recipe json files into one JSON Lines library")
+
+    parser.add_argument("directory", nargs="?", default=os.path.join(os.getcwd(), "jsons"),
+                        help="Directory of recipe json files")
+    parser.add_argument("--output", type=str, default=os.path.join(os.getcwd(), "recipes.jsonl"),
+                        help="JSON Lines file to write")
+
+    args = parser.parse_args()
+
+    print("Wrote {} recipes to {}".format(consolidate(args.directory, args.output), args.output))
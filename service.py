@@ -0,0 +1,344 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from recipes import Recipe, HTML_PARSERS, OVERWRITE_POLICIES
+from build import render, image_path
+import create_latex
+import fetch
+import images
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+import argparse
+
+# Longest a request may wait for a job to finish (?wait=seconds)
+MAX_WAIT = 300
+
+# Types of dish are folder names under pdfs/: one path component, which cannot lead outside the library
+PLAIN_NAME = re.compile(r"^(?!\.\.?$)[^/\\\0]+$")
+
+# Where a worker process reports the jobs it starts (set by start_worker)
+started_jobs = None
+
+
+class QueueFull(Exception):
+    pass
+
+
+def warm(cache_dir, cache_ttl, cache_size, offline, rate, format_directory=None):
+    """
+    Worker process initializer: import the html, LaTeX and image libraries and set up the response cache (and
+    preamble format) once, instead of once per recipe as a new create_latex.py process does
+    """
+    # Imported here only to have them loaded before the first recipe arrives
+    import bs4
+    import pylatex
+    import PIL.Image
+    fetch.configure_cache(cache_dir, ttl=cache_ttl, max_bytes=cache_size, offline=offline)
+    fetch.set_rate_limit(rate)
+    create_latex.configure_preamble_format(format_directory)
+
+
+def ready(_):
+    return os.getpid()
+
+
+def start_worker(started, initializer=None, initargs=()):
+    """
+    Worker process initializer: keep the queue jobs are reported on when they start, then run initializer
+    """
+    global started_jobs
+    started_jobs = started
+    if initializer:
+        initializer(*initargs)
+
+
+def run_job(task, job_id, url, **options):
+    """
+    Worker task: report that the job has left the queue, then run it. The executor marks jobs waiting in its call
+    queue as running too
+    """
+    started_jobs.put(job_id)
+    return task(url, **options)
+
+
+def render_url(url, source=None, type=None, parser="html.parser", overwrite="skip", stream=False, root=None):
+    """
+    Worker task: scrape a recipe into the library in root (the working directory by default) and compile its pdf
+    in a build directory of its own, returning the title and the pdf path
+    """
+    recipe = Recipe(url=url, source=source, type=type, parser=parser, interactive=False, overwrite=overwrite,
+                    root=root, stream=stream)
+    # The image is downloaded next to the pdfs; keep it in images/ like file_pdf does
+    if not images.move(recipe.title, os.path.join(recipe.root, "pdfs"), os.path.join(recipe.root, "images")):
+        raise FileNotFoundError("no image at " + image_path(recipe.title, recipe.root))
+    return recipe.title, render(recipe)
+
+
+class Job:
+    """
+    One recipe url being rendered, and its result once finished
+    """
+
+    def __init__(self, url):
+        self.id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.future = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.title = None
+        self.pdf = None
+        self.error = None
+        self.done = threading.Event()
+
+    def status(self):
+        if not self.done.is_set():
+            return "running" if self.started else "queued"
+        return "failed" if self.error else "done"
+
+    def to_dict(self):
+        return {"id": self.id, "url": self.url, "status": self.status(), "title": self.title, "error": self.error,
+                "seconds": round((self.finished or time.time()) - self.submitted, 3)}
+
+
+class RenderService:
+    """
+    Renders recipe urls on a pool of worker processes that stay running, so every request skips interpreter
+    start up, imports and cold caches. At most workers + queue_size jobs are unfinished at once, and a url
+    submitted again while it is still unfinished gets the job already rendering it
+    """
+
+    def __init__(self, workers=2, queue_size=32, history=1000, task=render_url, initializer=None, initargs=()):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.history = history
+        self.task = task
+        self.initializer = initializer
+        self.initargs = initargs
+        self.started = multiprocessing.SimpleQueue()
+        self.executor = self.new_executor()
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+        self.in_flight = {}
+        self.completed = 0
+        self.failed = 0
+        threading.Thread(target=self.listen, daemon=True).start()
+
+    def new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=start_worker,
+                                   initargs=(self.started, self.initializer, self.initargs))
+
+    def listen(self):
+        """
+        Mark each job as started when its worker reports it, until close
+        """
+        while True:
+            job_id = self.started.get()
+            if job_id is None:
+                break
+            with self.lock:
+                if job_id in self.jobs:
+                    self.jobs[job_id].started = time.time()
+
+    def start(self):
+        """
+        Start (and initialize) every worker process now rather than on the first requests
+        """
+        return list(self.executor.map(ready, range(self.workers)))
+
+    def submit(self, url, **options):
+        """
+        Queue url for rendering, returning its job and whether it is a new one. Raises QueueFull when too many
+        jobs are unfinished. A pool broken by a worker process dying is replaced with a new one
+        """
+        with self.lock:
+            if url in self.in_flight:
+                return self.jobs[self.in_flight[url]], False
+            if len(self.in_flight) >= self.workers + self.queue_size:
+                raise QueueFull("{} jobs are already waiting".format(len(self.in_flight)))
+            job = Job(url)
+            try:
+                job.future = self.executor.submit(run_job, self.task, job.id, url, **options)
+            except BrokenProcessPool:
+                # The jobs the pool had already failed with it; only new ones go to the new pool
+                self.executor.shutdown(wait=False)
+                self.executor = self.new_executor()
+                job.future = self.executor.submit(run_job, self.task, job.id, url, **options)
+            # Only once submitted, so that a job that could not be is not in flight forever
+            self.jobs[job.id] = job
+            self.in_flight[url] = job.id
+            self.forget()
+        job.future.add_done_callback(lambda future: self.finish(job, future))
+        return job, True
+
+    def finish(self, job, future):
+        with self.lock:
+            if future.cancelled():
+                job.error = "Cancelled"
+            elif future.exception():
+                job.error = "{}: {}".format(future.exception().__class__.__name__, future.exception())
+            else:
+                job.title, job.pdf = future.result()
+            job.finished = time.time()
+            del self.in_flight[job.url]
+            if job.error:
+                self.failed += 1
+            else:
+                self.completed += 1
+        job.done.set()
+
+    def forget(self):
+        """
+        Drop the oldest finished jobs beyond the history kept
+        """
+        while len(self.jobs) > self.history:
+            oldest = next(iter(self.jobs.values()))
+            if not oldest.done.is_set():
+                break
+            self.jobs.popitem(last=False)
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def status(self):
+        with self.lock:
+            running = sum(self.jobs[job_id].started is not None for job_id in self.in_flight.values())
+            return {"workers": self.workers, "capacity": self.workers + self.queue_size, "running": running,
+                    "queued": len(self.in_flight) - running, "completed": self.completed, "failed": self.failed}
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+        self.started.put(None)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs {"url": ..., "type": ..., "source": ..., "parser": ..., "overwrite": ..., "stream": ...} queues a
+    recipe
+    GET /jobs/<id> returns its status, GET /jobs/<id>/pdf the pdf once done (both accept ?wait=seconds)
+    GET /status returns the size of the queue and number of jobs done
+    """
+
+    def send_json(self, code, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        service = self.server.service
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            return self.send_json(404, {"error": "Not found"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            return self.send_json(400, {"error": "Body is not json"})
+        if not isinstance(request, dict) or not request.get("url"):
+            return self.send_json(400, {"error": "A recipe url is required"})
+        options = {"source": request.get("source"), "type": request.get("type"),
+                   "parser": request.get("parser", "html.parser"), "overwrite": request.get("overwrite", "skip"),
+                   "stream": bool(request.get("stream", False))}
+        if options["type"] and not (isinstance(options["type"], str) and PLAIN_NAME.match(options["type"])):
+            return self.send_json(400, {"error": "type must be a folder name, without / or \\"})
+        if options["parser"] not in HTML_PARSERS:
+            return self.send_json(400, {"error": "parser must be one of " + ", ".join(HTML_PARSERS)})
+        # Nobody can be asked whether to overwrite a recipe
+        if options["overwrite"] not in OVERWRITE_POLICIES or options["overwrite"] == "ask":
+            return self.send_json(400, {"error": "overwrite must be skip, overwrite or version"})
+        try:
+            job, created = service.submit(request["url"].strip(), **options)
+        except QueueFull as e:
+            return self.send_json(503, {"error": str(e)}, {"Retry-After": "5"})
+        self.send_json(202 if created else 200, job.to_dict(), {"Location": "/jobs/" + job.id})
+
+    def do_GET(self):
+        service = self.server.service
+        request = urlparse(self.path)
+        parts = request.path.strip("/").split("/")
+        if parts == ["status"]:
+            return self.send_json(200, service.status())
+        job = service.get(parts[1]) if len(parts) in [2, 3] and parts[0] == "jobs" else None
+        if job is None or (len(parts) == 3 and parts[2] != "pdf"):
+            return self.send_json(404, {"error": "Not found"})
+        try:
+            wait = min(float(parse_qs(request.query).get("wait", [0])[0]), MAX_WAIT)
+        except ValueError:
+            return self.send_json(400, {"error": "wait must be a number of seconds"})
+        if wait > 0:
+            job.done.wait(wait)
+
+        if len(parts) == 2:
+            return self.send_json(200, job.to_dict())
+        if not job.done.is_set():
+            return self.send_json(202, job.to_dict(), {"Retry-After": "1"})
+        if job.error:
+            return self.send_json(500, job.to_dict())
+        with open(job.pdf, "rb") as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Content-Disposition", "inline; filename=\"{}.pdf\"".format(job.title.replace('"', "")))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(service, host="127.0.0.1", port=8750):
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.service = service
+    return server
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Serve recipe pdfs over HTTP from worker processes that stay warm")
+
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--root", type=str, default=os.getcwd(),
+                        help="Recipe library directory holding jsons/, images/ and pdfs/ (default: this directory)")
+    parser.add_argument("--port", type=int, default=8750, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of recipes rendered at once")
+    parser.add_argument("--queue-size", type=int, default=32,
+                        help="Number of jobs waiting for a worker before new ones are turned away")
+    parser.add_argument("--rate", type=float, default=0.5,
+                        help="Maximum requests per second to each website, shared between the workers")
+    parser.add_argument("--cache-dir", type=str, default=os.path.join(os.getcwd(), "cache"),
+                        help="Directory caching downloaded pages and images (empty string disables the cache)")
+    parser.add_argument("--cache-ttl", type=float, default=24,
+                        help="Hours before a cached page is revalidated with the website")
+    parser.add_argument("--cache-size", type=float, default=500, help="Maximum size of the cache in MB")
+    parser.add_argument("--offline", action="store_true", help="Only use cached pages and images")
+    parser.add_argument("--preamble-format", action="store_true",
+                        help="Compile against a precompiled preamble format (built in pdfs/.formats the first time, "
+                             "requires pdflatex with mylatexformat)")
+
+    args = parser.parse_args()
+
+    # Every worker has its own rate limiter, so each gets its share of the rate
+    service = RenderService(args.workers, args.queue_size, task=partial(render_url, root=args.root), initializer=warm,
+                            initargs=(args.cache_dir, args.cache_ttl * 60 * 60, int(args.cache_size * 1024 * 1024),
+                                      args.offline, args.rate / args.workers,
+                                      os.path.join(args.root, "pdfs", ".formats") if args.preamble_format else None))
+    service.start()
+    server = make_server(service, args.host, args.port)
+    print("Serving recipe pdfs on http://{}:{} with {} workers".format(args.host, args.port, args.workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,76 @@
+class SoupIndex:
+    """
+    Walks a parsed page once and buckets every tag by name, class, id and heading text, so the site parsers can
+    look tags up directly instead of scanning the whole tree for each query. Lookups follow BeautifulSoup's
+    matching rules for class_ and id (exact string or compiled regex) and return tags in document order
+    """
+
+    def __init__(self, soup):
+        self.tags = {}
+        self.classes = {}
+        self.class_strings = {}
+        self.ids = {}
+        self.headings = {}
+        self.position = {}
+        self.cache = {}
+
+        for node in soup.descendants:
+            if node.name is None:
+                # Text, comments, doctype
+                continue
+            self.position[id(node)] = len(self.position)
+            self.tags.setdefault(node.name, []).append(node)
+            classes = node.get("class")
+            if classes:
+                for token in classes:
+                    self.classes.setdefault(token, []).append(node)
+                if len(classes) > 1:
+                    self.class_strings.setdefault(" ".join(classes), []).append(node)
+            tag_id = node.get("id")
+            if tag_id:
+                self.ids.setdefault(tag_id, []).append(node)
+
+    def find_all(self, name, class_=None, tag_id=None):
+        """
+        Tags called name, optionally filtered by class and/or id
+        """
+        key = (name, class_, tag_id)
+        if key not in self.cache:
+            candidates = [self.tags.get(name, [])]
+            if class_ is not None:
+                candidates.append(self.match(self.classes, class_) + self.match(self.class_strings, class_))
+            if tag_id is not None:
+                candidates.append(self.match(self.ids, tag_id))
+            # Keep tags present in every bucket, in document order
+            selected = None
+            for bucket in candidates:
+                positions = {self.position[id(tag)]: tag for tag in bucket}
+                selected = positions if selected is None else {p: selected[p] for p in selected if p in positions}
+            self.cache[key] = [selected[p] for p in sorted(selected)]
+        return self.cache[key]
+
+    def find(self, name, class_=None, tag_id=None):
+        tags = self.find_all(name, class_=class_, tag_id=tag_id)
+        return tags[0] if tags else None
+
+    def heading(self, name, text):
+        """
+        All headings of level name (e.g. "h2") whose text is exactly text
+        """
+        if name not in self.headings:
+            # Heading text is only worked out for levels that are actually queried
+            by_text = {}
+            for tag in self.tags.get(name, []):
+                by_text.setdefault(tag.text, []).append(tag)
+            self.headings[name] = by_text
+        return self.headings[name].get(text, [])
+
+    @staticmethod
+    def match(buckets, value):
+        if isinstance(value, str):
+            return buckets.get(value, [])
+        tags = []
+        for bucket_key, bucket in buckets.items():
+            if value.search(bucket_key):
+                tags.extend(bucket)
+        return tags
@@ -0,0 +1,40 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from recipes import Recipe
+
+# Fields of a saved recipe json file, for tests that only change a few of them
+RECIPE = {"url": "", "source": "Bon Appetit", "title": "Flaky Bread", "active_time": None, "total_time": None,
+          "servings": None, "ingredients": ["Flour"], "food_list": None, "steps": ["Step 1"],
+          "instructions": ["Bake."], "my_notes": None, "type": None}
+
+def recipe(root=None, **fields):
+    """
+    Recipe of the library in root (the working directory by default) with RECIPE's fields but for fields, neither
+    scraped nor saved
+    """
+    recipe = Recipe.__new__(Recipe)
+    recipe.root = root or os.getcwd()
+    recipe.set_fields(dict(RECIPE, **fields))
+    return recipe
+
+def temporary_directory(test):
+    """
+    New empty directory, removed once test has finished
+    """
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    return directory
+
+class LibraryTestCase(unittest.TestCase):
+    """
+    Runs each test in an empty recipe library (jsons/, images/ and pdfs/) in a temporary working directory
+    """
+
+    def setUp(self):
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(temporary_directory(self))
+        for directory in ["jsons", "images", "pdfs"]:
+            os.mkdir(directory)
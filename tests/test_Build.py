@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import time
+
+import build
+import create_latex
+from tests.helpers import LibraryTestCase, temporary_directory
+
+def fake_generate_latex(recipe, image=None, directory=None):
+    with open(os.path.join(directory, recipe.title + ".pdf"), "w") as f:
+        f.write("pdf of " + image)
+
+def fake_render(recipe):
+    path = os.path.join(os.getcwd(), "pdfs", recipe.title + ".pdf")
+    with open(path, "w") as f:
+        f.write("pdf")
+    return path
+
+class BuildTesting(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        for title in ["Pasta Salad", "Flaky Bread"]:
+            self.save(title, ["Boil the pasta."])
+            with open(os.path.join("images", title + ".png"), "wb") as f:
+                f.write(b"png")
+
+    def save(self, title, instructions, type=None):
+        with open(os.path.join("jsons", title + ".json"), "w") as f:
+            json.dump({"url": "", "source": "", "title": title, "active_time": None, "total_time": None,
+                       "servings": None, "ingredients": ["Pasta"], "food_list": None, "steps": None,
+                       "instructions": instructions, "type": type}, f)
+
+    @patch.object(build, "render", side_effect=fake_render)
+    def test_only_changed_recipes_rebuilt(self, render):
+        self.assertEqual(sorted(build.build("jsons")[0]), ["Flaky Bread", "Pasta Salad"])
+        self.assertEqual(build.build("jsons"), ([], {}))
+
+        # Touching a file without changing it does not rebuild
+        os.utime(os.path.join("jsons", "Pasta Salad.json"), (time.time() + 5, time.time() + 5))
+        self.assertEqual(build.build("jsons"), ([], {}))
+
+        self.save("Pasta Salad", ["Boil the pasta.", "Add the dressing."])
+        self.assertEqual(build.build("jsons")[0], ["Pasta Salad"])
+
+        with open(os.path.join("images", "Flaky Bread.png"), "wb") as f:
+            f.write(b"new png")
+        self.assertEqual(build.build("jsons")[0], ["Flaky Bread"])
+
+        os.remove(os.path.join("pdfs", "Pasta Salad.pdf"))
+        self.assertEqual(build.build("jsons")[0], ["Pasta Salad"])
+        self.assertEqual(render.call_count, 5)
+
+    @patch.object(build, "render", side_effect=fake_render)
+    def test_template_change_rebuilds_everything(self, render):
+        build.build("jsons")
+        with patch.object(build, "template_version", return_value="new template"):
+            self.assertEqual(len(build.build("jsons")[0]), 2)
+
+    def test_template_version_covers_the_outline(self):
+        version = build.template_version()
+        for name in ["recipe_outline", "add_steps", "create_latex_friendly_texts", "compile_pdf"]:
+            with patch.object(create_latex, name, create_latex.frac):
+                self.assertNotEqual(build.template_version(), version, name)
+
+    @patch.object(build, "render", side_effect=fake_render)
+    def test_missing_image_fails_and_is_retried(self, render):
+        os.remove(os.path.join("images", "Flaky Bread.png"))
+        rebuilt, failed = build.build("jsons")
+        self.assertEqual(rebuilt, ["Pasta Salad"])
+        self.assertIn("Flaky Bread.json", failed)
+        self.assertIn("Flaky Bread.json", build.build("jsons")[1])
+
+    @patch.object(build, "generate_latex", side_effect=fake_generate_latex)
+    def test_render_in_isolated_directory(self, generate_latex):
+        self.save("Flaky Bread", ["Bake."], type="bread")
+        self.assertEqual(build.build("jsons", jobs=1)[1], {})
+        with open(os.path.join("pdfs", "bread", "Flaky Bread.pdf")) as f:
+            self.assertEqual(f.read(), "pdf of " + os.path.join(os.getcwd(), "images", "Flaky Bread.png"))
+        directories = {call.kwargs["directory"] for call in generate_latex.call_args_list}
+        self.assertEqual(len(directories), 2)
+        # Build directories are removed once their pdf is moved out
+        self.assertEqual(sorted(os.listdir("pdfs")), [".manifest.json", "Pasta Salad.pdf", "bread"])
+
+    @patch.object(build, "generate_latex", side_effect=fake_generate_latex)
+    def test_library_elsewhere(self, generate_latex):
+        root = os.getcwd()
+        os.chdir(temporary_directory(self))
+        self.assertEqual(len(build.build(os.path.join(root, "jsons"), root=root)[0]), 2)
+        with open(os.path.join(root, "pdfs", "Pasta Salad.pdf")) as f:
+            self.assertEqual(f.read(), "pdf of " + os.path.join(root, "images", "Pasta Salad.png"))
+        self.assertEqual(os.listdir(), [])
+
+    @patch.object(build, "generate_latex", side_effect=fake_generate_latex)
+    def test_parallel_build(self, generate_latex):
+        for number in range(6):
+            self.save("Cake {}".format(number), ["Bake."])
+            with open(os.path.join("images", "Cake {}.png".format(number)), "wb") as f:
+                f.write(b"png")
+        rebuilt, failed = build.build("jsons", jobs=4)
+        self.assertEqual(failed, {})
+        self.assertEqual(len(rebuilt), 8)
+        self.assertEqual(len(build.load_manifest(os.path.join("pdfs", build.MANIFEST))), 8)
+        self.assertEqual(build.build("jsons", jobs=4), ([], {}))
+
+if __name__ == "__main__":
+    unittest.main()
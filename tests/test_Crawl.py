@@ -0,0 +1,110 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+import gzip
+import io
+import os
+import urllib3
+from contextlib import redirect_stdout
+
+from recipes import DuplicateRecipe
+import crawl
+import create_latex
+import fetch
+from tests.helpers import temporary_directory
+
+BA = "https://www.bonappetit.com"
+SITEMAP = '<?xml version="1.0" encoding="UTF-8"?><{0} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{1}</{0}>'
+
+def entries(kind, *urls):
+    return SITEMAP.format(kind, "".join("<{}><loc>{}</loc><lastmod>{}</lastmod></{}>".format(
+        "sitemap" if kind == "sitemapindex" else "url", url, modified, "sitemap" if kind == "sitemapindex" else "url")
+        for url, modified in urls)).encode("utf-8")
+
+PAGES = {BA + "/robots.txt": b"User-agent: *\nDisallow: /recipe/secret\nSitemap: " + BA.encode() + b"/sitemap.xml\n",
+         BA + "/sitemap.xml": entries("sitemapindex", (BA + "/sitemap-2024.xml.gz", "2024-05-01"),
+                                      (BA + "/sitemap-2015.xml", "2015-01-01")),
+         BA + "/sitemap-2024.xml.gz": gzip.compress(entries(
+             "urlset", (BA + "/recipe/miso-pasta", "2024-04-30T10:00:00Z"), (BA + "/story/best-pans", "2024-04-01"),
+             (BA + "/recipe/secret", "2024-04-01"), (BA + "/recipe/saved-soup/", "2024-04-01"))),
+         BA + "/sitemap-2015.xml": entries("urlset", (BA + "/recipe/old-cake", "2015-01-01")),
+         BA + "/gallery/weeknight": b'<a href="/recipe/quick-tacos?utm=1">Tacos</a><a href="/recipe/miso-pasta">'
+                                    b'Pasta</a><a href="https://cooking.nytimes.com/recipes/1020-chili">Chili</a>'}
+
+def download(url):
+    if url not in PAGES:
+        raise fetch.DownloadError("404 Not Found for " + url)
+    return PAGES[url]
+
+class UrlTesting(unittest.TestCase):
+    def test_canonical_url(self):
+        self.assertEqual(crawl.canonical_url("http://WWW.bonappetit.com/recipe/miso-pasta/?utm_source=x#steps"),
+                         BA + "/recipe/miso-pasta")
+
+    def test_recipe_source(self):
+        self.assertEqual(crawl.recipe_source(BA + "/recipe/miso-pasta"), "Bon Appetit")
+        self.assertEqual(crawl.recipe_source("https://cooking.nytimes.com/recipes/1020-chili"),
+                         "New York Times Cooking")
+        self.assertEqual(crawl.recipe_source("https://www.seriouseats.com/the-best-chili-recipe"), "Serious Eats")
+        self.assertIsNone(crawl.recipe_source(BA + "/story/best-pans"))
+
+@patch.object(fetch, "download", download)
+class CrawlTesting(unittest.TestCase):
+    def test_sitemaps(self):
+        urls = list(crawl.crawl(["Bon Appetit"], known=[BA + "/recipe/saved-soup"]))
+        # Not articles, disallowed pages or recipes already saved
+        self.assertEqual(urls, [BA + "/recipe/miso-pasta", BA + "/recipe/old-cake"])
+
+    def test_since_and_limit(self):
+        since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.assertEqual(list(crawl.crawl(["Bon Appetit"], since=since)),
+                         [BA + "/recipe/miso-pasta", BA + "/recipe/saved-soup"])
+        self.assertEqual(len(list(crawl.crawl(["Bon Appetit"], limit=1))), 1)
+
+    def test_unreachable_website(self):
+        def unreachable(url):
+            if url.startswith("https://cooking.nytimes.com"):
+                raise urllib3.exceptions.MaxRetryError(None, url, "Connection refused")
+            return download(url)
+
+        messages = []
+        with patch.object(fetch, "download", unreachable):
+            urls = list(crawl.crawl(["New York Times Cooking", "Bon Appetit"], log=messages.append))
+        # The other websites are still crawled
+        self.assertEqual(urls, [BA + "/recipe/miso-pasta", BA + "/recipe/saved-soup", BA + "/recipe/old-cake"])
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(messages[0].startswith("Could not crawl New York Times Cooking (MaxRetryError"))
+
+    def test_collections(self):
+        urls = list(crawl.crawl([], [BA + "/gallery/weeknight", BA + "/gallery/missing"], log=lambda message: None))
+        self.assertEqual(urls, [BA + "/recipe/quick-tacos", BA + "/recipe/miso-pasta",
+                                "https://cooking.nytimes.com/recipes/1020-chili"])
+
+    def test_library_urls(self):
+        root = temporary_directory(self)
+        os.makedirs(os.path.join(root, "jsons"))
+        with open(os.path.join(root, "jsons", "Soup.json"), "w", encoding="utf-8") as f:
+            f.write('{"title": "Soup", "url": "http://www.bonappetit.com/recipe/saved-soup/"}')
+        self.assertEqual(crawl.library_urls(root), {BA + "/recipe/saved-soup"})
+
+class BatchTesting(unittest.TestCase):
+    def test_generator_of_urls(self):
+        pulled = []
+
+        def urls():
+            for number in range(10):
+                pulled.append(number)
+                yield "https://example.com/{}".format(number % 8)
+
+        def scrape(url, *args):
+            raise DuplicateRecipe(url)
+
+        with patch.object(create_latex, "scrape", scrape), redirect_stdout(io.StringIO()):
+            results = create_latex.run_batch(urls(), workers=2)
+        self.assertEqual(len(pulled), 10)
+        # Repeated urls are only scraped once
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(succeeded is None for succeeded, _ in results.values()))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import patch
+import builtins
+import os
+
+from recipes import DuplicateRecipe
+import dedup
+from tests import helpers
+from tests.helpers import temporary_directory
+
+INSTRUCTIONS = ["Cook the onions slowly in butter until jammy and deep golden, about 45 minutes.",
+                "Meanwhile boil the pasta in salted water until al dente, then drain it.",
+                "Stir the miso into the onions with a splash of pasta water.",
+                "Toss with the pasta, season with plenty of black pepper and serve."]
+
+def recipe(title, root, ingredients=None, instructions=INSTRUCTIONS):
+    return helpers.recipe(root, title=title, steps=None, instructions=instructions,
+                          ingredients=ingredients or ["1 lb. pasta", "3 Tbsp. white miso", "2 Tbsp. butter",
+                                                      "2 large onions, sliced", "Kosher salt"])
+
+def no_prompt(_):
+    raise AssertionError("Asked for input")
+
+class DuplicateIndexTesting(unittest.TestCase):
+    def setUp(self):
+        self.root = temporary_directory(self)
+        self.index = dedup.DuplicateIndex()
+        edited = INSTRUCTIONS[:3] + ["Toss with the pasta and season with plenty of black pepper."]
+        self.recipes = [recipe("Miso Pasta", self.root), recipe("Miso Pasta Recipe", self.root, instructions=edited),
+                        recipe("Chili", self.root, ["2 lb. beef", "2 cans beans"], ["Brown the beef.", "Simmer."])]
+        for each in self.recipes:
+            self.index.add(each.title, self.index.signature(each))
+
+    def test_shingles(self):
+        features = dedup.shingles(self.recipes[2])
+        self.assertEqual(features, {"i:beef", "i:beans", "s:brown the beef", "s:simmer"})
+
+    def test_query(self):
+        matches = self.index.query(self.index.signature(self.recipes[0]), exclude="Miso Pasta")
+        self.assertEqual([title for title, _ in matches], ["Miso Pasta Recipe"])
+        self.assertGreater(matches[0][1], 0.7)
+        self.index.remove("Miso Pasta Recipe")
+        self.assertEqual(self.index.query(self.index.signature(self.recipes[0]), exclude="Miso Pasta"), [])
+
+    def test_duplicates(self):
+        self.assertEqual([pair[:2] for pair in self.index.duplicates()], [("Miso Pasta", "Miso Pasta Recipe")])
+
+class DirectoryIndexTesting(unittest.TestCase):
+    def setUp(self):
+        self.root = temporary_directory(self)
+        self.directory = os.path.join(self.root, "jsons")
+        recipe("Miso Pasta", self.root).to_json("skip")
+        recipe("Chili", self.root, ["2 lb. beef", "2 cans beans"], ["Brown the beef.", "Simmer."]).to_json("skip")
+
+    def test_signatures_saved(self):
+        index = dedup.DirectoryIndex(self.directory).refresh()
+        self.assertEqual(len(index), 2)
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, dedup.SIGNATURES_FILE)))
+        # Loaded from the saved signatures rather than the json files
+        os.remove(os.path.join(self.directory, "Chili.json"))
+        reloaded = dedup.DirectoryIndex(self.directory)
+        self.assertEqual(sorted(reloaded.positions), ["Chili", "Miso Pasta"])
+        self.assertEqual(sorted(reloaded.refresh().positions), ["Miso Pasta"])
+
+    @patch.object(builtins, "input", no_prompt)
+    def test_check_duplicates(self):
+        duplicate = recipe("Miso Pasta Recipe", self.root)
+        image = os.path.join(self.root, "pdfs", "Miso Pasta Recipe.jpg")
+        os.makedirs(os.path.dirname(image))
+        open(image, "wb").close()
+        with self.assertRaises(DuplicateRecipe):
+            duplicate.check_duplicates("skip")
+        self.assertFalse(os.path.exists(image))
+        # The recipe's own json file is not a duplicate of it
+        recipe("Miso Pasta", self.root).check_duplicates("skip")
+        recipe("Chili Verde", self.root, ["2 lb. pork", "1 lb. tomatillos"], ["Roast.", "Simmer."]).check_duplicates(
+            "skip")
+
+    @patch.object(builtins, "input", no_prompt)
+    def test_unsaved_recipes_found(self):
+        jsons = os.path.join(self.root, "jsons")
+        stew = ["3 lb. pork shoulder", "2 onions", "1 can tomatoes"], ["Brown the pork well.", "Simmer for 2 hours."]
+        # Checked but not saved yet, as when two workers of a batch scrape near duplicates at once
+        recipe("Pork Stew", self.root, *stew).check_duplicates("skip")
+        with self.assertRaises(DuplicateRecipe):
+            recipe("Pork Stew Recipe", self.root, *stew).check_duplicates("skip")
+        dedup.unregister("Pork Stew", jsons)
+        recipe("Pork Stew Recipe", self.root, *stew).check_duplicates("skip")
+
+if __name__ == "__main__":
+    unittest.main()
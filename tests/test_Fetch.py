@@ -0,0 +1,177 @@
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
+import threading
+import time
+
+import fetch
+from tests.helpers import temporary_directory
+
+class PageHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        PageHandler.requests.append((self.path, self.headers.get("If-None-Match")))
+        etag = '"v1"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        filler = "<p>crème brûlée</p>" * 5000 if self.path.startswith("/long") else " " * 1000
+        body = ("<html><title>{}</title></html>".format(self.path) + filler).encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_GET(self):
+        KeepAliveHandler.requests.append((self.path, self.client_address[1]))
+        if self.path == "/missing" or (self.path == "/flaky" and len(KeepAliveHandler.requests) == 1):
+            self.send_response(404 if self.path == "/missing" else 503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = ("<html><title>{}</title></html>".format(self.path) + "<p>pasta</p>" * 1000).encode("utf-8")
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class RateLimitTesting(unittest.TestCase):
+    def test_bucket_spaces_requests(self):
+        bucket = fetch.TokenBucket(rate=20, capacity=1)
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        # First token is free, the next two each wait 1/20 s
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_hosts_limited_separately(self):
+        limiter = fetch.HostRateLimiter(rate=0.1, capacity=1)
+        start = time.monotonic()
+        limiter.wait("https://www.bonappetit.com/recipe/flaky-bread")
+        limiter.wait("https://cooking.nytimes.com/recipes/1023328-pasta-salad")
+        limiter.wait("https://www.seriouseats.com/some-recipe")
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(len(limiter.buckets), 3)
+
+class ResponseCacheTesting(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(self):
+        self.server.shutdown()
+        fetch.configure_cache(None)
+
+    def setUp(self):
+        PageHandler.requests.clear()
+        self.directory = temporary_directory(self)
+
+    def test_fresh_entry_skips_network(self):
+        fetch.configure_cache(self.directory, ttl=60)
+        first = fetch.get_page(self.base + "/pasta")
+        second = fetch.get_page(self.base + "/pasta")
+        self.assertEqual(first, second)
+        self.assertEqual(len(PageHandler.requests), 1)
+
+    def test_stale_entry_is_revalidated(self):
+        fetch.configure_cache(self.directory, ttl=0)
+        first = fetch.get_page(self.base + "/tart")
+        second = fetch.get_page(self.base + "/tart")
+        self.assertEqual(first, second)
+        self.assertEqual(PageHandler.requests, [("/tart", None), ("/tart", '"v1"')])
+
+    def test_offline_mode(self):
+        fetch.configure_cache(self.directory)
+        fetch.get_page(self.base + "/cake")
+        fetch.configure_cache(self.directory, ttl=0, offline=True)
+        self.assertIn("/cake", fetch.get_page(self.base + "/cake"))
+        self.assertRaises(fetch.CacheMiss, fetch.get_page, self.base + "/bread")
+        self.assertEqual(len(PageHandler.requests), 1)
+
+    def test_stream_stops_early(self):
+        fetch.configure_cache(self.directory)
+        seen = []
+        html, complete = fetch.stream_page(self.base + "/long-1", lambda text: seen.append(text) or len(seen) == 2,
+                                           chunk_size=1024)
+        self.assertFalse(complete)
+        self.assertTrue(html.startswith("<html><title>/long-1</title>"))
+        self.assertEqual(len(html.encode("utf-8")), 2048)
+        # Only whole pages are cached
+        self.assertIsNone(fetch.cache.lookup(self.base + "/long-1"))
+
+    def test_stream_whole_page(self):
+        fetch.configure_cache(self.directory)
+        # Chunks of 1000 bytes split some of the two byte characters
+        html, complete = fetch.stream_page(self.base + "/long-2", lambda text: False, chunk_size=1000)
+        self.assertTrue(complete)
+        self.assertEqual(html, fetch.get_page(self.base + "/long-2"))
+        self.assertEqual(len(PageHandler.requests), 1)
+
+    def test_size_cap_evicts_least_recently_used(self):
+        fetch.configure_cache(self.directory, max_bytes=2500)
+        fetch.get_page(self.base + "/a")
+        fetch.get_page(self.base + "/b")
+        fetch.get_page(self.base + "/a")
+        fetch.get_page(self.base + "/c")
+        self.assertIsNone(fetch.cache.lookup(self.base + "/b"))
+        self.assertIsNotNone(fetch.cache.lookup(self.base + "/a"))
+        self.assertIsNotNone(fetch.cache.lookup(self.base + "/c"))
+
+class ClientTesting(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        fetch.configure_client(backoff_factor=0)
+
+    @classmethod
+    def tearDownClass(self):
+        self.server.shutdown()
+        fetch.configure_client(backoff_factor=0.5)
+
+    def setUp(self):
+        KeepAliveHandler.requests.clear()
+
+    def test_connection_reused_and_decompressed(self):
+        pages = [fetch.get_page(self.base + path) for path in ["/a", "/b", "/c"]]
+        self.assertTrue(all(page.endswith("<p>pasta</p>") for page in pages))
+        # All three requests came over the same connection
+        self.assertEqual(len({port for _, port in KeepAliveHandler.requests}), 1)
+
+    def test_stream_decompressed(self):
+        html, complete = fetch.stream_page(self.base + "/d", lambda text: False, chunk_size=256)
+        self.assertTrue(complete)
+        self.assertEqual(html, fetch.get_page(self.base + "/d"))
+
+    def test_retry(self):
+        self.assertIn("/flaky", fetch.get_page(self.base + "/flaky"))
+        self.assertEqual([path for path, _ in KeepAliveHandler.requests], ["/flaky", "/flaky"])
+
+    def test_errors(self):
+        self.assertRaises(fetch.DownloadError, fetch.get_page, self.base + "/missing")
+        # Not worth retrying
+        self.assertEqual(len(KeepAliveHandler.requests), 1)
+        self.assertRaises(ValueError, fetch.configure_client, retry=1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from io import BytesIO
+from PIL import Image
+import os
+
+import images
+from tests.helpers import LibraryTestCase
+
+def encode(image, format):
+    output = BytesIO()
+    image.save(output, format)
+    return output.getvalue()
+
+class ConvertTesting(unittest.TestCase):
+    def test_large_jpeg_shrunk(self):
+        data, extension = images.convert(encode(Image.new("RGB", (2400, 1600), "orange"), "JPEG"))
+        self.assertEqual(extension, ".jpg")
+        self.assertEqual(Image.open(BytesIO(data)).size, (images.DISPLAY_WIDTH, 320))
+
+    def test_webp_becomes_jpeg(self):
+        data, extension = images.convert(encode(Image.new("RGB", (300, 200), "green"), "WEBP"))
+        self.assertEqual(extension, ".jpg")
+        self.assertEqual(Image.open(BytesIO(data)).format, "JPEG")
+        self.assertEqual(Image.open(BytesIO(data)).size, (300, 200))
+
+    def test_transparency_kept_as_png(self):
+        data, extension = images.convert(encode(Image.new("RGBA", (1000, 1000), (0, 0, 0, 0)), "PNG"))
+        self.assertEqual(extension, ".png")
+        self.assertEqual(Image.open(BytesIO(data)).mode, "RGBA")
+
+    def test_not_an_image(self):
+        self.assertRaises(OSError, images.convert, b"<html>Not found</html>")
+
+class StoreTesting(LibraryTestCase):
+    def test_duplicates_stored_once(self):
+        image = images.convert(encode(Image.new("RGB", (800, 600), "red"), "JPEG"))
+        first = images.save(image, "pdfs", "Pasta Salad")
+        second = images.save(image, "pdfs", "Pasta Salad Again")
+        self.assertEqual(os.path.basename(first), "Pasta Salad.jpg")
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertEqual(len(os.listdir(os.path.join("images", "store"))), 1)
+
+    def test_new_format_replaces_old_image(self):
+        with open(os.path.join("pdfs", "Tart.png"), "wb") as f:
+            f.write(encode(Image.new("RGB", (800, 600), "red"), "PNG"))
+        images.save(images.convert(encode(Image.new("RGB", (800, 600), "blue"), "JPEG")), "pdfs", "Tart")
+        self.assertEqual(os.listdir("pdfs"), ["Tart.jpg"])
+        self.assertEqual(images.image_path("pdfs", "Tart"), os.path.join("pdfs", "Tart.jpg"))
+
+        self.assertEqual(images.move("Tart", "pdfs", "images"), os.path.join("images", "Tart.jpg"))
+        self.assertIsNone(images.move("Tart", "pdfs", "images"))
+
+    def test_convert_saved_images(self):
+        with open(os.path.join("images", "Cake.png"), "wb") as f:
+            f.write(encode(Image.new("RGB", (2000, 1500), "white"), "PNG"))
+        self.assertGreater(images.convert_directory("images"), 0)
+        self.assertEqual(images.image_path("images", "Cake"), os.path.join("images", "Cake.jpg"))
+        # Converted images are left alone the second time
+        self.assertEqual(images.convert_directory("images"), 0)
+
+    def test_convert_library_elsewhere(self):
+        library = os.getcwd()
+        with open(os.path.join("images", "Cake.png"), "wb") as f:
+            f.write(encode(Image.new("RGB", (2000, 1500), "white"), "PNG"))
+        os.chdir("pdfs")
+        images.convert_directory(os.path.join(library, "images") + os.sep)
+        self.assertEqual(os.listdir(), [])
+        self.assertEqual(len(os.listdir(os.path.join(library, "images", "store"))), 1)
+
+if __name__ == "__main__":
+    unittest.main()
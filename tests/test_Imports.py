@@ -0,0 +1,27 @@
+import unittest
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["bs4", "pylatex", "PIL", "urllib3", "urllib.request", "sqlite3", "cProfile"]
+
+def loaded_after(code):
+    """
+    Heavy modules loaded by a fresh interpreter after running code
+    """
+    output = subprocess.check_output([sys.executable, "-c", code + "\nimport sys\nprint(' '.join(sys.modules))"],
+                                     cwd=ROOT, text=True)
+    return [name for name in HEAVY if name in output.split()]
+
+class ImportTesting(unittest.TestCase):
+    def test_scripts_import_light(self):
+        self.assertEqual(loaded_after("import create_latex, build, records"), [])
+
+    def test_loaded_when_used(self):
+        self.assertEqual(loaded_after("import recipes\nrecipe = recipes.Recipe.__new__(recipes.Recipe)\n"
+                                      "recipe.source = ''\nrecipe.parse_html('<p></p>')"), ["bs4"])
+        self.assertEqual(loaded_after("import create_latex\ncreate_latex.create_document()"), ["pylatex"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+
+import fetch
+import images
+import json_ld
+from recipes import Recipe
+from tests.helpers import LibraryTestCase
+
+METADATA = {
+    "@context": "https://schema.org",
+    "@graph": [
+        {"@type": "WebPage", "name": "Peach Dutch Baby Pancake"},
+        {"@type": ["Recipe"],
+         "name": "Peach Dutch Baby Pancake with Cherry Compote",
+         "totalTime": "PT1H45M",
+         "recipeYield": ["6", "6 to 8 Servings"],
+         "recipeIngredient": ["3 large eggs", "½ cup&nbsp;flour", "2 Tbsp. <b>unsalted</b> butter"],
+         "recipeInstructions": [
+             {"@type": "HowToStep", "text": "Make the compote. Do ahead: Compote can be made 3 days ahead."},
+             {"@type": "HowToSection", "name": "Pancake", "itemListElement": [
+                 {"@type": "HowToStep", "text": "Heat the oven."},
+                 {"@type": "HowToStep", "text": "Bake the pancake."}]},
+             {"@type": "HowToStep", "text": "Do ahead: Batter can be made 1 day ahead."}],
+         "image": [{"@type": "ImageObject", "url": "https://example.com/pancake.jpg"}],
+         "publisher": {"@type": "Organization", "name": "Example Kitchen"}}]}
+
+PAGE = """<html><head><title>Peach Dutch Baby Pancake | Example Kitchen</title>
+<script type="application/ld+json">not json</script>
+<script type="application/ld+json">{}</script></head><body><p>Lots of markup</p></body></html>
+""".format(json.dumps(METADATA))
+
+class JsonLdTesting(unittest.TestCase):
+    def test_recipe_found_in_graph(self):
+        self.assertEqual(json_ld.find_recipe(PAGE)["name"], "Peach Dutch Baby Pancake with Cherry Compote")
+        self.assertIsNone(json_ld.find_recipe("<html><title>No metadata</title></html>"))
+
+    def test_durations(self):
+        self.assertEqual(json_ld.format_duration("PT1H45M"), "1 hour 45 minutes")
+        self.assertEqual(json_ld.format_duration("P0DT2H0M"), "2 hours")
+        self.assertEqual(json_ld.format_duration("PT30M"), "30 minutes")
+        self.assertIsNone(json_ld.format_duration("PT0S"))
+        self.assertIsNone(json_ld.format_duration("about an hour"))
+
+    def test_yield(self):
+        self.assertEqual(json_ld.format_yield(["6", "6 to 8 Servings"]), "6 to 8 Servings")
+        self.assertEqual(json_ld.format_yield("4"), "4 servings")
+        self.assertEqual(json_ld.format_yield(8), "8 servings")
+        self.assertEqual(json_ld.format_yield("Makes 10 Servings"), "Makes 10 Servings")
+
+    def test_do_ahead_steps(self):
+        fields = json_ld.recipe_fields(PAGE)
+        self.assertEqual(fields["steps"], ["Step 1", "Do ahead", "Step 2", "Step 3", "Do ahead"])
+        self.assertEqual(fields["instructions"], ["Make the compote. ", "Compote can be made 3 days ahead.",
+                                                  "Heat the oven.", "Bake the pancake.",
+                                                  "Batter can be made 1 day ahead."])
+
+    def test_fields(self):
+        fields = json_ld.recipe_fields(PAGE, "https://example.com/recipes/pancake")
+        self.assertEqual(fields["total_time"], "1 hour 45 minutes")
+        self.assertEqual(fields["ingredients"][1], "½ cup flour")
+        self.assertEqual(fields["ingredients"][2], "2 Tbsp. unsalted butter")
+        self.assertEqual(fields["image_url"], "https://example.com/pancake.jpg")
+        self.assertEqual(fields["source"], "Example Kitchen")
+
+    def test_scanner_finds_metadata_while_downloading(self):
+        scanner = json_ld.PageScanner()
+        for start in range(0, len(PAGE), 7):
+            scanner.feed(PAGE[start:start + 7])
+            if scanner.recipe:
+                break
+        self.assertEqual(scanner.recipe, json_ld.find_recipe(PAGE))
+        self.assertEqual(scanner.title, json_ld.page_title(PAGE))
+        self.assertLess(len(scanner.html), len(PAGE))
+
+# The part of the page after the metadata, which streaming skips
+LONG_PAGE = PAGE + "<div>Related recipes</div>" * 1000
+
+# A supported website's page, whose markup has the times and servings as written by the website
+BON_APPETIT_PAGE = """<html><head><title>Peach Dutch Baby Pancake | Bon Appétit</title>
+<script type="application/ld+json">{}</script></head><body>
+<p>Active Time</p><p>30 minutes</p><p>Total Time</p><p>1 hr 45 minutes (plus 45 minute chill time)</p>
+<div><h2>Recipe information</h2><p>Yield</p><p>Serves 6</p></div>
+<picture><source media="(max-width: 767px)" srcset="https://example.com/pancake-small.jpg 767w"></picture>
+</body></html>""".format(json.dumps(METADATA))
+
+# The recipe in a supported website's markup, then its ratings, where streaming stops
+BON_APPETIT_RECIPE = BON_APPETIT_PAGE.replace("</body></html>", """
+<div><h2>Ingredients</h2><div><p>3</p><div>large eggs</div><p>½ cup</p><div>flour</div></div></div>
+<div><h2>Preparation</h2><h4>Step 1</h4><p>Heat the oven.</p><h4>Step 2</h4><p>Bake the pancake.</p></div>
+<div><h2>How would you rate Peach Dutch Baby Pancake?</h2></div>""")
+BON_APPETIT_REVIEWS = BON_APPETIT_RECIPE + "<div>A review</div>" * 1000 + "</body></html>"
+
+def stream(page, read):
+    """
+    Stands in for fetch.stream_page, recording how much of page is read
+    """
+    def stream_page(url, done, chunk_size=64):
+        for start in range(0, len(page), chunk_size):
+            if done(page[start:start + chunk_size]):
+                read.append(start + chunk_size)
+                return page[:start + chunk_size], False
+        read.append(len(page))
+        return page, True
+    return stream_page
+
+class JsonLdRecipeTesting(LibraryTestCase):
+    @patch.object(images, "fetch_image", return_value=(b"jpeg", ".jpg"))
+    @patch.object(fetch, "get_page", lambda url: PAGE)
+    def test_any_website_with_metadata(self, fetch_image):
+        recipe = Recipe("https://example.com/recipes/pancake", interactive=False)
+        self.assertEqual(recipe.title, "Peach Dutch Baby Pancake with Cherry Compote")
+        self.assertEqual(recipe.source, "Example Kitchen")
+        self.assertEqual(recipe.servings, "6 to 8 Servings")
+        self.assertEqual(recipe.ingredients, ["3 large eggs", "½ cup flour", "2 Tbsp. unsalted butter"])
+        self.assertEqual(len(recipe.steps), len(recipe.instructions))
+        fetch_image.assert_called_once_with("https://example.com/pancake.jpg")
+        self.assertTrue(os.path.isfile(os.path.join("pdfs", recipe.title + ".jpg")))
+        self.assertTrue(os.path.isfile(os.path.join("jsons", recipe.title + ".json")))
+
+    @patch.object(images, "fetch_image", return_value=(b"jpeg", ".jpg"))
+    @patch.object(fetch, "get_page", lambda url: LONG_PAGE)
+    def test_stream_stops_after_metadata(self, fetch_image):
+        read = []
+        with patch.object(fetch, "stream_page", stream(LONG_PAGE, read)):
+            recipe = Recipe("https://example.com/recipes/pancake", interactive=False, overwrite="skip", stream=True)
+        whole = Recipe("https://example.com/recipes/pancake", interactive=False, overwrite="skip")
+        self.assertEqual(vars(recipe), vars(whole))
+        # Read up to the end of the chunk holding the end of the metadata
+        self.assertLess(read[0], len(PAGE) + 64)
+
+    @patch.object(images, "fetch_image", return_value=(b"jpeg", ".jpg"))
+    @patch.object(fetch, "get_page", lambda url: BON_APPETIT_PAGE)
+    def test_markup_wins_on_supported_websites(self, fetch_image):
+        recipe = Recipe("https://www.bonappetit.com/recipe/peach-dutch-baby-pancake", interactive=False)
+        self.assertEqual(recipe.title, "Peach Dutch Baby Pancake")
+        self.assertEqual(recipe.active_time, "30 minutes")
+        self.assertEqual(recipe.total_time, "1 hr 45 minutes (plus 45 minute chill time)")
+        self.assertEqual(recipe.servings, "Serves 6")
+        # What the markup lacks comes from the metadata
+        self.assertEqual(recipe.ingredients, ["3 large eggs", "½ cup flour", "2 Tbsp. unsalted butter"])
+        fetch_image.assert_called_once_with("https://example.com/pancake.jpg")
+
+    @patch.object(images, "fetch_image", return_value=(b"jpeg", ".jpg"))
+    @patch.object(fetch, "get_page", lambda url: BON_APPETIT_REVIEWS)
+    def test_stream_stops_after_supported_recipe(self, fetch_image):
+        url = "https://www.bonappetit.com/recipe/peach-dutch-baby-pancake"
+        read = []
+        with patch.object(fetch, "stream_page", stream(BON_APPETIT_REVIEWS, read)):
+            recipe = Recipe(url, interactive=False, overwrite="skip", stream=True)
+        whole = Recipe(url, interactive=False, overwrite="skip")
+        self.assertEqual(vars(recipe), vars(whole))
+        self.assertEqual(recipe.instructions, ["Heat the oven.", "Bake the pancake."])
+        self.assertLess(read[0], len(BON_APPETIT_RECIPE) + 64)
+
+    @patch.object(images, "fetch_image", return_value=(b"jpeg", ".jpg"))
+    def test_stream_marker_before_recipe(self, fetch_image):
+        # The website moved its ratings above the recipe: the whole page is downloaded after all
+        page = BON_APPETIT_REVIEWS.replace("<body>", "<body><p>How would you rate it?</p>" + "<p>.</p>" * 100)
+        with patch.object(fetch, "stream_page", stream(page, [])), \
+                patch.object(fetch, "get_page", return_value=page) as get_page:
+            recipe = Recipe("https://www.bonappetit.com/recipe/peach-dutch-baby-pancake", interactive=False,
+                            stream=True)
+        get_page.assert_called_once()
+        self.assertEqual(recipe.ingredients, ["3 large eggs", "½ cup flour"])
+
+    @patch.object(fetch, "get_page", lambda url: "<html><title>Nothing here</title></html>")
+    def test_no_metadata_without_prompting(self):
+        self.assertRaises(ValueError, Recipe, "https://example.com/recipes/nothing", interactive=False)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import json
+import os
+
+from library import Library, QueryError
+from recipes import Recipe
+from tests.helpers import LibraryTestCase, RECIPE
+
+def recipe_dict(title, ingredients, instructions, my_notes=None):
+    return dict(RECIPE, title=title, total_time="1 hour", servings="4 servings", ingredients=ingredients,
+                instructions=instructions, my_notes=my_notes)
+
+class LibraryTesting(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        for recipe in [recipe_dict("Jammy Onion and Miso Pasta", ["1 lb. pasta", "3 Tbsp. white miso"],
+                                   ["Boil the pasta."]),
+                       recipe_dict("Crème Brûlée", {"Custard": ["2 cups cream", "5 egg yolks"]},
+                                   ["Bake in a water bath."], my_notes="Torch just before serving"),
+                       recipe_dict("Miso Glazed Salmon", ["2 Tbsp. miso", "4 salmon fillets"], ["Broil."])]:
+            with open(os.path.join("jsons", recipe["title"] + ".json"), "w", encoding="utf-8") as f:
+                json.dump(recipe, f, ensure_ascii=False)
+        self.library = Library()
+        self.assertEqual(self.library.import_directory("jsons"), 3)
+
+    def tearDown(self):
+        self.library.close()
+
+    def titles(self, query):
+        return sorted(title for _, title in self.library.search(query))
+
+    def test_search(self):
+        self.assertEqual(self.titles("miso"), ["Jammy Onion and Miso Pasta", "Miso Glazed Salmon"])
+        self.assertEqual(self.titles("ingredients: miso AND pasta"), ["Jammy Onion and Miso Pasta"])
+        self.assertEqual(self.titles("creme"), ["Crème Brûlée"])
+        self.assertEqual(self.titles("custard"), ["Crème Brûlée"])
+        self.assertEqual(self.titles("my_notes: torch"), ["Crème Brûlée"])
+        self.assertEqual(self.titles("salm*"), ["Miso Glazed Salmon"])
+
+    def test_search_punctuation(self):
+        self.library.add(recipe_dict("Gluten-Free Brownies", ["1 cup gluten-free flour"], ["Bake."]))
+        self.assertEqual(self.titles("gluten-free"), ["Gluten-Free Brownies"])
+        self.assertEqual(self.titles("ingredients:gluten-free NOT miso"), ["Gluten-Free Brownies"])
+        self.assertEqual(self.titles("crème brûlée's"), [])
+        self.assertEqual(self.titles('"white miso"'), ["Jammy Onion and Miso Pasta"])
+        self.assertRaises(QueryError, self.library.search, "(miso")
+
+    def test_reimport_replaces(self):
+        self.library.add(recipe_dict("Miso Glazed Salmon", ["2 Tbsp. gochujang", "4 salmon fillets"], ["Broil."]))
+        self.assertEqual(len(self.library), 3)
+        self.assertEqual(self.titles("miso AND salmon"), ["Miso Glazed Salmon"])
+        self.assertEqual(self.titles("ingredients: miso"), ["Jammy Onion and Miso Pasta"])
+
+    def test_get_by_id_or_title(self):
+        recipe_id, title = self.library.search("brulee")[0]
+        self.assertEqual(self.library.get(str(recipe_id))["title"], title)
+        self.assertEqual(self.library.get(title)["my_notes"], "Torch just before serving")
+        self.assertIsNone(self.library.get("Flaky Bread"))
+
+    def test_recipe_from_library(self):
+        with open(os.path.join("images", "Miso Glazed Salmon.jpg"), "wb") as f:
+            f.write(b"jpeg")
+        os.remove(os.path.join("jsons", "Miso Glazed Salmon.json"))
+        recipe = Recipe(file="Miso Glazed Salmon", overwrite="skip")
+        self.assertEqual(recipe.ingredients, ["2 Tbsp. miso", "4 salmon fillets"])
+        self.assertTrue(os.path.isfile(os.path.join("pdfs", "Miso Glazed Salmon.jpg")))
+        self.assertRaises(FileNotFoundError, Recipe, file="Flaky Bread")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import json
+import os
+
+import metrics
+from tests.helpers import temporary_directory
+
+class MetricsTesting(unittest.TestCase):
+    def setUp(self):
+        self.directory = temporary_directory(self)
+        self.path = os.path.join(self.directory, "metrics.jsonl")
+
+    def tearDown(self):
+        metrics.configure()
+
+    def records(self):
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_stages(self):
+        metrics.configure(self.path)
+        with metrics.recipe("https://www.bonappetit.com/recipe/pasta"):
+            with metrics.stage("page"):
+                with metrics.stage("request"):
+                    metrics.add_bytes(2048)
+            with self.assertRaises(ValueError), metrics.stage("site_parser"):
+                raise ValueError
+        request, page, parser = self.records()
+        self.assertEqual([request["stage"], page["stage"], parser["stage"]], ["request", "page", "site_parser"])
+        self.assertEqual(set(page), {"recipe", "stage", "wall", "cpu", "bytes", "peak_rss_mb"})
+        self.assertEqual(page["recipe"], "https://www.bonappetit.com/recipe/pasta")
+        self.assertEqual((request["bytes"], page["bytes"], parser["bytes"]), (2048, 2048, 0))
+        self.assertGreaterEqual(page["wall"], request["wall"])
+        self.assertEqual(parser["error"], "ValueError")
+
+    def test_profile(self):
+        profiles = os.path.join(self.directory, "profiles")
+        metrics.configure(profile=profiles)
+        with metrics.recipe("Flaky Bread"), metrics.stage("compile"), metrics.stage("document"):
+            sum(range(1000))
+        # Only the outer stage is profiled, with the nested one inside it
+        files = os.listdir(profiles)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].startswith("Flaky_Bread-compile-"))
+
+    def test_disabled(self):
+        with metrics.stage("page"):
+            metrics.add_bytes(10)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(metrics.enabled())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import os
+
+from records import RecipeRecord
+import pantry
+from tests.helpers import temporary_directory
+
+def record(title, ingredients, food_list=None):
+    return RecipeRecord({"title": title, "ingredients": ingredients, "food_list": food_list})
+
+RECIPES = [record("Omelette", ["3 large eggs", "1 Tbsp. unsalted butter", "Kosher salt"]),
+           record("Pancakes", ["2 cups all-purpose flour", "2 eggs", "1½ cups milk", "2 Tbsp. butter, melted"]),
+           record("Chili", {"For the chili:": ["2 lb. ground beef", "2 (14-oz.) cans beans", "3 garlic cloves"],
+                            "To serve:": ["Sour cream"]}),
+           record("Grilled Cheese", ["2 slices bread"], food_list=["bread", "cheddar cheese", "butter"])]
+
+class IngredientNameTesting(unittest.TestCase):
+    def test_ingredient_name(self):
+        self.assertEqual(pantry.ingredient_name("Large eggs"), "egg")
+        self.assertEqual(pantry.ingredient_name("garlic cloves"), "garlic")
+        self.assertEqual(pantry.ingredient_name("unsalted butter or ghee"), "butter")
+        self.assertEqual(pantry.ingredient_name("freshly ground black pepper"), "black pepper")
+        self.assertEqual(pantry.ingredient_name("tomatoes"), "tomato")
+        self.assertEqual(pantry.ingredient_name("chickpeas"), "chickpeas")
+        # Unit words and descriptors that are also ingredient names
+        self.assertEqual(pantry.ingredient_name("ground cloves"), "clove")
+        self.assertEqual(pantry.ingredient_name("whole cloves"), "clove")
+        self.assertEqual(pantry.ingredient_name("hot sauce"), "hot sauce")
+
+    def test_recipe_ingredients(self):
+        self.assertEqual(pantry.recipe_ingredients(RECIPES[0]), ["butter", "egg", "salt"])
+        # The food list is used when there is one
+        self.assertEqual(pantry.recipe_ingredients(RECIPES[3]), ["bread", "butter", "cheddar cheese"])
+
+class IngredientMatrixTesting(unittest.TestCase):
+    def setUp(self):
+        self.matrix = pantry.IngredientMatrix.from_recipes(RECIPES)
+
+    def test_cook(self):
+        results = self.matrix.cook(["eggs", "butter"], missing=2)
+        self.assertEqual(results, [("Omelette", 1.0, []), ("Pancakes", 0.5, ["all-purpose flour", "milk"]),
+                                   ("Grilled Cheese", 1 / 3, ["bread", "cheddar cheese"])])
+        self.assertEqual(self.matrix.cook(["eggs", "butter"], missing=0, staples=[]), [])
+        self.assertEqual([title for title, _, _ in self.matrix.cook(["bread", "butter"], missing=1)],
+                         ["Omelette", "Grilled Cheese"])
+
+    def test_pairs(self):
+        self.assertEqual(self.matrix.pairs("butter")[:2], [("egg", 2, 2 / 3), ("salt", 1, 1 / 3)])
+        self.assertRaises(KeyError, self.matrix.pairs, "saffron")
+
+    def test_save_and_load(self):
+        directory = temporary_directory(self)
+        path = os.path.join(directory, "pantry.npz")
+        self.matrix.save(path)
+        loaded = pantry.IngredientMatrix.load(path)
+        self.assertEqual(loaded.vocabulary.tolist(), self.matrix.vocabulary.tolist())
+        self.assertEqual(loaded.cook(["beef", "beans", "garlic"], missing=1),
+                         self.matrix.cook(["beef", "beans", "garlic"], missing=1))
+
+if __name__ == "__main__":
+    unittest.main()
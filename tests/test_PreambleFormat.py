@@ -0,0 +1,80 @@
+import unittest
+import json
+import os
+import stat
+import sys
+
+import create_latex
+from tests.helpers import temporary_directory
+
+# Stands in for pdflatex: -ini writes the format named by -jobname, otherwise it writes the pdf and records the
+# arguments and tex it was given
+FAKE_PDFLATEX = """#!{python}
+import json, os, sys
+arguments = sys.argv[1:]
+if "-ini" in arguments:
+    name = next(argument for argument in arguments if argument.startswith("-jobname="))[len("-jobname="):]
+    open(name + ".fmt", "w").write(open("preamble.tex").read())
+else:
+    tex = arguments[-1]
+    open(tex[:-len(".tex")] + ".pdf", "w").write("pdf")
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "calls.jsonl"), "a") as f:
+        f.write(json.dumps({{"arguments": arguments, "tex": open(tex).read()}}) + "\\n")
+"""
+
+class Recipe:
+    def __init__(self, title):
+        self.__dict__.update({"url": "", "source": "", "title": title, "active_time": None, "total_time": None,
+                              "servings": None, "ingredients": ["Flour"], "food_list": None, "steps": ["Step 1"],
+                              "instructions": ["Bake."], "my_notes": None, "type": None})
+
+class PreambleFormatTesting(unittest.TestCase):
+    def setUp(self):
+        self.directory = temporary_directory(self)
+        self.bin = os.path.join(self.directory, "bin")
+        os.mkdir(self.bin)
+        pdflatex = os.path.join(self.bin, "pdflatex")
+        with open(pdflatex, "w") as f:
+            f.write(FAKE_PDFLATEX.format(python=sys.executable))
+        os.chmod(pdflatex, os.stat(pdflatex).st_mode | stat.S_IEXEC)
+        self.path = os.environ["PATH"]
+        os.environ["PATH"] = self.bin + os.pathsep + self.path
+        self.formats = os.path.join(self.directory, "formats")
+        create_latex.configure_preamble_format(self.formats)
+
+    def tearDown(self):
+        os.environ["PATH"] = self.path
+        create_latex.configure_preamble_format(None)
+
+    def calls(self):
+        with open(os.path.join(self.bin, "calls.jsonl")) as f:
+            return [json.loads(line) for line in f]
+
+    def test_compiles_against_format(self):
+        for title in ["Flaky Bread", "Pasta"]:
+            create_latex.generate_latex(Recipe(title), image="image.png", directory=self.directory)
+        # Dumped once, with the packages every recipe loads
+        formats = os.listdir(self.formats)
+        self.assertEqual(len(formats), 1)
+        with open(os.path.join(self.formats, formats[0])) as f:
+            self.assertIn(r"\usepackage{gensymb}", f.read())
+        for call in self.calls():
+            self.assertIn("-fmt=" + os.path.join(self.formats, formats[0][:-len(".fmt")]), call["arguments"])
+            # The recipe's own preamble comes after the part the format skips
+            fixed, marker, rest = call["tex"].partition("\\csname endofdump\\endcsname")
+            self.assertIn(r"\usepackage{times}", fixed)
+            self.assertIn(r"\title{", rest)
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, "Pasta.pdf")))
+
+    def test_new_format_when_template_changes(self):
+        from pylatex import Package
+        doc = create_latex.recipe_document(Recipe("Pasta"), "image.png")
+        first = create_latex.preamble_format(doc, self.formats)
+        self.assertEqual(create_latex.preamble_format(create_latex.recipe_document(Recipe("Bread"), "image.png"),
+                                                      self.formats), first)
+        doc.packages.append(Package("xcolor"))
+        self.assertNotEqual(create_latex.preamble_format(doc, self.formats), first)
+        self.assertEqual(len(os.listdir(self.formats)), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import os
+
+import create_latex
+import preview
+from tests import helpers
+from tests.helpers import temporary_directory
+
+CHILI = {"url": "https://www.seriouseats.com/chili-recipe", "source": "Serious Eats", "title": "Chili & Beans",
+         "active_time": "30 minutes", "total_time": "2 hours", "servings": "Serves 4",
+         "ingredients": ["2 lb. beef <80% lean>", "½ cup beans"], "steps": ["Step 1", "Step 2"],
+         "instructions": ["Brown the *beef*.", "Simmer at 350˚."]}
+
+def recipe(**fields):
+    return helpers.recipe(**dict(CHILI, **fields))
+
+GROUPED = {"ingredients": {"For the chili": ["2 lb. beef"], "To serve": ["Sour cream"]},
+           "steps": ["Step 1", "Step 2", "Do ahead", "Notes"],
+           "instructions": {"For the chili": ["Brown the beef.", "Simmer."],
+                            "To serve": ["Chili can be made 3 days ahead.", "Use any beans."]},
+           "my_notes": "Double the cumin"}
+
+class OutlineTesting(unittest.TestCase):
+    def test_flat(self):
+        times, sections = create_latex.recipe_outline(recipe())
+        self.assertEqual(times, [("Active Time", "30 minutes"), ("Total Time", "2 hours")])
+        self.assertEqual([heading for heading, _ in sections], ["Ingredients", "Preparation", "Source"])
+        self.assertEqual(sections[0][1], ("Serves 4", [(None, ["2 lb. beef <80% lean>", "½ cup beans"])]))
+        self.assertEqual(sections[1][1], [(None, [("Step 1", "Brown the *beef*."), ("Step 2", "Simmer at 350˚.")])])
+
+    def test_grouped(self):
+        times, sections = create_latex.recipe_outline(recipe(active_time=None, **GROUPED))
+        self.assertEqual(times, [("Total Time", "2 hours")])
+        # Steps are numbered across the groups
+        self.assertEqual(sections[1][1], [("For the chili", [("Step 1", "Brown the beef."), ("Step 2", "Simmer.")]),
+                                          ("To serve", [("Do ahead", "Chili can be made 3 days ahead."),
+                                                        ("Notes", "Use any beans.")])])
+        self.assertEqual(sections[2], ("My Notes", "Double the cumin"))
+
+class PreviewTesting(unittest.TestCase):
+    def test_html(self):
+        page = preview.to_html(recipe())
+        self.assertTrue(page.startswith("<!DOCTYPE html>"))
+        self.assertIn("<title>Chili &amp; Beans</title>", page)
+        self.assertIn("<li>2 lb. beef &lt;80% lean&gt;</li>", page)
+        self.assertIn("<li>½ cup beans</li>", page)
+        self.assertIn("<h3>Step 2</h3>\n<p>Simmer at 350˚.</p>", page)
+        self.assertIn('<a href="https://www.seriouseats.com/chili-recipe">', page)
+
+    def test_html_grouped(self):
+        page = preview.to_html(recipe(**GROUPED))
+        self.assertIn("<p><b>To serve</b></p>\n<ul>\n<li>Sour cream</li>", page)
+        self.assertIn("<h3>To serve</h3>\n<h4>Do ahead</h4>\n<p>Chili can be made 3 days ahead.</p>", page)
+        self.assertIn("<h2>My Notes</h2>\n<p>Double the cumin</p>", page)
+
+    def test_markdown(self):
+        document = preview.to_markdown(recipe(**GROUPED))
+        self.assertTrue(document.startswith("# Chili & Beans\n\n*Serious Eats*\n"))
+        self.assertIn("**Active Time:** 30 minutes **Total Time:** 2 hours", document)
+        self.assertIn("**For the chili**\n\n- 2 lb. beef\n", document)
+        self.assertIn("### To serve\n\n#### Do ahead\n\nChili can be made 3 days ahead.\n", document)
+        self.assertIn("## Source\n\n<https://www.seriouseats.com/chili-recipe>", document)
+        self.assertIn("Brown the \\*beef\\*.", preview.to_markdown(recipe()))
+
+    def test_write_preview(self):
+        directory = temporary_directory(self)
+        image = os.path.join(directory, "chili.jpg")
+        with open(image, "wb") as f:
+            f.write(b"\xff\xd8\xff")
+        path = preview.write_preview(recipe(), "html", os.path.join(directory, "previews"), image)
+        self.assertEqual(os.path.basename(path), "Chili & Beans.html")
+        with open(path, encoding="utf-8") as f:
+            self.assertIn('<img src="data:image/jpeg;base64,/9j/"', f.read())
+        path = preview.write_preview(recipe(), "markdown", os.path.join(directory, "previews"), image)
+        with open(path, encoding="utf-8") as f:
+            self.assertIn("![Chili & Beans](<../chili.jpg>)", f.read())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import json
+import os
+
+from recipes import Recipe
+import quantities
+import records
+from tests.helpers import temporary_directory
+
+PASTA = {"url": "https://www.bonappetit.com/recipe/jammy-onion-and-miso-pasta", "source": "Bon Appetit",
+         "title": "Jammy Onion and Miso Pasta", "active_time": None, "total_time": "1 hour",
+         "servings": "4 servings", "ingredients": ["1 lb. pasta", "3 Tbsp. white miso", "2 Tbsp. butter",
+                                                   "Kosher salt"],
+         "food_list": None, "steps": ["Step 1"], "instructions": ["Boil the pasta."], "my_notes": None, "type": None}
+CHILI = {"url": "", "source": "Serious Eats", "title": "Chili", "active_time": "1 hour", "total_time": "3 hours",
+         "servings": "Serves 2", "ingredients": {"For the chili:": ["500 g pasta", "1–2 (14-oz.) cans beans, drained"],
+                                                 "To serve:": ["¼ cup butter", "Kosher salt"]},
+         "food_list": None, "steps": ["Step 1"], "instructions": ["Simmer."], "my_notes": None, "type": None}
+
+class ParseTesting(unittest.TestCase):
+    def test_parse_ingredient(self):
+        self.assertEqual(quantities.parse_ingredient("1–2 Tbsp. olive oil (optional), divided"),
+                         {"quantity": [1, 2], "unit": "tbsp", "item": "olive oil", "note": "optional, divided"})
+        self.assertEqual(quantities.parse_ingredient("1 1/2 cups all-purpose flour")["quantity"], [1.5, 1.5])
+        self.assertEqual(quantities.parse_ingredient("1½ tsp. kosher salt")["quantity"], [1.5, 1.5])
+        self.assertEqual(quantities.parse_ingredient("4 to 6 sprigs thyme")["unit"], "sprig")
+        self.assertEqual(quantities.parse_ingredient("2 (14-oz.) cans chickpeas")["note"], "14-oz.")
+        self.assertEqual(quantities.parse_ingredient("Kosher salt"),
+                         {"quantity": None, "unit": None, "item": "Kosher salt", "note": None})
+        # "g" in "garlic" is not grams
+        self.assertEqual(quantities.parse_ingredient("2 garlic cloves")["unit"], None)
+        # An odd line does not stop the recipe from loading
+        self.assertEqual(quantities.parse_ingredient("1/0 cup flour"),
+                         {"quantity": None, "unit": None, "item": "1/0 cup flour", "note": None})
+
+    def test_grouped_ingredients(self):
+        parsed = quantities.parse_ingredients(CHILI["ingredients"])
+        self.assertEqual(list(parsed), ["For the chili:", "To serve:"])
+        self.assertEqual(parsed["To serve:"][0]["quantity"], [0.25, 0.25])
+
+    def test_serving_count(self):
+        self.assertEqual(quantities.serving_count("Serves 6"), 6)
+        self.assertEqual(quantities.serving_count("6 to 8 Servings"), 6)
+        self.assertIsNone(quantities.serving_count("A crowd"))
+
+class QuantityTableTesting(unittest.TestCase):
+    def setUp(self):
+        directory = temporary_directory(self)
+        self.recipes = []
+        for recipe_dict in [PASTA, CHILI]:
+            path = os.path.join(directory, recipe_dict["title"] + ".json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(recipe_dict, f)
+            self.recipes.append(Recipe.load(path, root=directory))
+
+    def test_scaled_and_converted(self):
+        table = quantities.plan(self.recipes, 8)
+        # Pasta for 4 is doubled, chili for 2 is quadrupled
+        self.assertEqual(table.amounts()[:3], ["2 lb", "6 tbsp", "4 tbsp"])
+        self.assertEqual(table.converted("us").amounts()[1:3], ["3/8 cup", "1/4 cup"])
+        self.assertEqual(table.converted("metric").amounts()[4], "2 kg")
+        self.assertEqual(table.amounts()[5], "4-8 cans")
+
+    def test_quarts(self):
+        record = records.RecipeRecord(dict(PASTA, ingredients=["2 l stock", "500 ml milk"]))
+        table = quantities.QuantityTable.from_recipes([record])
+        self.assertEqual(table.converted("us").amounts(), ["2 1/8 quarts", "2 1/8 cups"])
+
+    def test_shopping_list(self):
+        shopping = dict(quantities.plan(self.recipes, 8).shopping_list("us").lines())
+        # 4 Tbsp. and 1 cup of butter; 2 lb. and 2 kg of pasta
+        self.assertEqual(shopping["butter"], "1 1/4 cups")
+        self.assertEqual(shopping["pasta"], "6 3/8 lb")
+        self.assertEqual(shopping["kosher salt"], "")
+
+    def test_records(self):
+        record = records.RecipeRecord(vars(self.recipes[1]))
+        table = quantities.QuantityTable.from_recipes([record])
+        self.assertEqual(table.amounts(), ["500 g", "1-2 cans", "1/4 cup", ""])
+
+if __name__ == "__main__":
+    unittest.main()
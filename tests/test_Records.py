@@ -0,0 +1,76 @@
+import unittest
+import json
+import os
+
+from create_latex import create_document, add_recipe
+from recipes import Recipe
+import records
+from tests.helpers import temporary_directory
+
+PASTA = {"url": "https://www.bonappetit.com/recipe/jammy-onion-and-miso-pasta", "source": "Bon Appetit",
+         "title": "Jammy Onion and Miso Pasta", "active_time": None, "total_time": "1 hour",
+         "servings": "4 servings", "ingredients": ["1 lb. pasta", "3 Tbsp. white miso", "Kosher salt"],
+         "food_list": None, "steps": ["Step 1", "Step 2"], "instructions": ["Cook the onions.", "Boil the pasta."],
+         "my_notes": "Use bucatini", "type": "dinner"}
+CHILI = {"url": "", "source": "Serious Eats", "title": "Chili", "active_time": "1 hour", "total_time": "3 hours",
+         "servings": "Serves 6", "ingredients": {"For the chili:": ["2 lb. beef", "Kosher salt"],
+                                                 "To serve:": ["Sour cream"]},
+         "food_list": ["beef", "kosher salt", "sour cream"], "steps": ["Step 1"], "instructions": ["Simmer."],
+         "my_notes": None, "type": None}
+
+class RecipeRecordTesting(unittest.TestCase):
+    def test_read_only(self):
+        record = records.RecipeRecord(PASTA)
+        self.assertEqual(record.ingredients, ("1 lb. pasta", "3 Tbsp. white miso", "Kosher salt"))
+        self.assertRaises(AttributeError, setattr, record, "title", "Pasta")
+        self.assertRaises(AttributeError, setattr, record, "soup", None)
+        with self.assertRaises(TypeError):
+            records.RecipeRecord(CHILI).ingredients["More:"] = ()
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_repeated_strings_shared(self):
+        pasta = records.RecipeRecord(json.loads(json.dumps(PASTA)))
+        chili = records.RecipeRecord(json.loads(json.dumps(CHILI)))
+        self.assertIs(pasta.ingredients[2], chili.ingredients["For the chili:"][1])
+        self.assertIs(pasta.steps[0], chili.steps[0])
+
+    def test_renders_like_recipe(self):
+        directory = temporary_directory(self)
+        for recipe_dict in [PASTA, CHILI]:
+            path = os.path.join(directory, recipe_dict["title"] + ".json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(recipe_dict, f)
+            recipe_doc, record_doc = create_document(), create_document()
+            add_recipe(recipe_doc, Recipe.load(path))
+            add_recipe(record_doc, records.RecipeRecord(recipe_dict))
+            self.assertEqual(recipe_doc.dumps(), record_doc.dumps())
+
+class RecipeLibraryTesting(unittest.TestCase):
+    def setUp(self):
+        self.directory = temporary_directory(self)
+        for recipe_dict in [PASTA, CHILI]:
+            with open(os.path.join(self.directory, recipe_dict["title"] + ".json"), "w", encoding="utf-8") as f:
+                json.dump(recipe_dict, f, indent=4)
+        self.path = os.path.join(self.directory, "recipes.jsonl")
+        self.assertEqual(records.consolidate(self.directory, self.path), 2)
+
+    def test_decoded_on_access(self):
+        library = records.RecipeLibrary(self.path)
+        self.assertEqual(len(library), 2)
+        chili = library[0]
+        self.assertIsNone(chili.record)
+        self.assertEqual(chili.servings, "Serves 6")
+        self.assertIsInstance(chili.record, records.RecipeRecord)
+        self.assertEqual([recipe.title for recipe in library], ["Chili", "Jammy Onion and Miso Pasta"])
+        self.assertEqual(library[-1].my_notes, "Use bucatini")
+        self.assertRaises(IndexError, library.__getitem__, 2)
+        library.close()
+
+    def test_empty_library(self):
+        open(self.path, "w").close()
+        library = records.RecipeLibrary(self.path)
+        self.assertEqual(list(library), [])
+        library.close()
+
+if __name__ == "__main__":
+    unittest.main()
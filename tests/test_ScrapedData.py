@@ -1,27 +1,39 @@
 import unittest
-from unittest.mock import patch
-import time
-import random
 import os
-import builtins
 
+import fetch
+import images
 from recipes import Recipe
 
+# Pages and images behind the test urls, recorded in the response cache format
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECORDING = bool(os.environ.get("RECORD_FIXTURES"))
+RECORDED = os.path.isdir(os.path.join(FIXTURES, "entries"))
+
+def setUpModule():
+    if RECORDED and not RECORDING:
+        fetch.configure_cache(FIXTURES, offline=True)
+    else:
+        # Recording, or testing against the live websites until fixtures are recorded: stay polite to the websites,
+        # at most one request every three seconds per host
+        fetch.set_rate_limit(1 / 3)
+        if RECORDING:
+            fetch.configure_cache(FIXTURES, ttl=0, max_bytes=2 ** 40)
+
+def tearDownModule():
+    fetch.set_rate_limit(None)
+    fetch.configure_cache(None)
+
 class BonAppetitTesting(unittest.TestCase):
     @classmethod
-    @unittest.mock.patch.object(builtins, "input", lambda _: 'n')
     def setUpClass(self):
-        self.pasta = Recipe("https://www.bonappetit.com/recipe/jammy-onion-and-miso-pasta")
-        time.sleep(random.randrange(1, 6) + random.random())
-        self.tart = Recipe("https://www.bonappetit.com/recipe/strawberry-biscoff-cheesecake-tart")
-        time.sleep(random.randrange(1, 6) + random.random())
-        self.cake = Recipe("https://www.bonappetit.com/recipe/appalachian-apple-stack-cake")
-        time.sleep(random.randrange(1, 6) + random.random())
-        self.bread = Recipe("https://www.bonappetit.com/recipe/flaky-bread")
-        time.sleep(random.randrange(1, 6) + random.random())
-        self.pancake = Recipe("https://www.bonappetit.com/recipe/peach-dutch-baby-pancake-with-cherry-compote")
-        time.sleep(random.randrange(1, 6) + random.random())
-        self.aloo = Recipe("https://www.bonappetit.com/recipe/aloo-tikki-with-hari-chutney")
+        self.pasta = Recipe("https://www.bonappetit.com/recipe/jammy-onion-and-miso-pasta", overwrite="skip")
+        self.tart = Recipe("https://www.bonappetit.com/recipe/strawberry-biscoff-cheesecake-tart", overwrite="skip")
+        self.cake = Recipe("https://www.bonappetit.com/recipe/appalachian-apple-stack-cake", overwrite="skip")
+        self.bread = Recipe("https://www.bonappetit.com/recipe/flaky-bread", overwrite="skip")
+        self.pancake = Recipe("https://www.bonappetit.com/recipe/peach-dutch-baby-pancake-with-cherry-compote",
+                              overwrite="skip")
+        self.aloo = Recipe("https://www.bonappetit.com/recipe/aloo-tikki-with-hari-chutney", overwrite="skip")
 
     def test_url(self):
         self.assertEqual(self.pasta.url, "https://www.bonappetit.com/recipe/jammy-onion-and-miso-pasta")
@@ -100,12 +112,12 @@ class BonAppetitTesting(unittest.TestCase):
         self.assertEqual(len(self.aloo.steps), len(self.aloo.instructions))
 
     def test_image_and_delete(self):
-        pasta_image_file = os.path.join(os.getcwd(), "pdfs", self.pasta.title + ".png")
-        tart_image_file = os.path.join(os.getcwd(), "pdfs", self.tart.title + ".png")
-        cake_image_file = os.path.join(os.getcwd(), "pdfs", self.cake.title + ".png")
-        bread_image_file = os.path.join(os.getcwd(), "pdfs", self.bread.title + ".png")
-        pancake_image_file = os.path.join(os.getcwd(), "pdfs", self.pancake.title + ".png")
-        aloo_image_file = os.path.join(os.getcwd(), "pdfs", self.aloo.title + ".png")
+        pasta_image_file = images.image_path(os.path.join(os.getcwd(), "pdfs"), self.pasta.title)
+        tart_image_file = images.image_path(os.path.join(os.getcwd(), "pdfs"), self.tart.title)
+        cake_image_file = images.image_path(os.path.join(os.getcwd(), "pdfs"), self.cake.title)
+        bread_image_file = images.image_path(os.path.join(os.getcwd(), "pdfs"), self.bread.title)
+        pancake_image_file = images.image_path(os.path.join(os.getcwd(), "pdfs"), self.pancake.title)
+        aloo_image_file = images.image_path(os.path.join(os.getcwd(), "pdfs"), self.aloo.title)
 
         self.assertTrue(os.path.isfile(pasta_image_file))
         self.assertTrue(os.path.isfile(tart_image_file))
@@ -122,15 +134,13 @@ class BonAppetitTesting(unittest.TestCase):
 
 class NYTimesCookingTesting(unittest.TestCase):
     @classmethod
-    @unittest.mock.patch.object(builtins, "input", lambda _: 'n')
     def setUpClass(self):
-        self.pasta = Recipe("https://cooking.nytimes.com/recipes/1023328-pasta-salad")
-        time.sleep(random.randrange(1, 6) + random.random())
-        self.dutch_bb = Recipe("https://cooking.nytimes.com/recipes/1024286-goat-cheese-and-dill-dutch-baby")
-        time.sleep(random.randrange(1, 6) + random.random())
+        self.pasta = Recipe("https://cooking.nytimes.com/recipes/1023328-pasta-salad", overwrite="skip")
+        self.dutch_bb = Recipe("https://cooking.nytimes.com/recipes/1024286-goat-cheese-and-dill-dutch-baby",
+                               overwrite="skip")
         self.soup = Recipe(
-            "https://cooking.nytimes.com/recipes/1857-thomas-kellers-butternut-squash-soup-with-brown-butter")
-        time.sleep(random.randrange(1, 6) + random.random())
+            "https://cooking.nytimes.com/recipes/1857-thomas-kellers-butternut-squash-soup-with-brown-butter",
+            overwrite="skip")
 
     def test_url(self):
         self.assertEqual(self.pasta.url, "https://cooking.nytimes.com/recipes/1023328-pasta-salad")
@@ -179,9 +189,9 @@ class NYTimesCookingTesting(unittest.TestCase):
         self.assertEqual(len(self.soup.steps), len(self.soup.instructions))
 
     def test_image_and_delete(self):
-        pasta_image_file = os.path.join(os.getcwd(), "pdfs", self.pasta.title + ".png")
-        dutch_bb_image_file = os.path.join(os.getcwd(), "pdfs", self.dutch_bb.title + ".png")
-        soup_image_file = os.path.join(os.getcwd(), "pdfs", self.soup.title + ".png")
+        pasta_image_file = images.image_path(os.path.join(os.getcwd(), "pdfs"), self.pasta.title)
+        dutch_bb_image_file = images.image_path(os.path.join(os.getcwd(), "pdfs"), self.dutch_bb.title)
+        soup_image_file = images.image_path(os.path.join(os.getcwd(), "pdfs"), self.soup.title)
 
         self.assertTrue(os.path.isfile(pasta_image_file))
         self.assertTrue(os.path.isfile(dutch_bb_image_file))
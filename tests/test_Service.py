@@ -0,0 +1,112 @@
+import unittest
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import json
+import os
+import tempfile
+import threading
+import time
+
+import service
+
+def fake_render(url, **options):
+    """
+    Stands in for render_url in the worker processes: slow urls take a while, others fail or write a pdf
+    """
+    if "slow" in url:
+        time.sleep(0.5)
+    if "broken" in url:
+        raise ValueError("no recipe on this page")
+    if "crash" in url:
+        os._exit(1)
+    title = url.rsplit("/", 1)[-1]
+    path = os.path.join(tempfile.gettempdir(), "service-test-{}-{}.pdf".format(os.getpid(), title))
+    with open(path, "wb") as f:
+        f.write(b"%PDF " + title.encode("utf-8"))
+    return title, path
+
+class ServiceTesting(unittest.TestCase):
+    def setUp(self):
+        self.service = service.RenderService(workers=1, queue_size=1, task=fake_render)
+        self.service.start()
+        self.server = service.make_server(self.service, port=0)
+        self.server.RequestHandlerClass.log_message = lambda *args: None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.address = "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.close()
+
+    def request(self, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        try:
+            with urlopen(Request(self.address + path, data=data)) as response:
+                return response.status, response.read()
+        except HTTPError as e:
+            return e.code, e.read()
+
+    def post(self, url):
+        code, body = self.request("/jobs", {"url": url})
+        return code, json.loads(body)
+
+    def test_render(self):
+        code, job = self.post("https://www.bonappetit.com/recipe/pasta")
+        self.assertEqual(code, 202)
+        self.assertEqual(self.request("/jobs/{}/pdf?wait=10".format(job["id"])), (200, b"%PDF pasta"))
+        code, body = self.request("/jobs/" + job["id"])
+        self.assertEqual(json.loads(body)["status"], "done")
+        self.assertEqual(json.loads(self.request("/status")[1])["completed"], 1)
+
+    def test_failure(self):
+        _, job = self.post("https://www.bonappetit.com/recipe/broken")
+        code, body = self.request("/jobs/{}/pdf?wait=10".format(job["id"]))
+        self.assertEqual(code, 500)
+        self.assertEqual(json.loads(body)["error"], "ValueError: no recipe on this page")
+
+    def test_queue_and_duplicates(self):
+        _, first = self.post("https://www.bonappetit.com/recipe/slow-1")
+        code, duplicate = self.post("https://www.bonappetit.com/recipe/slow-1")
+        self.assertEqual((code, duplicate["id"]), (200, first["id"]))
+        code, second = self.post("https://www.bonappetit.com/recipe/slow-2")
+        self.assertEqual(code, 202)
+        time.sleep(0.2)
+        # The executor already hands the second job to its call queue, but it waits for the worker
+        self.assertEqual(json.loads(self.request("/jobs/" + second["id"])[1])["status"], "queued")
+        status = json.loads(self.request("/status")[1])
+        self.assertEqual((status["running"], status["queued"]), (1, 1))
+        # One job running and one queued is all a single worker with a queue of one takes
+        self.assertEqual(self.post("https://www.bonappetit.com/recipe/slow-3")[0], 503)
+        self.assertEqual(self.request("/jobs/{}/pdf".format(first["id"]))[0], 202)
+        self.assertEqual(self.request("/jobs/{}/pdf?wait=10".format(first["id"])), (200, b"%PDF slow-1"))
+        # Finished jobs are not in flight any more, so the same url is rendered again
+        self.assertNotEqual(self.post("https://www.bonappetit.com/recipe/slow-1")[1]["id"], first["id"])
+
+    def test_worker_crash(self):
+        _, job = self.post("https://www.bonappetit.com/recipe/crash")
+        code, body = self.request("/jobs/{}/pdf?wait=10".format(job["id"]))
+        self.assertEqual(code, 500)
+        self.assertTrue(json.loads(body)["error"].startswith("BrokenProcessPool"))
+        # The next job gets a new pool of workers
+        code, job = self.post("https://www.bonappetit.com/recipe/pasta")
+        self.assertEqual(code, 202)
+        self.assertEqual(self.request("/jobs/{}/pdf?wait=10".format(job["id"])), (200, b"%PDF pasta"))
+
+    def test_submit_failure(self):
+        self.service.close()
+        self.assertRaises(RuntimeError, self.service.submit, "https://www.bonappetit.com/recipe/pasta")
+        self.assertEqual(self.service.in_flight, {})
+        self.assertEqual(len(self.service.jobs), 0)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.request("/jobs", {"title": "Pasta"})[0], 400)
+        self.assertEqual(self.request("/jobs", {"url": "https://www.bonappetit.com/recipe/pasta",
+                                                "overwrite": "ask"})[0], 400)
+        for type in ["../../x", "a/b", "..", ["Desserts"]]:
+            self.assertEqual(self.request("/jobs", {"url": "https://www.bonappetit.com/recipe/pasta",
+                                                    "type": type})[0], 400)
+        self.assertEqual(self.request("/jobs/unknown")[0], 404)
+
+if __name__ == "__main__":
+    unittest.main()
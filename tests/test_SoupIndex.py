@@ -0,0 +1,82 @@
+import unittest
+import re
+
+from bs4 import BeautifulSoup
+
+from recipes import slice_html
+from soup_index import SoupIndex
+
+PAGE = """
+<html><head><title>Jammy Onion and Miso Pasta Recipe | Bon Appétit</title></head>
+<body>
+<svg><title>Logo</title></svg>
+<h2 class="heading">Recipe information</h2>
+<div class="ingredients_recipeYield__DN65p"><span class="pantry--ui ingredients_fontOverride__abc">4 servings</span></div>
+<dd class="pantry--ui">30 minutes</dd>
+<dd class="pantry--ui other">45 minutes</dd>
+<div class="active-time project-meta__active-time"><span class="meta-text__data">20 mins</span></div>
+<div class="project-meta__active-time active-time"><span class="meta-text__data">wrong order</span></div>
+<h2 id="mntl-sc-block_1-0" class="comp mntl-sc-block lifestyle-sc-block-heading mntl-sc-block-heading">Notes</h2>
+<p id="mntl-sc-block_1-0-1">First note.</p>
+<h2 id="other" class="comp mntl-sc-block lifestyle-sc-block-heading mntl-sc-block-heading">Notes</h2>
+<h2>Ingredients</h2><p>1</p><p>2</p>
+<h2>Ingredients</h2>
+</body></html>
+"""
+
+class SoupIndexTesting(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.soup = BeautifulSoup(PAGE, "html.parser")
+        self.index = SoupIndex(self.soup)
+
+    def assertSameTags(self, indexed, found):
+        self.assertEqual([id(tag) for tag in indexed], [id(tag) for tag in found])
+
+    def test_tag_name(self):
+        self.assertSameTags(self.index.find_all("p"), self.soup.find_all("p"))
+        self.assertIs(self.index.find("title"), self.soup.title)
+        self.assertIsNone(self.index.find("table"))
+
+    def test_class_string(self):
+        self.assertSameTags(self.index.find_all("dd", class_="pantry--ui"),
+                            self.soup.find_all("dd", class_="pantry--ui"))
+        self.assertSameTags(self.index.find_all("div", class_="active-time project-meta__active-time"),
+                            self.soup.find_all("div", class_="active-time project-meta__active-time"))
+
+    def test_class_regex(self):
+        pattern = re.compile("ingredients_recipeYield_*")
+        self.assertSameTags(self.index.find_all("div", class_=pattern), self.soup.find_all("div", class_=pattern))
+        pattern = re.compile("pantry--ui ingredients_fontOverride_*")
+        self.assertSameTags(self.index.find_all("span", class_=pattern), self.soup.find_all("span", class_=pattern))
+
+    def test_class_and_id(self):
+        heading_class = "comp mntl-sc-block lifestyle-sc-block-heading mntl-sc-block-heading"
+        pattern = re.compile("mntl-sc-block_*")
+        self.assertSameTags(self.index.find_all("h2", class_=heading_class, tag_id=pattern),
+                            self.soup.find_all("h2", class_=heading_class, id=pattern))
+        self.assertIs(self.index.find("p", tag_id="mntl-sc-block_1-0-1"),
+                      self.soup.find("p", id="mntl-sc-block_1-0-1"))
+
+    def test_heading_text(self):
+        self.assertSameTags(self.index.heading("h2", "Ingredients"),
+                            [tag for tag in self.soup.find_all("h2") if tag.text == "Ingredients"])
+        self.assertEqual(self.index.heading("h2", "Preparation"), [])
+
+class PageSlicingTesting(unittest.TestCase):
+    def test_unused_markup_removed(self):
+        html = ('<head><script src="a.js"></script><STYLE>p {color: red}</STYLE></head>'
+                '<body><svg><path d="M0 0"/></svg><p>Boil water.</p><script>var a = "<p>";</script></body>')
+        self.assertEqual(slice_html(html), "<head></head><body><p>Boil water.</p></body>")
+
+    def test_self_closing_tags(self):
+        html = '<svg class="icon"/><div class="ingredients">Flour</div><iframe src="v"/><svg><path/></svg><p>end</p>'
+        self.assertEqual(slice_html(html), '<svg class="icon"/><div class="ingredients">Flour</div><iframe src="v"/>'
+                                           '<p>end</p>')
+
+    def test_recipe_metadata_kept(self):
+        html = '<script type="application/ld+json">{"@type": "Recipe"}</script><p>Boil water.</p>'
+        self.assertEqual(slice_html(html), html)
+
+if __name__ == "__main__":
+    unittest.main()
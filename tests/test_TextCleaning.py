@@ -0,0 +1,101 @@
+import unittest
+import glob
+import json
+import os
+import random
+import re
+
+from recipes import clean_text, clean_texts
+from create_latex import (clean_fractions, clean_special_characters, create_latex_friendly_text,
+                          create_latex_friendly_texts)
+
+# The original multi-pass implementations, which the single-pass versions must match exactly
+
+def legacy_clean_text(text):
+    text = re.sub("\n", " ", text)
+    text = re.sub("\xa0", "", text)
+    text = text.split("Editor’s note: ")[0]
+    text = text.strip()
+    text = re.sub(" {2,}", " ", text)
+    return text
+
+def legacy_frac(a, b):
+    return r"$\\frac{"+str(a)+"}{"+str(b)+"}$"
+
+def legacy_clean_fractions(text):
+    text = re.sub("¼", legacy_frac(1, 4), text)
+    text = re.sub("1( |)/4", legacy_frac(1, 4), text)
+    text = re.sub("⅓", legacy_frac(1, 3), text)
+    text = re.sub("1( |)/3", legacy_frac(1, 3), text)
+    text = re.sub("½", legacy_frac(1, 2), text)
+    text = re.sub("1( |)/2", legacy_frac(1, 2), text)
+    text = re.sub("⅔", legacy_frac(2, 3), text)
+    text = re.sub("²⁄₃", legacy_frac(2, 3), text)
+    text = re.sub("2( |)/3", legacy_frac(2, 3), text)
+    text = re.sub("¾", legacy_frac(3, 4), text)
+    text = re.sub("3( |)/4", legacy_frac(3, 4), text)
+    text = re.sub("⅛", legacy_frac(1, 8), text)
+    text = re.sub("1( |)/8", legacy_frac(1, 8), text)
+    text = re.sub("⅜", legacy_frac(3, 8), text)
+    text = re.sub("3( |)/8", legacy_frac(3, 8), text)
+    text = re.sub("⅝", legacy_frac(5, 8), text)
+    text = re.sub("5( |)/8", legacy_frac(5, 8), text)
+    return text
+
+def legacy_clean_special_characters(text):
+    text = re.sub("˚", r"$\\degree$", text)
+    text = re.sub("#", r"\\#", text)
+    text = re.sub("&", r"\\&", text)
+    text = re.sub("ồ", "o", text)
+    text = re.sub("%", r"\\%", text)
+    return text
+
+def legacy_create_latex_friendly_text(text):
+    return legacy_clean_special_characters(legacy_clean_fractions(text))
+
+def scraped_corpus():
+    """
+    Ingredients and instructions of every saved recipe, plus examples of the edge cases seen on the websites
+    """
+    corpus = ["1 1/2 cups all-purpose flour", "1 /2 tsp. kosher salt", "2 ½ lb. butternut squash", "⅔ cup (150 g) sugar",
+              "²⁄₃ cup milk", "Bake at 350˚ until golden, 25–30 minutes.", "Salt & pepper", "#10 can tomatoes",
+              "Nuoc cham (ồ) sauce", "75% dark chocolate", "  Heat\noil\xa0in  a pan.  Editor’s note: updated 2021 ",
+              "1/2/3 cups", "11/4 oz.", "3/1/4", "5 /8 inch thick", "1/3/8", "¾3/4", ""]
+    for path in glob.glob(os.path.join(os.getcwd(), "jsons", "*.json")):
+        with open(path, encoding="utf-8") as f:
+            recipe = json.load(f)
+        for field in ["ingredients", "instructions"]:
+            values = recipe.get(field) or []
+            if isinstance(values, dict):
+                values = [text for group in values.values() for text in group]
+            corpus.extend(values)
+    # Random strings made of the characters the replacements care about
+    generator = random.Random(0)
+    alphabet = list("0123456789/ #&%˚ồ¼⅓½⅔¾⅛⅜⅝\n\xa0ab") + ["²⁄₃", "Editor’s note: "]
+    corpus.extend("".join(generator.choice(alphabet) for _ in range(generator.randrange(40))) for _ in range(5000))
+    return corpus
+
+class TextCleaningTesting(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.corpus = scraped_corpus()
+
+    def test_clean_text_identical(self):
+        for text in self.corpus:
+            self.assertEqual(clean_text(text), legacy_clean_text(text), repr(text))
+        self.assertEqual(clean_texts(self.corpus), [legacy_clean_text(text) for text in self.corpus])
+
+    def test_latex_text_identical(self):
+        for text in self.corpus:
+            self.assertEqual(clean_fractions(text), legacy_clean_fractions(text), repr(text))
+            self.assertEqual(clean_special_characters(text), legacy_clean_special_characters(text), repr(text))
+            self.assertEqual(create_latex_friendly_text(text), legacy_create_latex_friendly_text(text), repr(text))
+
+    def test_latex_texts_identical(self):
+        self.assertEqual(create_latex_friendly_texts(self.corpus),
+                         [legacy_create_latex_friendly_text(text) for text in self.corpus])
+        self.assertEqual(create_latex_friendly_texts(["a\0b", "½"]), ["a\0b", r"$\frac{1}{2}$"])
+        self.assertEqual(create_latex_friendly_texts([]), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import builtins
+import json
+import os
+
+from tests.helpers import LibraryTestCase, recipe, temporary_directory
+
+def saved_notes(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["my_notes"]
+
+def no_prompt(_):
+    raise AssertionError("Asked for input")
+
+class ToJsonTesting(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(os.getcwd(), "jsons", "Flaky Bread.json")
+        self.assertEqual(recipe(my_notes="first").to_json("skip"), self.path)
+
+    @patch.object(builtins, "input", no_prompt)
+    def test_policies(self):
+        self.assertIsNone(recipe(my_notes="second").to_json("skip"))
+        self.assertEqual(saved_notes(self.path), "first")
+
+        self.assertEqual(recipe(my_notes="second").to_json("overwrite"), self.path)
+        self.assertEqual(saved_notes(self.path), "second")
+
+        recipe(my_notes="third").to_json("version")
+        recipe(my_notes="fourth").to_json("version")
+        self.assertEqual(saved_notes(self.path), "fourth")
+        versions = os.path.join("jsons", "versions")
+        self.assertEqual(sorted(os.listdir(versions)), ["Flaky Bread.1.json", "Flaky Bread.2.json"])
+        self.assertEqual(saved_notes(os.path.join(versions, "Flaky Bread.2.json")), "third")
+
+        self.assertRaises(ValueError, recipe().to_json, "replace")
+
+    @patch.object(builtins, "input", lambda _: "y")
+    def test_ask(self):
+        recipe(my_notes="second").to_json()
+        self.assertEqual(saved_notes(self.path), "second")
+
+    def test_saved_fields(self):
+        with open(self.path, encoding="utf-8") as f:
+            self.assertNotIn("root", json.load(f))
+        # Only the json file and the lock directory, no leftover temporary files
+        self.assertEqual(sorted(os.listdir("jsons")), [".locks", "Flaky Bread.json"])
+
+    def test_library_root(self):
+        root = temporary_directory(self)
+        path = recipe(root, my_notes="elsewhere").to_json("overwrite")
+        self.assertEqual(path, os.path.join(root, "jsons", "Flaky Bread.json"))
+        self.assertEqual(saved_notes(self.path), "first")
+
+    def test_concurrent_saves(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda number: recipe(my_notes=str(number)).to_json("version"), range(32)))
+        # Every save kept the one before it: nothing was lost or written over half way
+        versions = [saved_notes(os.path.join("jsons", "versions", name))
+                    for name in os.listdir(os.path.join("jsons", "versions"))]
+        self.assertEqual(len(versions), 32)
+        self.assertEqual(sorted(versions + [saved_notes(self.path)]), sorted([str(n) for n in range(32)] + ["first"]))
+
+if __name__ == "__main__":
+    unittest.main()